@@ -26,6 +26,7 @@ from amulet_team_main_window import (
 
 import amulet_team_3d_viewer
 from ._view_3d import View3D
+from ._view_3d._resource_pack import save_block_model_caches
 
 
 # Qt only weekly references this. We must hold a strong reference to stop it getting garbage collected
@@ -73,6 +74,7 @@ def _locale_changed() -> None:
 
 
 def unload_plugin() -> None:
+    save_block_model_caches()
     if view_3d_button is not None:
         view_3d_button.delete()
         unregister_layout(View3DID)
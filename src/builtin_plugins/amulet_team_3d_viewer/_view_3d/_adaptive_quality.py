@@ -0,0 +1,178 @@
+import logging
+import time
+from typing import Callable
+
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtOpenGL import QOpenGLTimerQuery
+
+from ._settings import render_settings
+
+log = logging.getLogger(__name__)
+
+# The number of seconds between evaluations of the frame time.
+EvaluationInterval = 0.25
+# The number of seconds the frame time must stay low before detail is restored.
+RestoreDelay = 1.0
+# Detail is restored if the frame time is less than this fraction of the frame budget.
+RestoreThreshold = 0.6
+# The camera speed in blocks per second above which the load distance is reduced.
+FastMovementSpeed = 48.0
+# The weight of each new sample in the frame time average.
+SmoothingFactor = 0.2
+# The number of GPU timer queries in flight.
+# Results are read this many frames late so that reading them never waits for the GPU.
+TimerQueryCount = 3
+
+
+class GpuFrameTimer:
+    """
+    Measures the time the GPU takes to draw each frame with timer queries.
+
+    Drawing commands run asynchronously so the time taken to submit them says little about GPU bound scenes.
+    The result of each query is read a few frames later once it is available.
+    If timer queries are not supported the GPU time is always 0.
+    All methods must be called with the OpenGL context current.
+    """
+
+    def __init__(self) -> None:
+        self._queries: list[QOpenGLTimerQuery] = []
+        # Has each query been ended without its result being read.
+        self._pending: list[bool] = []
+        self._index = 0
+        self._running: QOpenGLTimerQuery | None = None
+        # The GPU time of the most recent frame with a result in seconds.
+        self.gpu_time = 0.0
+
+    def init_gl(self) -> None:
+        for _ in range(TimerQueryCount):
+            query = QOpenGLTimerQuery()
+            if not query.create():
+                log.debug("GPU timer queries are not supported.")
+                self.destroy_gl()
+                return
+            self._queries.append(query)
+        self._pending = [False] * len(self._queries)
+
+    def destroy_gl(self) -> None:
+        for query in self._queries:
+            query.destroy()
+        self._queries.clear()
+        self._pending.clear()
+        self._running = None
+        self.gpu_time = 0.0
+
+    def begin(self) -> None:
+        """Start timing a frame."""
+        if not self._queries:
+            return
+        index = self._index
+        query = self._queries[index]
+        if self._pending[index]:
+            if not query.isResultAvailable():
+                # The GPU is more than TimerQueryCount frames behind. Skip timing this frame.
+                return
+            self.gpu_time = query.waitForResult() / 1_000_000_000
+            self._pending[index] = False
+        query.begin()
+        self._running = query
+
+    def end(self) -> None:
+        """Stop timing the frame started with :meth:`begin`."""
+        if self._running is None:
+            return
+        self._running.end()
+        self._running = None
+        self._pending[self._index] = True
+        self._index = (self._index + 1) % len(self._queries)
+
+
+class AdaptiveQualityController(QObject):
+    """
+    Adjusts the chunk load distance to hold the target frame rate.
+
+    The frame time is the larger of the CPU time to submit a frame and the GPU time to draw it measured by :class:`GpuFrameTimer`.
+    The interval between presented frames is not used because frames are only painted when something changes.
+    Detail is shed quickly when the frame time exceeds the budget or the camera moves fast.
+    It is restored one step at a time once frames have been fast and the meshing backlog empty for a while.
+    This does nothing unless adaptive quality is enabled in the render settings.
+    This must be used from the main thread.
+    """
+
+    def __init__(
+        self, get_backlog: Callable[[], int], parent: QObject | None = None
+    ) -> None:
+        """
+        :param get_backlog: A function returning the number of chunks being meshed.
+        :param parent: The parent object.
+        """
+        super().__init__(parent)
+        self._get_backlog = get_backlog
+        # The exponential moving average of the frame time in seconds.
+        self._frame_time = 0.0
+        self._speed = 0.0
+        self._last_evaluation = time.perf_counter()
+        # The last time the frame time was over the restore threshold.
+        self._last_busy = self._last_evaluation
+        # Frames are only painted when something changes.
+        # This evaluates again once the scene is idle so that detail can be restored.
+        self._restore_timer = QTimer(self)
+        self._restore_timer.setSingleShot(True)
+        self._restore_timer.setInterval(int(RestoreDelay * 1000))
+        self._restore_timer.timeout.connect(self._on_idle)
+
+    def frame_finished(self, frame_time: float, speed: float) -> None:
+        """
+        Record a painted frame.
+
+        :param frame_time: The cost of the frame in seconds.
+            This is the larger of the CPU time to submit the frame and the latest GPU time to draw one.
+        :param speed: The camera speed in blocks per second.
+        """
+        if not render_settings.adaptive_quality:
+            return
+        self._frame_time += (frame_time - self._frame_time) * SmoothingFactor
+        self._speed = speed
+        if EvaluationInterval <= time.perf_counter() - self._last_evaluation:
+            self._evaluate(False)
+
+    def _on_idle(self) -> None:
+        # Nothing has been painted since the last evaluation so the camera is not moving.
+        # The frame time is out of date so let it decay until detail is restored.
+        self._speed = 0.0
+        self._frame_time *= 0.5
+        self._evaluate(True)
+
+    def _evaluate(self, idle: bool) -> None:
+        """
+        Adjust the load distance.
+
+        :param idle: If True no frames have been painted since the last evaluation.
+            Detail is only restored because there is no new frame time.
+        """
+        if not render_settings.adaptive_quality:
+            return
+        now = time.perf_counter()
+        self._last_evaluation = now
+        budget = 1 / render_settings.target_fps
+        load_distance = render_settings.chunk_load_distance
+
+        if not idle and (budget < self._frame_time or FastMovementSpeed < self._speed):
+            # Shed detail quickly.
+            self._last_busy = now
+            render_settings.set_adaptive_load_distance(
+                min(load_distance - 1, load_distance * 3 // 4)
+            )
+        elif self._frame_time < budget * RestoreThreshold and not self._get_backlog():
+            if RestoreDelay <= now - self._last_busy:
+                # Restore detail one step at a time.
+                self._last_busy = now
+                render_settings.set_adaptive_load_distance(load_distance + 1)
+        else:
+            self._last_busy = now
+
+        if (
+            render_settings.chunk_load_distance
+            < render_settings.max_chunk_load_distance
+        ):
+            # Evaluate again if no frames are painted.
+            self._restore_timer.start()
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from math import inf
+from typing import NamedTuple
+
+import numpy
+import numpy.typing
+
+# The maximum number of boxes in a leaf node.
+LeafSize = 8
+
+
+class BoxHit(NamedTuple):
+    """The box hit by a ray."""
+
+    # The index of the box in the array the index was built from.
+    box_index: int
+    # The distance along the ray to the hit.
+    # This is 0 if the ray starts inside the box.
+    distance: float
+
+
+def _ray_box_distance(
+    bounds: tuple[float, float, float, float, float, float],
+    origin: tuple[float, float, float],
+    inverse_direction: tuple[float, float, float],
+    max_distance: float,
+) -> float | None:
+    """
+    Get the distance along a ray to a box.
+    Returns None if the ray does not hit the box within max_distance.
+    """
+    t_near = 0.0
+    t_far = max_distance
+    for axis in range(3):
+        o = origin[axis]
+        inverse = inverse_direction[axis]
+        low = bounds[axis]
+        high = bounds[axis + 3]
+        if inverse == inf:
+            # The ray is parallel to this axis.
+            if o < low or o > high:
+                return None
+            continue
+        t0 = (low - o) * inverse
+        t1 = (high - o) * inverse
+        if t0 > t1:
+            t0, t1 = t1, t0
+        if t0 > t_near:
+            t_near = t0
+        if t1 < t_far:
+            t_far = t1
+        if t_near > t_far:
+            return None
+    return t_near
+
+
+class BoxIndex:
+    """
+    A bounding volume hierarchy over a set of axis aligned boxes.
+    This finds the boxes containing a point or hit by a ray without testing every box.
+    It is immutable so a new index must be built when the boxes change.
+    """
+
+    def __init__(self, boxes: numpy.typing.ArrayLike) -> None:
+        """
+        Build the index.
+
+        :param boxes: An array of shape (N, 6). (min_x, min_y, min_z, max_x, max_y, max_z)
+        """
+        box_array = numpy.asarray(boxes, dtype=numpy.float64).reshape(-1, 6)
+        order = numpy.arange(len(box_array))
+        # Each node is (min_x, min_y, min_z, max_x, max_y, max_z, start, count, right)
+        # Leaf nodes contain the boxes order[start:start + count].
+        # Inner nodes have a count of 0. Their children are the next node and the node at right.
+        self._nodes: list[
+            tuple[float, float, float, float, float, float, int, int, int]
+        ] = []
+        if len(box_array):
+            self._build(box_array, order, 0, len(box_array))
+        # Python floats are much faster to compare than numpy scalars.
+        self._order: list[int] = order.tolist()
+        self._boxes: list[tuple[float, float, float, float, float, float]] = [
+            tuple(box) for box in box_array.tolist()
+        ]
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def _build(
+        self,
+        boxes: numpy.typing.NDArray[numpy.float64],
+        order: numpy.typing.NDArray[numpy.int64],
+        start: int,
+        end: int,
+    ) -> None:
+        """Build the node for the boxes order[start:end] and its children."""
+        node_boxes = boxes[order[start:end]]
+        low = node_boxes[:, :3].min(axis=0)
+        high = node_boxes[:, 3:].max(axis=0)
+        index = len(self._nodes)
+        bounds = (*low.tolist(), *high.tolist())
+        if end - start <= LeafSize:
+            self._nodes.append((*bounds, start, end - start, 0))
+            return
+        self._nodes.append((*bounds, start, 0, 0))
+        # Split at the median centre along the longest axis.
+        axis = int(numpy.argmax(high - low))
+        centres = node_boxes[:, axis] + node_boxes[:, axis + 3]
+        middle = (end - start) // 2
+        order[start:end] = order[start:end][numpy.argpartition(centres, middle)]
+        self._build(boxes, order, start, start + middle)
+        right = len(self._nodes)
+        self._build(boxes, order, start + middle, end)
+        self._nodes[index] = (*bounds, start, 0, right)
+
+    def get_boxes_containing(self, x: float, y: float, z: float) -> list[int]:
+        """Get the index of every box containing a point. Points on the surface of a box are contained by it."""
+        found: list[int] = []
+        if not self._nodes:
+            return found
+        nodes = self._nodes
+        boxes = self._boxes
+        stack = [0]
+        while stack:
+            node_index = stack.pop()
+            min_x, min_y, min_z, max_x, max_y, max_z, start, count, right = nodes[
+                node_index
+            ]
+            if not (
+                min_x <= x <= max_x and min_y <= y <= max_y and min_z <= z <= max_z
+            ):
+                continue
+            if count:
+                for box_index in self._order[start : start + count]:
+                    box = boxes[box_index]
+                    if (
+                        box[0] <= x <= box[3]
+                        and box[1] <= y <= box[4]
+                        and box[2] <= z <= box[5]
+                    ):
+                        found.append(box_index)
+            else:
+                stack.append(right)
+                stack.append(node_index + 1)
+        return found
+
+    def raycast(
+        self,
+        origin: tuple[float, float, float],
+        direction: tuple[float, float, float],
+        max_distance: float = inf,
+    ) -> BoxHit | None:
+        """
+        Find the nearest box hit by a ray.
+
+        :param origin: The start of the ray.
+        :param direction: The direction of the ray. The distances are in multiples of this vector.
+        :param max_distance: The maximum distance along the ray to search.
+        :return: The nearest hit or None if no box was hit.
+        """
+        if not self._nodes:
+            return None
+        inverse_direction = (
+            1 / direction[0] if direction[0] else inf,
+            1 / direction[1] if direction[1] else inf,
+            1 / direction[2] if direction[2] else inf,
+        )
+        nodes = self._nodes
+        boxes = self._boxes
+        best: BoxHit | None = None
+        stack = [0]
+        while stack:
+            node_index = stack.pop()
+            node = nodes[node_index]
+            # Nodes further than the best hit so far cannot contain a nearer hit.
+            limit = max_distance if best is None else best.distance
+            if _ray_box_distance(node[:6], origin, inverse_direction, limit) is None:
+                continue
+            start, count, right = node[6:]
+            if count:
+                for box_index in self._order[start : start + count]:
+                    distance = _ray_box_distance(
+                        boxes[box_index], origin, inverse_direction, limit
+                    )
+                    if distance is not None and (
+                        best is None or distance < best.distance
+                    ):
+                        best = BoxHit(box_index, distance)
+                        limit = distance
+            else:
+                stack.append(right)
+                stack.append(node_index + 1)
+        return best
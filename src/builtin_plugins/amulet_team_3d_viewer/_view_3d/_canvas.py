@@ -1,9 +1,10 @@
 from __future__ import annotations
 from typing import Any, TypeVar
 import logging
-from math import sin, cos, radians
+from math import sin, cos, radians, sqrt
+import time
 
-from PySide6.QtCore import Qt, QPoint, Slot
+from PySide6.QtCore import Qt, QPoint, QPointF, Slot
 from PySide6.QtGui import (
     QOpenGLFunctions,
     QOpenGLContext,
@@ -14,6 +15,7 @@ from PySide6.QtGui import (
     QCursor,
     QGuiApplication,
     QMatrix4x4,
+    QVector3D,
 )
 from PySide6.QtWidgets import QWidget
 from PySide6.QtOpenGLWidgets import QOpenGLWidget
@@ -25,13 +27,21 @@ from OpenGL.GL import (
     GL_DEPTH_TEST as _GL_DEPTH_TEST,
 )
 
+from amulet.data_types import DimensionId
+
 from amulet_editor.data.level import get_level
 from amulet_editor.models.widgets.traceback_dialog import CatchException
 from amulet_team_resource_pack._api import get_resource_pack_container
 
 from ._camera import Camera, Location, Rotation
-from ._key_catcher import KeySrc, KeyCatcher
+from ._key_catcher import KeySrc, KeyCatcher, KeyT
+from ._frame_scheduler import FrameScheduler
+from ._adaptive_quality import AdaptiveQualityController, GpuFrameTimer
 from ._level_geometry import LevelGeometry
+from ._raycast import RaycastHit
+from ._settings import render_settings
+from ._horizon import HorizonGeometry
+from ._selection_geometry import SelectionGeometry, SelectionHit
 from ._resource_pack import get_gl_resource_pack_container
 
 log = logging.getLogger(__name__)
@@ -49,6 +59,21 @@ GL_COLOR_BUFFER_BIT = dynamic_cast(_GL_COLOR_BUFFER_BIT, IntConstant)
 GL_DEPTH_BUFFER_BIT = dynamic_cast(_GL_DEPTH_BUFFER_BIT, IntConstant)
 GL_DEPTH_TEST = dynamic_cast(_GL_DEPTH_TEST, IntConstant)
 
+# The horizontal movement keys and the angle they move relative to the camera azimuth.
+HorizontalMovementKeys: tuple[tuple[KeyT, int], ...] = (
+    ((KeySrc.Keyboard, Qt.Key.Key_I), 180),
+    ((KeySrc.Keyboard, Qt.Key.Key_L), 270),
+    ((KeySrc.Keyboard, Qt.Key.Key_K), 0),
+    ((KeySrc.Keyboard, Qt.Key.Key_J), 90),
+)
+UpKey: KeyT = (KeySrc.Keyboard, Qt.Key.Key_Space)
+DownKey: KeyT = (KeySrc.Keyboard, Qt.Key.Key_Semicolon)
+MovementKeys: tuple[KeyT, ...] = (
+    *(key for key, _ in HorizontalMovementKeys),
+    UpKey,
+    DownKey,
+)
+
 
 """
 GPU Memory Deallocation
@@ -64,24 +89,50 @@ class CanvasGlData:
     """A container for all canvas OpenGL data."""
 
     render_level: LevelGeometry
-
-    def __init__(self, render_level: LevelGeometry) -> None:
+    horizon: HorizonGeometry
+    selection: SelectionGeometry
+
+    def __init__(
+        self,
+        render_level: LevelGeometry,
+        horizon: HorizonGeometry,
+        selection: SelectionGeometry,
+    ) -> None:
         self.render_level = render_level
+        self.horizon = horizon
+        self.selection = selection
 
     def init_gl(self) -> None:
         self.render_level.init_gl()
+        self.horizon.init_gl()
+        self.selection.init_gl()
 
     def start(self) -> None:
         self.render_level.start()
+        self.horizon.start()
 
     def stop(self) -> None:
         self.render_level.stop()
+        self.horizon.stop()
 
     def destroy_gl(self) -> None:
         self.render_level.destroy_gl()
+        self.horizon.destroy_gl()
+        self.selection.destroy_gl()
 
     def paint_gl(self, projection_matrix: QMatrix4x4, view_matrix: QMatrix4x4) -> None:
         self.render_level.paint_gl(projection_matrix, view_matrix)
+        self.horizon.paint_gl(projection_matrix, view_matrix)
+        # The selection is translucent so it is drawn last.
+        self.selection.paint_gl(projection_matrix, view_matrix)
+
+    def set_dimension(self, dimension: DimensionId) -> None:
+        self.render_level.set_dimension(dimension)
+        self.horizon.set_dimension(dimension)
+
+    def set_location(self, cx: int, cz: int) -> None:
+        self.render_level.set_location(cx, cz)
+        self.horizon.set_location(cx, cz)
 
 
 class FirstPersonCanvas(QOpenGLWidget, QOpenGLFunctions):
@@ -107,38 +158,48 @@ class FirstPersonCanvas(QOpenGLWidget, QOpenGLFunctions):
                 "FirstPersonCanvas cannot be constructed when a level does not exist."
             )
         self._level = level
-        self._gl_data = CanvasGlData(LevelGeometry(self._level))
+        self._gl_data = CanvasGlData(
+            LevelGeometry(self._level),
+            HorizonGeometry(self._level),
+            SelectionGeometry(),
+        )
+        # All repaints and movement go through the frame scheduler.
+        self._frame_scheduler = FrameScheduler(self)
+        self._frame_scheduler.frame.connect(self._on_frame)
+        self._frame_scheduler.repaint.connect(self.update)
         # Repaint every time the geometry changes
-        self._gl_data.render_level.geometry_changed.connect(self.update)
+        self._gl_data.render_level.geometry_changed.connect(
+            self._frame_scheduler.request_repaint
+        )
+        self._gl_data.horizon.geometry_changed.connect(
+            self._frame_scheduler.request_repaint
+        )
+        self._gl_data.selection.geometry_changed.connect(
+            self._frame_scheduler.request_repaint
+        )
+
+        # Adjusts the render distance if adaptive quality is enabled.
+        render_level = self._gl_data.render_level
+        self._quality_controller = AdaptiveQualityController(
+            lambda: render_level.meshing_backlog, self
+        )
+        # Drawing is asynchronous so the GPU time is measured separately from the CPU time.
+        self._gpu_timer = GpuFrameTimer()
 
         self._camera = Camera()
-        self.camera.transform_changed.connect(self.update)
+        self.camera.transform_changed.connect(self._frame_scheduler.request_repaint)
         self.camera.location_changed.connect(self._on_move)
         self._start_pos = QPoint()
         self._mouse_captured = False
 
         self._speed = 1.0
+        # The speed the camera is moving in blocks per second.
+        self._camera_speed = 0.0
 
         self._key_catcher = KeyCatcher()
         self.installEventFilter(self._key_catcher)
-        self._key_catcher.connect_repeating(
-            self._forwards, (KeySrc.Keyboard, Qt.Key.Key_I), frozenset(), 10
-        )
-        self._key_catcher.connect_repeating(
-            self._right, (KeySrc.Keyboard, Qt.Key.Key_L), frozenset(), 10
-        )
-        self._key_catcher.connect_repeating(
-            self._backwards, (KeySrc.Keyboard, Qt.Key.Key_K), frozenset(), 10
-        )
-        self._key_catcher.connect_repeating(
-            self._left, (KeySrc.Keyboard, Qt.Key.Key_J), frozenset(), 10
-        )
-        self._key_catcher.connect_repeating(
-            self._up, (KeySrc.Keyboard, Qt.Key.Key_Space), frozenset(), 10
-        )
-        self._key_catcher.connect_repeating(
-            self._down, (KeySrc.Keyboard, Qt.Key.Key_Semicolon), frozenset(), 10
-        )
+        # Held movement keys are applied once per frame.
+        self._key_catcher.pressed_changed.connect(self._on_pressed_changed)
 
         self._resource_pack_container = get_resource_pack_container(self._level)
         self._resource_pack_container.changing.connect(
@@ -164,15 +225,19 @@ class FirstPersonCanvas(QOpenGLWidget, QOpenGLFunctions):
             self.context().aboutToBeDestroyed.connect(
                 self._gl_data.destroy_gl, Qt.ConnectionType.DirectConnection
             )
+            self.context().aboutToBeDestroyed.connect(
+                self._gpu_timer.destroy_gl, Qt.ConnectionType.DirectConnection
+            )
 
             # Do the initialisation
             self.initializeOpenGLFunctions()
             self.glClearColor(*self.background_colour, 1)
             self._gl_data.init_gl()
+            self._gpu_timer.init_gl()
             # TODO: pull this data from somewhere
             # Set the start position after OpenGL has been initialised
             # gl_data.render_level.set_dimension(next(iter(self._level.dimension_ids())))
-            self._gl_data.render_level.set_dimension("minecraft:overworld")
+            self._gl_data.set_dimension("minecraft:overworld")
             self.camera.location = Location(0, 0, 0)
             log.debug("FirstPersonCanvas.initializeGL end")
 
@@ -183,6 +248,63 @@ class FirstPersonCanvas(QOpenGLWidget, QOpenGLFunctions):
     def camera(self) -> Camera:
         return self._camera
 
+    def _get_ray(
+        self, pos: QPoint | QPointF
+    ) -> tuple[tuple[float, float, float], tuple[float, float, float]] | None:
+        """
+        Get the ray through a point on the canvas from the near plane to the far plane.
+
+        :param pos: The point in widget coordinates.
+        :return: The origin and direction of the ray or None if the view is empty.
+        """
+        width = self.width()
+        height = self.height()
+        if not width or not height:
+            return None
+        # The point in normalised device coordinates.
+        x = 2 * pos.x() / width - 1
+        y = 1 - 2 * pos.y() / height
+        inverse, invertible = (
+            self.camera.intrinsic_matrix * self.camera.extrinsic_matrix
+        ).inverted()
+        if not invertible:
+            return None
+        near = inverse.map(QVector3D(x, y, -1))
+        far = inverse.map(QVector3D(x, y, 1))
+        direction = far - near
+        origin = (near.x(), near.y(), near.z())
+        return origin, (direction.x(), direction.y(), direction.z())
+
+    def pick_block(self, pos: QPoint | QPointF) -> RaycastHit | None:
+        """
+        Find the block under a point on the canvas.
+        This only tests the chunks that are loaded and never reads chunk data so it can be called on every mouse move.
+        Blocks outside the clip box and above the slice plane are ignored.
+        Blocks hidden by the block filter can still be picked.
+
+        :param pos: The point in widget coordinates.
+        :return: The block and the face under the point or None if there is no block under it.
+        """
+        ray = self._get_ray(pos)
+        if ray is None:
+            return None
+        # Chunks further than this are never loaded.
+        max_distance = (render_settings.chunk_unload_distance + 1) * 16 * sqrt(3)
+        return self._gl_data.render_level.raycast(*ray, max_distance)
+
+    def pick_selection_box(self, pos: QPoint | QPointF) -> SelectionHit | None:
+        """
+        Find the nearest selection box under a point on the canvas.
+
+        :param pos: The point in widget coordinates.
+        :return: The box under the point or None if there is no box under it.
+        """
+        ray = self._get_ray(pos)
+        if ray is None:
+            return None
+        # The direction spans the near plane to the far plane.
+        return self._gl_data.selection.raycast(*ray, 1.0)
+
     def showEvent(self, event: QShowEvent) -> None:
         with CatchException():
             log.debug("FirstPersonCanvas.showEvent start")
@@ -210,9 +332,16 @@ class FirstPersonCanvas(QOpenGLWidget, QOpenGLFunctions):
             self.glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
             self.glEnable(GL_DEPTH_TEST)
 
+            start = time.perf_counter()
+            self._gpu_timer.begin()
             self._gl_data.paint_gl(
                 self.camera.intrinsic_matrix, self.camera.extrinsic_matrix
             )
+            self._gpu_timer.end()
+            cpu_time = time.perf_counter() - start
+            self._quality_controller.frame_finished(
+                max(cpu_time, self._gpu_timer.gpu_time), self._camera_speed
+            )
 
     def resizeGL(self, width: float, height: float) -> None:
         """Private resize method called by the QOpenGLWidget"""
@@ -237,6 +366,8 @@ class FirstPersonCanvas(QOpenGLWidget, QOpenGLFunctions):
             elevation += dy / 8
             self.camera.rotation = Rotation(azimuth, elevation)
 
+            self._frame_scheduler.notify_activity()
+
             QCursor.setPos(self._start_pos)
             # On some systems setPos does not work. We must reset _start_pos to the new pos
             self._start_pos = QCursor.pos()
@@ -247,6 +378,7 @@ class FirstPersonCanvas(QOpenGLWidget, QOpenGLFunctions):
             QGuiApplication.restoreOverrideCursor()
 
     def wheelEvent(self, event: QWheelEvent) -> None:
+        self._frame_scheduler.notify_activity()
         if event.angleDelta().y() > 0:
             self._faster()
         else:
@@ -254,40 +386,35 @@ class FirstPersonCanvas(QOpenGLWidget, QOpenGLFunctions):
 
     def _on_move(self) -> None:
         x, _, z = self.camera.location
-        self._gl_data.render_level.set_location(int(x // 16), int(z // 16))
-
-    def _move_relative(self, angle: int, dt: float) -> None:
-        x, y, z = self.camera.location
-        azimuth = radians(self.camera.rotation.azimuth + angle)
-        self.camera.location = Location(
-            x - sin(azimuth) * self._speed * dt, y, z + cos(azimuth) * self._speed * dt
-        )
-
-    @Slot()
-    def _forwards(self, dt: float) -> None:
-        self._move_relative(180, dt)
-
-    @Slot()
-    def _right(self, dt: float) -> None:
-        self._move_relative(270, dt)
-
-    @Slot()
-    def _backwards(self, dt: float) -> None:
-        self._move_relative(0, dt)
-
-    @Slot()
-    def _left(self, dt: float) -> None:
-        self._move_relative(90, dt)
-
-    @Slot()
-    def _up(self, dt: float) -> None:
-        x, y, z = self.camera.location
-        self.camera.location = Location(x, y + self._speed * dt, z)
-
-    @Slot()
-    def _down(self, dt: float) -> None:
-        x, y, z = self.camera.location
-        self.camera.location = Location(x, y - self._speed * dt, z)
+        self._gl_data.set_location(int(x // 16), int(z // 16))
+
+    def _on_pressed_changed(self) -> None:
+        moving = any(self._key_catcher.is_pressed(key) for key in MovementKeys)
+        if not moving:
+            self._camera_speed = 0.0
+            self._gl_data.render_level.set_velocity(0.0, 0.0)
+        self._frame_scheduler.set_animating(moving)
+
+    def _on_frame(self, dt: float) -> None:
+        """Move the camera once for all held movement keys."""
+        distance = self._speed * dt
+        dx = dy = dz = 0.0
+        for key, angle in HorizontalMovementKeys:
+            if self._key_catcher.is_pressed(key):
+                azimuth = radians(self.camera.rotation.azimuth + angle)
+                dx -= sin(azimuth) * distance
+                dz += cos(azimuth) * distance
+        if self._key_catcher.is_pressed(UpKey):
+            dy += distance
+        if self._key_catcher.is_pressed(DownKey):
+            dy -= distance
+        if dt:
+            self._camera_speed = sqrt(dx * dx + dy * dy + dz * dz) / dt
+            # Load the chunks ahead of the camera first.
+            self._gl_data.render_level.set_velocity(dx / dt, dz / dt)
+        if dx or dy or dz:
+            x, y, z = self.camera.location
+            self.camera.location = Location(x + dx, y + dy, z + dz)
 
     @Slot()
     def _faster(self) -> None:
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from functools import partial
+from threading import Lock
+from typing import Callable, TypeAlias
+from weakref import WeakKeyDictionary
+
+from PySide6.QtCore import QObject, Qt, Signal
+
+from amulet.data_types import DimensionId
+from amulet.level.abc import Level, ChunkHandle
+from amulet.utils.weakref import CallableWeakMethod
+
+ChunkKey: TypeAlias = tuple[DimensionId, int, int]
+
+
+class _WatchedChunk:
+    """A chunk handle connected to the notifier."""
+
+    def __init__(self, chunk_handle: ChunkHandle, callback: Callable[[], None]):
+        # The handle must be kept alive for the connection to remain.
+        self.chunk_handle = chunk_handle
+        self.callback = callback
+        # The number of users watching this chunk.
+        self.count = 0
+
+
+class ChunkChangeNotifier(QObject):
+    """
+    Collects chunk changes in a level and delivers them in batches.
+
+    Each watched chunk handle is connected once no matter how many users watch it.
+    Changes are accumulated from any thread and emitted once per event loop iteration
+    so that a large edit produces one notification per dimension rather than one per chunk.
+    This must be created on the main thread.
+    """
+
+    # The chunks in a dimension changed. (dimension id, set of (cx, cz))
+    # This is emitted on the main thread.
+    chunks_changed = Signal(str, object)
+    # Queued to the main thread to flush the pending changes.
+    _flush_requested = Signal()
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._lock = Lock()
+        self._watched: dict[ChunkKey, _WatchedChunk] = {}
+        # The changes since the last flush.
+        # The change handlers may run in a thread holding the level lock.
+        # They only acquire this lock which is never held while acquiring another.
+        self._pending_lock = Lock()
+        self._pending: dict[DimensionId, set[tuple[int, int]]] = {}
+        self._flush_pending = False
+        self._weak_on_chunk_change = CallableWeakMethod(self._on_chunk_change)
+        self._flush_requested.connect(self._flush, Qt.ConnectionType.QueuedConnection)
+
+    def watch(self, chunk_key: ChunkKey, chunk_handle: ChunkHandle) -> None:
+        """
+        Start watching a chunk for changes.
+        Each call must be paired with a call to :meth:`unwatch`.
+        Thread safe.
+        """
+        with self._lock:
+            watched = self._watched.get(chunk_key)
+            if watched is None:
+                watched = self._watched[chunk_key] = _WatchedChunk(
+                    chunk_handle, partial(self._weak_on_chunk_change, *chunk_key)
+                )
+                chunk_handle.changed.connect(watched.callback)
+            watched.count += 1
+
+    def unwatch(self, chunk_keys: Iterable[ChunkKey]) -> None:
+        """
+        Stop watching the chunks.
+        Thread safe.
+        """
+        with self._lock:
+            for chunk_key in chunk_keys:
+                watched = self._watched.get(chunk_key)
+                if watched is None:
+                    continue
+                watched.count -= 1
+                if watched.count <= 0:
+                    del self._watched[chunk_key]
+                    watched.chunk_handle.changed.disconnect(watched.callback)
+
+    def _on_chunk_change(self, dimension_id: DimensionId, cx: int, cz: int) -> None:
+        with self._pending_lock:
+            self._pending.setdefault(dimension_id, set()).add((cx, cz))
+            if self._flush_pending:
+                return
+            self._flush_pending = True
+        self._flush_requested.emit()
+
+    def _flush(self) -> None:
+        with self._pending_lock:
+            pending = self._pending
+            self._pending = {}
+            self._flush_pending = False
+        for dimension_id, chunk_coords in pending.items():
+            self.chunks_changed.emit(dimension_id, chunk_coords)
+
+
+_lock = Lock()
+_level_data: WeakKeyDictionary[Level, ChunkChangeNotifier] = WeakKeyDictionary()
+
+
+def get_chunk_change_notifier(level: Level) -> ChunkChangeNotifier:
+    """
+    Get the chunk change notifier for a level.
+    This must be called by the main thread the first time it is called for a level.
+    """
+    with _lock:
+        notifier = _level_data.get(level)
+        if notifier is None:
+            notifier = _level_data[level] = ChunkChangeNotifier()
+        return notifier
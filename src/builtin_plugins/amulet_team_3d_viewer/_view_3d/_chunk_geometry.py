@@ -1,40 +1,121 @@
+from enum import IntEnum
 from threading import RLock
+from typing import NamedTuple
 from PySide6.QtGui import QMatrix4x4
-from PySide6.QtOpenGL import QOpenGLBuffer, QOpenGLTexture, QOpenGLVertexArrayObject
+from PySide6.QtOpenGL import QOpenGLBuffer, QOpenGLTexture
 
 from amulet.level.abc import ChunkHandle
-from amulet.utils.weakref import CallableWeakMethod
 from ._resource_pack import OpenGLResourcePack
+from ._raycast import ChunkOccupancy
 
 
 class ChunkGLData:
-    """Class storing all the OpenGL data for a chunk mesh."""
+    """
+    Class storing all the OpenGL data for a chunk mesh.
+    The buffer is shared between contexts. Each view creates its own vertex array for it.
+    """
 
     vbo: QOpenGLBuffer
     vertex_count: int
-    vao: QOpenGLVertexArrayObject
+    # The world space box containing the geometry. (min_x, min_y, min_z, max_x, max_y, max_z)
+    bounds: tuple[float, float, float, float, float, float]
+    # The number of opaque vertices at the start of the buffer.
+    opaque_vertex_count: int
+    # The vertical range and first opaque and translucent vertex of each section in ascending order.
+    # (min_y, max_y, opaque_start, translucent_start)
+    section_ranges: tuple[tuple[int, int, int, int], ...]
 
     def __init__(
         self,
         vbo: QOpenGLBuffer,
         vertex_count: int,
-        vao: QOpenGLVertexArrayObject,
+        bounds: tuple[float, float, float, float, float, float],
+        opaque_vertex_count: int = 0,
+        section_ranges: tuple[tuple[int, int, int, int], ...] = (),
     ):
         super().__init__()
         self.vbo = vbo
         self.vertex_count = vertex_count
-        self.vao = vao
+        self.bounds = bounds
+        self.opaque_vertex_count = opaque_vertex_count
+        self.section_ranges = section_ranges
+
+    def get_vertex_ranges(self, min_y: float, max_y: float) -> list[tuple[int, int]]:
+        """
+        Get the vertex ranges of the sections that may have geometry in a vertical range.
+
+        :param min_y: The bottom of the vertical range.
+        :param max_y: The top of the vertical range.
+        :return: A list of (first vertex, vertex count) tuples.
+        """
+        if not self.section_ranges:
+            return [(0, self.vertex_count)]
+        # Block models may extend up to one block outside their section.
+        min_y -= 1.0
+        max_y += 1.0
+        sections = self.section_ranges
+        first = 0
+        while first < len(sections) and sections[first][1] <= min_y:
+            first += 1
+        end = first
+        while end < len(sections) and sections[end][0] < max_y:
+            end += 1
+        if first == end:
+            return []
+        translucent_count = self.vertex_count - self.opaque_vertex_count
+        ranges = []
+        opaque_start = sections[first][2]
+        opaque_end = (
+            sections[end][2] if end < len(sections) else self.opaque_vertex_count
+        )
+        if opaque_start < opaque_end:
+            ranges.append((opaque_start, opaque_end - opaque_start))
+        translucent_start = sections[first][3]
+        translucent_end = sections[end][3] if end < len(sections) else translucent_count
+        if translucent_start < translucent_end:
+            ranges.append(
+                (
+                    self.opaque_vertex_count + translucent_start,
+                    translucent_end - translucent_start,
+                )
+            )
+        return ranges
+
+
+class PlaceholderType(IntEnum):
+    """The type of placeholder drawn for a chunk that has no geometry."""
+
+    # The chunk does not exist.
+    Empty = 0
+    # The chunk could not be loaded.
+    Error = 1
+
+
+class ChunkPlaceholder(NamedTuple):
+    """
+    A grid drawn in place of a chunk that has no geometry.
+    All placeholders are instances of one shared mesh so nothing is uploaded for them.
+    """
+
+    type: PlaceholderType
+    # The vertical range of the dimension.
+    min_y: float
+    max_y: float
 
 
 class ChunkData:
     # Constant data
-    # The chunk handle. Used to get notified when the chunk changed.
+    # The chunk handle.
     chunk_handle: ChunkHandle
     # The world transform of the data.
     model_transform: QMatrix4x4
 
     # The OpenGL data.
     geometry: ChunkGLData | None
+    # The placeholder to draw if the chunk has no geometry.
+    placeholder: ChunkPlaceholder | None
+    # The blocks that have geometry. Used to find the block under the cursor.
+    occupancy: ChunkOccupancy | None
 
     def __init__(self, chunk_handle: ChunkHandle, transform: QMatrix4x4) -> None:
         self.chunk_handle = chunk_handle
@@ -47,13 +128,8 @@ class ChunkData:
         # If chunk and mesh tokens are the same then the mesher does not need to be run.
         self.geometry_state: int = -1
         self.geometry = None
-
-        # Schedule meshing when the chunk changes.
-        self._on_chunk_change = CallableWeakMethod(self.mark_changed)
-        self.chunk_handle.changed.connect(self._on_chunk_change)
-
-    def __del__(self) -> None:
-        self.chunk_handle.changed.disconnect(self._on_chunk_change)
+        self.placeholder = None
+        self.occupancy = None
 
     def has_changed(self) -> bool:
         """Does the geometry need rebuilding."""
@@ -65,7 +141,11 @@ class ChunkData:
             self.chunk_state += 1
 
     def set_geometry(
-        self, geometry_state: int, geometry: ChunkGLData
+        self,
+        geometry_state: int,
+        geometry: ChunkGLData | None,
+        placeholder: ChunkPlaceholder | None = None,
+        occupancy: ChunkOccupancy | None = None,
     ) -> ChunkGLData | None:
         """
         Set the geometry and update the geometry state.
@@ -74,5 +154,7 @@ class ChunkData:
         """
         old_geometry = self.geometry
         self.geometry = geometry
+        self.placeholder = placeholder
+        self.occupancy = occupancy
         self.geometry_state = geometry_state
         return old_geometry
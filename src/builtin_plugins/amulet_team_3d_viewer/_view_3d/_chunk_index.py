@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Iterable
+from threading import Lock
+from weakref import ref, WeakKeyDictionary
+
+from amulet.data_types import DimensionId
+from amulet.level.abc import Level
+from amulet.selection import SelectionGroup
+from amulet.utils.weakref import CallableWeakMethod
+
+# The number of chunks along each side of a region.
+RegionSize = 32
+_RegionBytes = RegionSize * RegionSize // 8
+# The minimum number of seconds between scans of all changed chunks in a dimension.
+# Chunks reported by the chunk change notifier are checked without waiting for this.
+FullRefreshInterval = 1.0
+
+
+class DimensionChunkIndex:
+    """
+    A bitmap of the chunks that exist in a dimension.
+    Each region of 32x32 chunks is stored as 128 bytes.
+    Lookups do not acquire any lock.
+    """
+
+    def __init__(
+        self, bounds: SelectionGroup, chunk_coords: Iterable[tuple[int, int]]
+    ) -> None:
+        self._bounds = bounds
+        self._regions: dict[tuple[int, int], bytearray] = {}
+        # The change generation of the level this index is up to date with.
+        self.generation = 0
+        # The time of the last scan of all changed chunks.
+        self.refresh_time = time.monotonic()
+        for cx, cz in chunk_coords:
+            self.set_exists(cx, cz, True)
+        # The chunks found to exist since the last call to pop_created.
+        self._created: set[tuple[int, int]] = set()
+
+    @property
+    def bounds(self) -> SelectionGroup:
+        """The editable region of the dimension."""
+        return self._bounds
+
+    def exists(self, cx: int, cz: int) -> bool:
+        """Does the chunk exist."""
+        region = self._regions.get((cx // RegionSize, cz // RegionSize))
+        if region is None:
+            return False
+        index = (cz % RegionSize) * RegionSize + cx % RegionSize
+        return bool(region[index >> 3] & (1 << (index & 7)))
+
+    def pop_created(self) -> set[tuple[int, int]]:
+        """
+        Get and clear the chunks that were previously missing and have been found to exist.
+        Anything drawn as missing for these chunks must be rebuilt.
+        """
+        created = self._created
+        self._created = set()
+        return created
+
+    def refresh_exists(self, cx: int, cz: int, exists: bool) -> None:
+        """Update a chunk that was previously reported missing."""
+        if exists:
+            self.set_exists(cx, cz, True)
+            self._created.add((cx, cz))
+
+    def set_exists(self, cx: int, cz: int, exists: bool) -> None:
+        """Set the existence state of a chunk."""
+        region_key = (cx // RegionSize, cz // RegionSize)
+        region = self._regions.get(region_key)
+        index = (cz % RegionSize) * RegionSize + cx % RegionSize
+        if exists:
+            if region is None:
+                region = self._regions[region_key] = bytearray(_RegionBytes)
+            region[index >> 3] |= 1 << (index & 7)
+        elif region is not None:
+            region[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+
+class ChunkExistenceIndex:
+    """
+    Tracks which chunks exist in each dimension of a level.
+
+    The chunk coordinates of a dimension are read from the level the first time the dimension is requested.
+    Chunks reported by :meth:`mark_chunks_changed` are checked on the next request.
+    When the level changes, all chunks changed since the last save are checked again at most once every FullRefreshInterval seconds
+    so that bulk edits do not rescan every edited chunk on each request.
+    A chunk that exists may be reported missing until it is checked. It is then returned by :meth:`DimensionChunkIndex.pop_created`.
+    A deleted chunk may still be reported as existing.
+    """
+
+    def __init__(self, level: Level) -> None:
+        self._level = ref[Level](level)
+        self._lock = Lock()
+        self._dimensions: dict[DimensionId, DimensionChunkIndex] = {}
+        # The chunks in each dimension that may differ from the saved level data.
+        self._edited_chunks: dict[DimensionId, set[tuple[int, int]]] = {}
+        # This is incremented each time the level changes.
+        # The signal handlers run in the thread changing the level, which may hold the level lock.
+        # They must not acquire self._lock because get_dimension holds it while waiting for the level lock.
+        self._generation = 0
+        self._reset_pending = False
+        # The chunks in each dimension reported changed that have not been checked yet.
+        # This has its own lock so that reporting changes never waits for the level.
+        self._pending_lock = Lock()
+        self._pending_chunks: dict[DimensionId, set[tuple[int, int]]] = {}
+
+        self._on_change = CallableWeakMethod(self._mark_changed)
+        self._on_reset = CallableWeakMethod(self._reset)
+        level.changed.connect(self._on_change)
+        level.history_changed.connect(self._on_change)
+        level.external_changed.connect(self._on_reset)
+        level.purged.connect(self._on_reset)
+        level.closed.connect(self._on_reset)
+
+    def __del__(self) -> None:
+        level = self._level()
+        if level is not None:
+            level.changed.disconnect(self._on_change)
+            level.history_changed.disconnect(self._on_change)
+            level.external_changed.disconnect(self._on_reset)
+            level.purged.disconnect(self._on_reset)
+            level.closed.disconnect(self._on_reset)
+
+    def _mark_changed(self) -> None:
+        self._generation += 1
+
+    def mark_chunks_changed(
+        self, dimension_id: DimensionId, chunk_coords: Iterable[tuple[int, int]]
+    ) -> None:
+        """
+        Check whether these chunks exist on the next request.
+        This does not acquire the index lock so it may be called from any thread.
+        """
+        with self._pending_lock:
+            self._pending_chunks.setdefault(dimension_id, set()).update(chunk_coords)
+
+    def _reset(self) -> None:
+        """The level data has been replaced. Reload everything when next requested."""
+        self._reset_pending = True
+        self._generation += 1
+
+    def get_dimension(self, dimension_id: DimensionId) -> DimensionChunkIndex:
+        """
+        Get the chunk index for a dimension.
+        This acquires the level lock if the dimension has not been loaded or the level has changed.
+
+        :param dimension_id: The dimension to get.
+        :return: The index for the dimension. This object remains valid until the level is reset.
+        :raises RuntimeError: If the level has been closed.
+        """
+        with self._lock:
+            if self._reset_pending:
+                self._reset_pending = False
+                self._dimensions.clear()
+                self._edited_chunks.clear()
+            generation = self._generation
+            index = self._dimensions.get(dimension_id)
+            now = time.monotonic()
+            full_refresh = index is None or (
+                index.generation != generation
+                and FullRefreshInterval <= now - index.refresh_time
+            )
+            with self._pending_lock:
+                pending_chunks = self._pending_chunks.pop(dimension_id, set())
+            if index is not None:
+                # Chunks already marked as existing are not checked.
+                # If one was deleted the consumer finds out when it loads the chunk.
+                pending_chunks = {
+                    (cx, cz) for cx, cz in pending_chunks if not index.exists(cx, cz)
+                }
+                if not full_refresh and not pending_chunks:
+                    return index
+
+            level = self._level()
+            if level is None:
+                raise RuntimeError("The level no longer exists.")
+            with level.lock_shared():
+                if not level.is_open():
+                    raise RuntimeError("The level has been closed.")
+                dimension = level.get_dimension(dimension_id)
+                if index is None:
+                    # Load the existing chunks from the level.
+                    changed_chunks = dimension.changed_chunk_coords()
+                    index = DimensionChunkIndex(
+                        dimension.bounds(), dimension.chunk_coords()
+                    )
+                    self._dimensions[dimension_id] = index
+                    self._edited_chunks[dimension_id] = changed_chunks
+                else:
+                    if full_refresh:
+                        # Check whether any of the changed chunks have been created.
+                        # Chunks reverted to their saved state are no longer reported so check the previous set again.
+                        changed_chunks = dimension.changed_chunk_coords()
+                        pending_chunks.update(
+                            (cx, cz)
+                            for cx, cz in changed_chunks
+                            | self._edited_chunks.get(dimension_id, set())
+                            if not index.exists(cx, cz)
+                        )
+                        self._edited_chunks[dimension_id] = changed_chunks
+                    for cx, cz in pending_chunks:
+                        index.refresh_exists(
+                            cx, cz, dimension.get_chunk_handle(cx, cz).exists()
+                        )
+            if full_refresh:
+                index.generation = generation
+                index.refresh_time = now
+            return index
+
+
+_lock = Lock()
+_level_data: WeakKeyDictionary[Level, ChunkExistenceIndex] = WeakKeyDictionary()
+
+
+def get_chunk_existence_index(level: Level) -> ChunkExistenceIndex:
+    """Get the chunk existence index for a level."""
+    with _lock:
+        index = _level_data.get(level)
+        if index is None:
+            index = _level_data[level] = ChunkExistenceIndex(level)
+        return index
@@ -1,8 +1,7 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, NamedTuple
 import logging
 import itertools
-import ctypes
 import numpy
 import numpy.typing
 
@@ -13,15 +12,43 @@ from amulet.chunk import Chunk
 from amulet.chunk_components import BlockComponent, BlockComponentData
 from amulet.selection import SelectionGroup
 
-from ._chunk_mesher_lod0 import create_lod0_chunk
+from ._chunk_mesher_lod0 import create_lod0_chunk, SectionSummary
+from ._chunk_geometry import ChunkPlaceholder, PlaceholderType
+from ._materials import material_index
+from ._raycast import ChunkOccupancy, get_chunk_occupancy
 
 if TYPE_CHECKING:
     from ._resource_pack import OpenGLResourcePack
 
-FloatSize = ctypes.sizeof(ctypes.c_float)
 
 log = logging.getLogger(__name__)
 
+# The number of floats in each vertex.
+# Position (3), texture coordinate (2), texture bounds (4), tint (3), material id (1)
+VertexSize = 13
+
+
+class ChunkMesh(NamedTuple):
+    """The geometry created for a chunk."""
+
+    # The vertex arrays.
+    # These must be uploaded consecutively into one buffer.
+    # They are kept separate to avoid copying them into one array.
+    buffers: tuple[numpy.typing.NDArray[numpy.float32], ...]
+    # The total number of vertices in the arrays.
+    vertex_count: int
+    # The vertical range containing the geometry.
+    y_range: tuple[float, float]
+    # The placeholder to draw if the chunk has no geometry.
+    placeholder: ChunkPlaceholder | None = None
+    # The number of opaque vertices. The translucent vertices follow them.
+    opaque_vertex_count: int = 0
+    # The vertical range and first opaque and translucent vertex of each section in ascending order.
+    # (min_y, max_y, opaque_start, translucent_start)
+    section_ranges: tuple[tuple[int, int, int, int], ...] = ()
+    # The blocks that have geometry. None if the chunk has no block data.
+    occupancy: ChunkOccupancy | None = None
+
 
 def _get_sub_chunks(
     level: Level, dimension: DimensionId, cx: int, cz: int, chunk: Chunk
@@ -120,99 +147,18 @@ def _create_chunk_plane(height: float) -> tuple[numpy.ndarray, numpy.ndarray]:
     )
 
 
-def _create_grid(
-    level_bounds: SelectionGroup,
-    resource_pack: OpenGLResourcePack,
-    texture_namespace: str,
-    texture_path: str,
-    draw_floor: bool,
-    draw_ceil: bool,
-    tint: tuple[float, float, float],
-) -> numpy.typing.NDArray[numpy.float32]:
-    vert_len = 12
-    plane: numpy.ndarray = numpy.ones(
-        (vert_len * 12 * (draw_floor + draw_ceil)),
-        dtype=numpy.float32,
-    ).reshape((-1, vert_len))
-    if draw_floor:
-        plane[:12, :3], plane[:12, 3:5] = _create_chunk_plane(level_bounds.min_y - 0.01)
-        if draw_ceil:
-            plane[12:, :3], plane[12:, 3:5] = _create_chunk_plane(
-                level_bounds.max_y + 0.01
-            )
-    elif draw_ceil:
-        plane[:12, :3], plane[:12, 3:5] = _create_chunk_plane(level_bounds.max_y + 0.01)
-
-    plane[:, 5:9] = resource_pack.texture_bounds(
-        resource_pack.get_texture_path(texture_namespace, texture_path)
-    )
-    plane[:, 9:12] = tint
-    return plane
-
-
-def _get_empty_geometry(
-    level_bounds: SelectionGroup,
-    resource_pack: OpenGLResourcePack,
-    cx: int,
-    cz: int,
-) -> bytes:
-    return (
-        _create_grid(
-            level_bounds,
-            resource_pack,
-            "amulet",
-            "amulet_ui/chunk_grid_null",
-            True,
-            True,
-            # (1, 1, 1) if (cx + cz) % 2 else (0.8, 0.8, 0.8),
-            (0.1, 0.1, 0.1) if (cx + cz) % 2 else (0.0, 0.0, 0.0),
-        )
-        .ravel()
-        .tobytes()
-    )
-
-
-def _get_error_geometry(
-    level_bounds: SelectionGroup,
-    resource_pack: OpenGLResourcePack,
-    cx: int,
-    cz: int,
-) -> bytes:
-    return (
-        _create_grid(
-            level_bounds,
-            resource_pack,
-            "amulet",
-            "amulet_ui/chunk_grid_error",
-            True,
-            True,
-            # (1, 1, 1) if (cx + cz) % 2 else (0.8, 0.8, 0.8),
-            (0.5, 0.5, 0.5) if (cx + cz) % 2 else (0.6, 0.6, 0.6),
-        )
-        .ravel()
-        .tobytes()
-    )
-
+def create_placeholder_grid() -> numpy.typing.NDArray[numpy.float32]:
+    """
+    Create the mesh shared by all chunk placeholders.
+    The floor plane has a y value of 0 and the ceiling plane has a y value of 1.
+    The shader maps these to the vertical range of each instance.
 
-def _get_temp_geometry(
-    level_bounds: SelectionGroup,
-    resource_pack: OpenGLResourcePack,
-    cx: int,
-    cz: int,
-) -> bytes:
-    return (
-        _create_grid(
-            level_bounds,
-            resource_pack,
-            "amulet",
-            "amulet_ui/chunk_grid_error",
-            True,
-            True,
-            (1, 1, 1) if (cx + cz) % 2 else (0.8, 0.8, 0.8),
-        )
-        .ravel()
-        .tobytes()
-    )
+    :return: An array of shape (24, 5). Position (3), texture coordinate (2)
+    """
+    grid = numpy.empty((24, 5), dtype=numpy.float32)
+    grid[:12, :3], grid[:12, 3:5] = _create_chunk_plane(0)
+    grid[12:, :3], grid[12:, 3:5] = _create_chunk_plane(1)
+    return grid
 
 
 def get_block_component(
@@ -229,13 +175,57 @@ def get_block_component(
             return None
 
 
+def get_placeholder_mesh(
+    level_bounds: SelectionGroup, placeholder_type: PlaceholderType
+) -> ChunkMesh:
+    """Get the mesh for a chunk drawn as a placeholder."""
+    # Offset the planes slightly so that they don't overlap blocks.
+    min_y = level_bounds.min_y - 0.01
+    max_y = level_bounds.max_y + 0.01
+    return ChunkMesh(
+        (), 0, (min_y, max_y), ChunkPlaceholder(placeholder_type, min_y, max_y)
+    )
+
+
+def _get_geometry_y_range(
+    section_summaries: dict[int, SectionSummary], section_height: int
+) -> tuple[float, float]:
+    """Get the vertical range containing the geometry of all non-empty sections."""
+    cys = [cy for cy, summary in section_summaries.items() if not summary.is_empty]
+    if not cys:
+        return 0.0, 0.0
+    # Block models may extend up to one block outside their block.
+    return min(cys) * section_height - 1.0, (max(cys) + 1) * section_height + 1.0
+
+
+def _get_section_ranges(
+    section_summaries: dict[int, SectionSummary], section_height: int
+) -> tuple[tuple[int, int, int, int], ...]:
+    """Get the vertical range and the first vertex of each section."""
+    return tuple(
+        (
+            cy * section_height,
+            (cy + 1) * section_height,
+            summary.opaque_start,
+            summary.translucent_start,
+        )
+        for cy, summary in sorted(section_summaries.items())
+    )
+
+
 def mesh_chunk(
     level: Level,
     resource_pack: OpenGLResourcePack,
     dimension_id: DimensionId,
     cx: int,
     cz: int,
-) -> tuple[bytes, int]:
+    surface_depth: int | None = None,
+) -> ChunkMesh:
+    """
+    Create the geometry for a chunk.
+
+    :param surface_depth: If not None only mesh the blocks at most this many blocks below the surface.
+    """
     with level.lock_shared():
         if not level.is_open():
             raise RuntimeError("The level has been closed.")
@@ -245,34 +235,45 @@ def mesh_chunk(
             chunk = dimension.get_chunk_handle(cx, cz).get([BlockComponent.ComponentID])
         except ChunkDoesNotExist:
             log.debug(f"Chunk {dimension_id}, {cx}, {cz} does not exist")
-            buffer = _get_empty_geometry(dimension.bounds(), resource_pack, cx, cz)
+            return get_placeholder_mesh(dimension.bounds(), PlaceholderType.Empty)
         except ChunkLoadError:
             log.exception(
                 f"Error loading chunk {dimension_id}, {cx}, {cz}", exc_info=True
             )
-            buffer = _get_error_geometry(dimension.bounds(), resource_pack, cx, cz)
+            return get_placeholder_mesh(dimension.bounds(), PlaceholderType.Error)
         else:
             if isinstance(chunk, BlockComponent):
                 log.debug(f"Creating geometry for chunk {dimension_id}, {cx}, {cz}")
-                opaque_buffer, translucent_buffer = create_lod0_chunk(
-                    resource_pack,
-                    cx,
-                    cz,
-                    chunk.block,
-                    get_block_component(dimension, cx, cz - 1),
-                    get_block_component(dimension, cx + 1, cz),
-                    get_block_component(dimension, cx, cz + 1),
-                    get_block_component(dimension, cx - 1, cz),
+                block_component = chunk.block
+                opaque_buffer, translucent_buffer, section_summaries = (
+                    create_lod0_chunk(
+                        resource_pack,
+                        cx,
+                        cz,
+                        block_component,
+                        get_block_component(dimension, cx, cz - 1),
+                        get_block_component(dimension, cx + 1, cz),
+                        get_block_component(dimension, cx, cz + 1),
+                        get_block_component(dimension, cx - 1, cz),
+                        surface_depth,
+                        material_index.get_material_ids(block_component.palette),
+                    )
+                )
+                log.debug(f"Generated chunk {dimension_id}, {cx}, {cz}")
+                section_shape = block_component.sections.array_shape
+                section_height = section_shape[1]
+                return ChunkMesh(
+                    (opaque_buffer, translucent_buffer),
+                    len(opaque_buffer) + len(translucent_buffer),
+                    _get_geometry_y_range(section_summaries, section_height),
+                    opaque_vertex_count=len(opaque_buffer),
+                    section_ranges=_get_section_ranges(
+                        section_summaries, section_height
+                    ),
+                    occupancy=get_chunk_occupancy(section_summaries, section_shape),
                 )
-                buffer = opaque_buffer + translucent_buffer
             else:
                 log.debug(
                     f"Chunk {dimension_id}, {cx}, {cz} does not implement BlockComponent."
                 )
-                buffer = b""
-
-        log.debug(f"Generated array for {dimension_id}, {cx}, {cz}")
-
-        vertex_count = len(buffer) // (12 * FloatSize)
-        log.debug(f"Generated chunk {dimension_id}, {cx}, {cz}")
-        return buffer, vertex_count
+                return ChunkMesh((), 0, (0.0, 0.0))
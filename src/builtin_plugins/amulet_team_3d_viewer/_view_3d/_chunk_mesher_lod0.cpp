@@ -2,23 +2,76 @@
 
 namespace Amulet {
 
+namespace {
+    // Properties of a block model used to cull faces.
+    enum BlockFlags : std::uint8_t {
+        BlockFlagOpaque = 1,
+        BlockFlagTranslucent = 2,
+        // The model has at least one part.
+        BlockFlagHasParts = 4,
+        // The model has a part that is never culled.
+        BlockFlagHasCullNone = 8,
+    };
+    constexpr std::uint8_t UnknownBlockFlags = 255;
+
+    std::uint8_t get_mesh_flags(const BlockMesh& mesh)
+    {
+        std::uint8_t flags = 0;
+        switch (mesh.transparency) {
+        case BlockMeshTransparency::FullOpaque:
+            flags |= BlockFlagOpaque;
+            break;
+        case BlockMeshTransparency::FullTranslucent:
+            flags |= BlockFlagTranslucent;
+            break;
+        default:
+            break;
+        }
+        for (const auto& part : mesh.parts) {
+            if (part) {
+                flags |= BlockFlagHasParts;
+            }
+        }
+        if (mesh.parts[BlockMeshCullDirection::BlockMeshCullNone]) {
+            flags |= BlockFlagHasCullNone;
+        }
+        return flags;
+    }
+
+    // The tint multiplier of the faces in each cull direction.
+    constexpr std::array<float, 7> FaceShading { 1.0, 1.0, 0.55, 0.85, 0.7, 0.85, 0.7 };
+
+    // The height of a column that has no full opaque blocks.
+    constexpr std::int64_t NoHeight = std::numeric_limits<std::int64_t>::min();
+} // namespace
 
 void create_lod0_chunk(
     AbstractOpenGLResourcePack& resource_pack,
     const std::int64_t cx,
     const std::int64_t cz,
     const ChunkData& all_chunk_data,
-    std::string& opaque_buffer,
-    std::string& translucent_buffer)
+    const std::optional<std::int64_t> surface_depth,
+    const MaterialIds& material_ids,
+    std::vector<float>& opaque_buffer,
+    std::vector<float>& translucent_buffer,
+    SectionSummaries& section_summaries)
 {
     // Borrowed pointers to the mesh object or nullptr if not initialised.
     std::array<std::vector<const BlockMesh*>, 5> all_block_meshes;
+    // The BlockFlags of each block in the palette or UnknownBlockFlags if not initialised.
+    std::array<std::vector<std::uint8_t>, 5> all_block_flags;
+
+    if (!material_ids.empty() && material_ids.size() != all_chunk_data[2]->get_palette()->size()) {
+        throw std::invalid_argument("There must be one material id for each block in the palette.");
+    }
 
     // Resize mesh vectors to fit all the blocks in the palette.
     for (size_t i = 0; i < 5; i++) {
         const Amulet::BlockComponentData* block_component = all_chunk_data[i];
         if (block_component) {
-            all_block_meshes[i].resize(block_component->get_palette()->size());
+            const auto palette_size = block_component->get_palette()->size();
+            all_block_meshes[i].resize(palette_size);
+            all_block_flags[i].resize(palette_size, UnknownBlockFlags);
         }
     }
 
@@ -39,6 +92,31 @@ void create_lod0_chunk(
         }
     };
 
+    // Function to get the culling properties of a block.
+    auto get_block_flags = [&](const std::int8_t dcx, const std::int8_t dcz, const std::uint32_t block_id) -> std::uint8_t {
+        auto& flags = all_block_flags[2 + dcx + 2 * dcz][block_id];
+        if (flags == UnknownBlockFlags) {
+            flags = get_mesh_flags(get_block_mesh(dcx, dcz, block_id));
+        }
+        return flags;
+    };
+
+    // First pass. Find the mesh parts that are not culled and count their vertices.
+    struct VisiblePart {
+        const BlockMesh* mesh;
+        const BlockMeshPart* part;
+        // The offset of the block in the chunk.
+        float x;
+        float y;
+        float z;
+        float shading;
+        float material;
+    };
+    std::vector<VisiblePart> opaque_parts;
+    std::vector<VisiblePart> translucent_parts;
+    size_t opaque_vert_count = 0;
+    size_t translucent_vert_count = 0;
+
     // Get array shape info
     const auto& sections = *all_chunk_data[2]->get_sections();
     const auto& section_shape = sections.get_array_shape();
@@ -48,33 +126,319 @@ void create_lod0_chunk(
     const auto x_stride = y_shape * z_shape;
     const auto y_stride = z_shape;
 
+    // Each row of blocks along the z axis is stored as a bitmask.
+    // Bit z + 1 is the block at z. Bits 0 and z_shape + 1 are the blocks in the north and south chunks.
+    if (z_shape > 62) {
+        throw std::invalid_argument("The section z size must be at most 62.");
+    }
+    const std::int32_t padded_x_shape = x_shape + 2;
+    const std::int32_t padded_y_shape = y_shape + 2;
+    // Get the index of the row in the padded row arrays. x and y may be one outside the section.
+    auto row_index = [&](std::int32_t x, std::int32_t y) -> size_t {
+        return (x + 1) * padded_y_shape + y + 1;
+    };
+    // The full opaque and full translucent blocks in the section and its neighbours.
+    std::vector<std::uint64_t> opaque_rows(padded_x_shape * padded_y_shape);
+    std::vector<std::uint64_t> translucent_rows(padded_x_shape * padded_y_shape);
+    // The blocks in the section that have any mesh parts and that have an unculled mesh part.
+    std::vector<std::uint64_t> has_parts_rows(padded_x_shape * padded_y_shape);
+    std::vector<std::uint64_t> has_cull_none_rows(padded_x_shape * padded_y_shape);
+    // The blocks in the section that are close enough to the surface to mesh.
+    std::vector<std::uint64_t> surface_rows(padded_x_shape * padded_y_shape);
+
+    // Set the bit for a neighbouring block.
+    auto set_neighbour = [&](size_t row, std::int32_t bit, std::uint8_t flags) {
+        const std::uint64_t mask = std::uint64_t(1) << bit;
+        if (flags & BlockFlagOpaque) {
+            opaque_rows[row] |= mask;
+        } else if (flags & BlockFlagTranslucent) {
+            translucent_rows[row] |= mask;
+        }
+    };
+
+    // Is every block on one face of a section full and opaque.
+    auto is_face_opaque = [&](const std::uint32_t* buffer, const std::int8_t dcx, const std::int8_t dcz, BlockMeshCullDirection face) -> bool {
+        std::int32_t x_min = 0, x_max = x_shape, y_min = 0, y_max = y_shape, z_min = 0, z_max = z_shape;
+        switch (face) {
+        case BlockMeshCullDirection::BlockMeshCullUp:
+            y_min = y_shape - 1;
+            break;
+        case BlockMeshCullDirection::BlockMeshCullDown:
+            y_max = 1;
+            break;
+        case BlockMeshCullDirection::BlockMeshCullNorth:
+            z_max = 1;
+            break;
+        case BlockMeshCullDirection::BlockMeshCullEast:
+            x_min = x_shape - 1;
+            break;
+        case BlockMeshCullDirection::BlockMeshCullSouth:
+            z_min = z_shape - 1;
+            break;
+        case BlockMeshCullDirection::BlockMeshCullWest:
+            x_max = 1;
+            break;
+        default:
+            throw std::invalid_argument("Invalid section face.");
+        }
+        for (std::int32_t x = x_min; x < x_max; x++) {
+            for (std::int32_t y = y_min; y < y_max; y++) {
+                for (std::int32_t z = z_min; z < z_max; z++) {
+                    if (!(get_block_flags(dcx, dcz, buffer[x * x_stride + y * y_stride + z]) & BlockFlagOpaque)) {
+                        return false;
+                    }
+                }
+            }
+        }
+        return true;
+    };
+
     const auto& block_arrays = sections.get_arrays();
+    const size_t section_size = static_cast<size_t>(x_shape) * y_shape * z_shape;
+
+    // Get the y coordinate of the highest full opaque block in each column of a chunk.
+    // The result is indexed by x * z_shape + z. Columns without one are NoHeight.
+    // The result is empty if the chunk is not loaded.
+    auto get_height_map = [&](const std::int8_t dcx, const std::int8_t dcz) -> std::vector<std::int64_t> {
+        const auto* chunk_data = all_chunk_data[2 + dcx + 2 * dcz];
+        if (!chunk_data) {
+            return {};
+        }
+        const auto& chunk_sections = *chunk_data->get_sections();
+        if (chunk_sections.get_array_shape() != section_shape) {
+            throw std::invalid_argument("Neighbour section shape does not match.");
+        }
+        std::vector<std::int64_t> height_map(static_cast<size_t>(x_shape) * z_shape, NoHeight);
+        size_t remaining = height_map.size();
+        // Search down from the highest section until every column is found.
+        // The sections are stored unordered so sort the keys highest first.
+        const auto& arrays = chunk_sections.get_arrays();
+        std::vector<std::int64_t> section_cys;
+        section_cys.reserve(arrays.size());
+        for (const auto& [section_cy, _] : arrays) {
+            section_cys.push_back(section_cy);
+        }
+        std::sort(section_cys.begin(), section_cys.end(), std::greater<std::int64_t>());
+        for (auto it = section_cys.begin(); it != section_cys.end() && remaining; ++it) {
+            const std::int64_t section_cy = *it;
+            const auto* buffer = arrays.at(section_cy)->get_buffer();
+            for (std::int32_t x = 0; x < x_shape; x++) {
+                for (std::int32_t z = 0; z < z_shape; z++) {
+                    auto& height = height_map[x * z_shape + z];
+                    if (height != NoHeight) {
+                        continue;
+                    }
+                    for (std::int32_t y = y_shape - 1; y >= 0; y--) {
+                        if (get_block_flags(dcx, dcz, buffer[x * x_stride + y * y_stride + z]) & BlockFlagOpaque) {
+                            height = section_cy * y_shape + y;
+                            remaining--;
+                            break;
+                        }
+                    }
+                }
+            }
+        }
+        return height_map;
+    };
+
+    // The lowest y coordinate meshed in each column indexed by x * z_shape + z.
+    // This is only populated if surface_depth is set.
+    std::vector<std::int64_t> min_y_map;
+    // The lowest value in min_y_map. Sections entirely below this are not meshed.
+    std::int64_t min_y = NoHeight;
+    if (surface_depth) {
+        const auto height_map = get_height_map(0, 0);
+        const auto north_height_map = get_height_map(0, -1);
+        const auto east_height_map = get_height_map(1, 0);
+        const auto south_height_map = get_height_map(0, 1);
+        const auto west_height_map = get_height_map(-1, 0);
+        // Get the height of a column. x and z may be one outside the chunk.
+        // If the neighbouring chunk is not loaded the default is returned.
+        auto get_height = [&](std::int32_t x, std::int32_t z, std::int64_t default_height) -> std::int64_t {
+            const std::vector<std::int64_t>* neighbour_height_map = &height_map;
+            if (x < 0) {
+                neighbour_height_map = &west_height_map;
+                x = x_shape - 1;
+            } else if (x_shape <= x) {
+                neighbour_height_map = &east_height_map;
+                x = 0;
+            } else if (z < 0) {
+                neighbour_height_map = &north_height_map;
+                z = z_shape - 1;
+            } else if (z_shape <= z) {
+                neighbour_height_map = &south_height_map;
+                z = 0;
+            }
+            if (neighbour_height_map->empty()) {
+                return default_height;
+            }
+            return (*neighbour_height_map)[x * z_shape + z];
+        };
+
+        min_y_map.resize(height_map.size());
+        min_y = std::numeric_limits<std::int64_t>::max();
+        for (std::int32_t x = 0; x < x_shape; x++) {
+            for (std::int32_t z = 0; z < z_shape; z++) {
+                // The sides of a column are exposed down to the surface of the lowest neighbouring column.
+                const std::int64_t height = height_map[x * z_shape + z];
+                const std::int64_t surface = std::min({
+                    height,
+                    get_height(x, z - 1, height),
+                    get_height(x + 1, z, height),
+                    get_height(x, z + 1, height),
+                    get_height(x - 1, z, height),
+                });
+                const std::int64_t column_min_y = surface == NoHeight ? NoHeight : surface - *surface_depth;
+                min_y_map[x * z_shape + z] = column_min_y;
+                min_y = std::min(min_y, column_min_y);
+            }
+        }
+    }
+
+    // Summarise every section before meshing so that the neighbours of a section are known.
+    section_summaries.clear();
+    for (const auto& [cy, section] : block_arrays) {
+        const auto* buffer = section->get_buffer();
+        auto& summary = section_summaries[cy];
+        summary.is_uniform = std::find_if_not(buffer, buffer + section_size, [&](std::uint32_t block_id) { return block_id == buffer[0]; }) == buffer + section_size;
+        if (summary.is_uniform) {
+            const auto flags = get_block_flags(0, 0, buffer[0]);
+            summary.is_empty = !(flags & BlockFlagHasParts);
+            summary.opaque_faces = flags & BlockFlagOpaque ? AllSectionFaces : 0;
+        } else {
+            // Record which blocks have geometry so that rays can be tested against the section.
+            summary.occupancy.assign(x_shape * y_shape, 0);
+            // Runs of the same block are common so remember the last lookup.
+            std::uint32_t last_block_id = buffer[0];
+            bool has_parts = get_block_flags(0, 0, last_block_id) & BlockFlagHasParts;
+            bool any_parts = false;
+            for (std::int32_t x = 0; x < x_shape; x++) {
+                for (std::int32_t y = 0; y < y_shape; y++) {
+                    const auto* block_ids = &buffer[x * x_stride + y * y_stride];
+                    std::uint64_t row = 0;
+                    for (std::int32_t z = 0; z < z_shape; z++) {
+                        if (block_ids[z] != last_block_id) {
+                            last_block_id = block_ids[z];
+                            has_parts = get_block_flags(0, 0, last_block_id) & BlockFlagHasParts;
+                        }
+                        row |= has_parts ? std::uint64_t(1) << z : 0;
+                    }
+                    summary.occupancy[x * y_shape + y] = row;
+                    any_parts |= row != 0;
+                }
+            }
+            summary.is_empty = !any_parts;
+            if (summary.is_empty) {
+                summary.occupancy.clear();
+            }
+            for (std::uint8_t face = 1; face < 7; face++) {
+                if (is_face_opaque(buffer, 0, 0, static_cast<BlockMeshCullDirection>(face))) {
+                    summary.opaque_faces |= 1 << (face - 1);
+                }
+            }
+        }
+    }
+
+    // Is the face of the section touching the given section fully opaque.
+    auto is_neighbour_face_opaque = [&](const std::int64_t cy, const std::int8_t dcx, const std::int8_t dcz, BlockMeshCullDirection face) -> bool {
+        const auto* chunk_data = all_chunk_data[2 + dcx + 2 * dcz];
+        if (!chunk_data) {
+            return false;
+        }
+        const auto& neighbour_block_arrays = chunk_data->get_sections()->get_arrays();
+        auto it = neighbour_block_arrays.find(cy);
+        if (it == neighbour_block_arrays.end()) {
+            return false;
+        }
+        if (chunk_data->get_sections()->get_array_shape() != section_shape) {
+            throw std::invalid_argument("Neighbour section shape does not match.");
+        }
+        return is_face_opaque(it->second->get_buffer(), dcx, dcz, face);
+    };
+
+    // Is the section a single buried block type whose faces are all hidden by the neighbouring sections.
+    auto is_buried = [&](const std::int64_t cy, const SectionSummary& summary, std::uint32_t block_id) -> bool {
+        if (!summary.is_uniform || get_block_flags(0, 0, block_id) != (BlockFlagOpaque | BlockFlagHasParts)) {
+            return false;
+        }
+        auto has_face = [&](std::int64_t neighbour_cy, BlockMeshCullDirection face) {
+            auto it = section_summaries.find(neighbour_cy);
+            return it != section_summaries.end() && (it->second.opaque_faces & (1 << (face - 1)));
+        };
+        return has_face(cy + 1, BlockMeshCullDirection::BlockMeshCullDown)
+            && has_face(cy - 1, BlockMeshCullDirection::BlockMeshCullUp)
+            && is_neighbour_face_opaque(cy, 0, -1, BlockMeshCullDirection::BlockMeshCullSouth)
+            && is_neighbour_face_opaque(cy, 1, 0, BlockMeshCullDirection::BlockMeshCullWest)
+            && is_neighbour_face_opaque(cy, 0, 1, BlockMeshCullDirection::BlockMeshCullNorth)
+            && is_neighbour_face_opaque(cy, -1, 0, BlockMeshCullDirection::BlockMeshCullEast);
+    };
+
+    // Mesh the sections in ascending order so the vertex ranges of consecutive sections are contiguous.
+    std::vector<std::int64_t> section_cys;
+    section_cys.reserve(block_arrays.size());
+    for (const auto& [cy, _] : block_arrays) {
+        section_cys.push_back(cy);
+    }
+    std::sort(section_cys.begin(), section_cys.end());
+
     // For each section in the chunk.
-    for (const auto& it : block_arrays) {
-        const std::int64_t& cy = it.first;
-        const IndexArray3D& section = *it.second;
-        
+    for (const std::int64_t cy : section_cys) {
+        const IndexArray3D& section = *block_arrays.at(cy);
+
         const auto& section_buffer = section.get_buffer();
 
-        // Make a transparency 3D array two elements larger than one section in each direction
-        const std::int32_t padded_x_shape = x_shape + 2;
-        const std::int32_t padded_y_shape = y_shape + 2;
-        const std::int32_t padded_z_shape = z_shape + 2;
-        const auto padded_x_stride = padded_y_shape * padded_z_shape;
-        const auto padded_y_stride = padded_z_shape;
-        std::vector<BlockMeshTransparency> transparency_array(
-            padded_x_shape * padded_y_shape * padded_z_shape,
-            BlockMeshTransparency::Partial
-        );
-
-        // Populate the transparency array with values from the block models.
+        auto& summary = section_summaries[cy];
+        summary.opaque_start = opaque_vert_count;
+        summary.translucent_start = translucent_vert_count;
+        if (summary.is_empty || is_buried(cy, summary, section_buffer[0])) {
+            // There is nothing visible to mesh.
+            continue;
+        }
+        if ((cy + 1) * y_shape <= min_y) {
+            // The section is entirely below the surface depth.
+            continue;
+        }
+
+        std::fill(opaque_rows.begin(), opaque_rows.end(), 0);
+        std::fill(translucent_rows.begin(), translucent_rows.end(), 0);
+
+        // Populate the rows from the block models.
         for (std::int32_t x = 0; x < x_shape; x++) {
             for (std::int32_t y = 0; y < y_shape; y++) {
+                const auto* block_ids = &section_buffer[x * x_stride + y * y_stride];
+                std::uint64_t opaque = 0;
+                std::uint64_t translucent = 0;
+                std::uint64_t has_parts = 0;
+                std::uint64_t has_cull_none = 0;
+                // Runs of the same block are common so remember the last lookup.
+                std::uint32_t last_block_id = block_ids[0];
+                std::uint8_t flags = get_block_flags(0, 0, last_block_id);
                 for (std::int32_t z = 0; z < z_shape; z++) {
-                    const auto& block_id = section_buffer[x * x_stride + y * y_stride + z];
-                    const auto& mesh = get_block_mesh(0, 0, block_id);
-                    transparency_array[(x + 1) * padded_x_stride + (y + 1) * padded_y_stride + z + 1] = mesh.transparency;
+                    if (block_ids[z] != last_block_id) {
+                        last_block_id = block_ids[z];
+                        flags = get_block_flags(0, 0, last_block_id);
+                    }
+                    const std::uint64_t mask = std::uint64_t(2) << z;
+                    opaque |= flags & BlockFlagOpaque ? mask : 0;
+                    translucent |= flags & BlockFlagTranslucent ? mask : 0;
+                    has_parts |= flags & BlockFlagHasParts ? mask : 0;
+                    has_cull_none |= flags & BlockFlagHasCullNone ? mask : 0;
                 }
+                const auto row = row_index(x, y);
+                opaque_rows[row] = opaque;
+                translucent_rows[row] = translucent;
+                has_parts_rows[row] = has_parts;
+                has_cull_none_rows[row] = has_cull_none;
+
+                std::uint64_t surface = ~std::uint64_t(0);
+                if (surface_depth) {
+                    surface = 0;
+                    const std::int64_t block_y = cy * y_shape + y;
+                    for (std::int32_t z = 0; z < z_shape; z++) {
+                        surface |= min_y_map[x * z_shape + z] <= block_y ? std::uint64_t(2) << z : 0;
+                    }
+                }
+                surface_rows[row] = surface;
             }
         }
 
@@ -85,8 +449,7 @@ void create_lod0_chunk(
             for (std::int32_t x = 0; x < x_shape; x++) {
                 for (std::int32_t z = 0; z < z_shape; z++) {
                     const auto& block_id = up_buffer[x * x_stride + 0 * y_stride + z];
-                    const auto& mesh = get_block_mesh(0, 0, block_id);
-                    transparency_array[(x + 1) * padded_x_stride + (padded_y_shape - 1) * padded_y_stride + z + 1] = mesh.transparency;
+                    set_neighbour(row_index(x, y_shape), z + 1, get_block_flags(0, 0, block_id));
                 }
             }
         }
@@ -94,181 +457,173 @@ void create_lod0_chunk(
         // Down
         auto down_it = block_arrays.find(cy - 1);
         if (down_it != block_arrays.end()) {
-            const auto& up_buffer = down_it->second->get_buffer();
+            const auto& down_buffer = down_it->second->get_buffer();
             for (std::int32_t x = 0; x < x_shape; x++) {
                 for (std::int32_t z = 0; z < z_shape; z++) {
-                    const auto& block_id = up_buffer[x * x_stride + (y_shape - 1) * y_stride + z];
-                    const auto& mesh = get_block_mesh(0, 0, block_id);
-                    transparency_array[(x + 1) * padded_x_stride + 0 * padded_y_stride + z + 1] = mesh.transparency;
+                    const auto& block_id = down_buffer[x * x_stride + (y_shape - 1) * y_stride + z];
+                    set_neighbour(row_index(x, -1), z + 1, get_block_flags(0, 0, block_id));
                 }
             }
         }
-        
-        // North
-        if (all_chunk_data[0]) {
-            const auto& neighbour_block_component = *all_chunk_data[0];
-            const auto& neighbour_sections = *neighbour_block_component.get_sections();
+
+        // Find the section at the same height in a neighbouring chunk.
+        auto get_neighbour_section = [&](size_t chunk_index, const char* name) -> const std::uint32_t* {
+            if (!all_chunk_data[chunk_index]) {
+                return nullptr;
+            }
+            const auto& neighbour_sections = *all_chunk_data[chunk_index]->get_sections();
             if (neighbour_sections.get_array_shape() != section_shape) {
-                throw std::invalid_argument("North section shape does not match.");
+                throw std::invalid_argument(std::string(name) + " section shape does not match.");
             }
             const auto& neighbour_block_arrays = neighbour_sections.get_arrays();
             auto it = neighbour_block_arrays.find(cy);
-            if (it != neighbour_block_arrays.end()) {
-                const auto& arr = it->second->get_buffer();
-                const auto& palette = neighbour_block_component.get_palette();
-                for (std::int32_t x = 0; x < x_shape; x++) {
-                    for (std::int32_t y = 0; y < y_shape; y++) {
-                        const auto& block_id = arr[x * x_stride + y * y_stride + (z_shape - 1)];
-                        const auto& mesh = get_block_mesh(0, -1, block_id);
-                        transparency_array[(x + 1) * padded_x_stride + (y + 1) * padded_y_stride + 0] = mesh.transparency;
-                    }
+            if (it == neighbour_block_arrays.end()) {
+                return nullptr;
+            }
+            return it->second->get_buffer();
+        };
+
+        // North
+        if (const auto* arr = get_neighbour_section(0, "North")) {
+            for (std::int32_t x = 0; x < x_shape; x++) {
+                for (std::int32_t y = 0; y < y_shape; y++) {
+                    const auto& block_id = arr[x * x_stride + y * y_stride + (z_shape - 1)];
+                    set_neighbour(row_index(x, y), 0, get_block_flags(0, -1, block_id));
                 }
             }
         }
 
-        // West
-        if (all_chunk_data[3]) {
-            const auto& neighbour_block_component = *all_chunk_data[3];
-            const auto& neighbour_sections = *neighbour_block_component.get_sections();
-            if (neighbour_sections.get_array_shape() != section_shape) {
-                throw std::invalid_argument("East section shape does not match.");
-            }
-            const auto& neighbour_block_arrays = neighbour_sections.get_arrays();
-            auto it = neighbour_block_arrays.find(cy);
-            if (it != neighbour_block_arrays.end()) {
-                const auto& arr = it->second->get_buffer();
-                const auto& palette = neighbour_block_component.get_palette();
-                for (std::int32_t y = 0; y < y_shape; y++) {
-                    for (std::int32_t z = 0; z < z_shape; z++) {
-                        const auto& block_id = arr[0 * x_stride + y * y_stride + z];
-                        const auto& mesh = get_block_mesh(1, 0, block_id);
-                        transparency_array[(padded_x_shape - 1) * padded_x_stride + (y + 1) * padded_y_stride + z + 1] = mesh.transparency;
-                    }
+        // East
+        if (const auto* arr = get_neighbour_section(3, "East")) {
+            for (std::int32_t y = 0; y < y_shape; y++) {
+                for (std::int32_t z = 0; z < z_shape; z++) {
+                    const auto& block_id = arr[0 * x_stride + y * y_stride + z];
+                    set_neighbour(row_index(x_shape, y), z + 1, get_block_flags(1, 0, block_id));
                 }
             }
         }
 
         // South
-        if (all_chunk_data[4]) {
-            const auto& neighbour_block_component = *all_chunk_data[4];
-            const auto& neighbour_sections = *neighbour_block_component.get_sections();
-            if (neighbour_sections.get_array_shape() != section_shape) {
-                throw std::invalid_argument("South section shape does not match.");
-            }
-            const auto& neighbour_block_arrays = neighbour_sections.get_arrays();
-            auto it = neighbour_block_arrays.find(cy);
-            if (it != neighbour_block_arrays.end()) {
-                const auto& arr = it->second->get_buffer();
-                const auto& palette = neighbour_block_component.get_palette();
-                for (std::int32_t x = 0; x < x_shape; x++) {
-                    for (std::int32_t y = 0; y < y_shape; y++) {
-                        const auto& block_id = arr[x * x_stride + y * y_stride + 0];
-                        const auto& mesh = get_block_mesh(0, 1, block_id);
-                        transparency_array[(x + 1) * padded_x_stride + (y + 1) * padded_y_stride + padded_z_shape - 1] = mesh.transparency;
-                    }
+        if (const auto* arr = get_neighbour_section(4, "South")) {
+            for (std::int32_t x = 0; x < x_shape; x++) {
+                for (std::int32_t y = 0; y < y_shape; y++) {
+                    const auto& block_id = arr[x * x_stride + y * y_stride + 0];
+                    set_neighbour(row_index(x, y), z_shape + 1, get_block_flags(0, 1, block_id));
                 }
             }
         }
 
         // West
-        if (all_chunk_data[1]) {
-            const auto& neighbour_block_component = *all_chunk_data[1];
-            const auto& neighbour_sections = *neighbour_block_component.get_sections();
-            if (neighbour_sections.get_array_shape() != section_shape) {
-                throw std::invalid_argument("West section shape does not match.");
-            }
-            const auto& neighbour_block_arrays = neighbour_sections.get_arrays();
-            auto it = neighbour_block_arrays.find(cy);
-            if (it != neighbour_block_arrays.end()) {
-                const auto& arr = it->second->get_buffer();
-                const auto& palette = neighbour_block_component.get_palette();
-                for (std::int32_t y = 0; y < y_shape; y++) {
-                    for (std::int32_t z = 0; z < z_shape; z++) {
-                        const auto& block_id = arr[(x_shape - 1) * x_stride + y * y_stride + z];
-                        const auto& mesh = get_block_mesh(-1, 0, block_id);
-                        transparency_array[0 * padded_x_stride + (y + 1) * padded_y_stride + z + 1] = mesh.transparency;
-                    }
+        if (const auto* arr = get_neighbour_section(1, "West")) {
+            for (std::int32_t y = 0; y < y_shape; y++) {
+                for (std::int32_t z = 0; z < z_shape; z++) {
+                    const auto& block_id = arr[(x_shape - 1) * x_stride + y * y_stride + z];
+                    set_neighbour(row_index(-1, y), z + 1, get_block_flags(-1, 0, block_id));
                 }
             }
         }
 
         for (std::int32_t x = 0; x < x_shape; x++) {
             for (std::int32_t y = 0; y < y_shape; y++) {
-                for (std::int32_t z = 0; z < z_shape; z++) {
+                const auto row = row_index(x, y);
+                const std::uint64_t opaque = opaque_rows[row];
+                const std::uint64_t translucent = translucent_rows[row];
+
+                // A face is culled if the neighbouring block is full and opaque or if both blocks are full translucent.
+                auto visible = [&](std::uint64_t neighbour_opaque, std::uint64_t neighbour_translucent) -> std::uint64_t {
+                    return ~(neighbour_opaque | (neighbour_translucent & translucent));
+                };
+                // The blocks in this row that have a visible face in each direction.
+                // Shifting the row moves the neighbour at z - 1 or z + 1 to bit z.
+                const std::array<std::pair<BlockMeshCullDirection, std::uint64_t>, 6> visible_faces { {
+                    { BlockMeshCullDirection::BlockMeshCullUp, visible(opaque_rows[row_index(x, y + 1)], translucent_rows[row_index(x, y + 1)]) },
+                    { BlockMeshCullDirection::BlockMeshCullDown, visible(opaque_rows[row_index(x, y - 1)], translucent_rows[row_index(x, y - 1)]) },
+                    { BlockMeshCullDirection::BlockMeshCullNorth, visible(opaque << 1, translucent << 1) },
+                    { BlockMeshCullDirection::BlockMeshCullSouth, visible(opaque >> 1, translucent >> 1) },
+                    { BlockMeshCullDirection::BlockMeshCullEast, visible(opaque_rows[row_index(x + 1, y)], translucent_rows[row_index(x + 1, y)]) },
+                    { BlockMeshCullDirection::BlockMeshCullWest, visible(opaque_rows[row_index(x - 1, y)], translucent_rows[row_index(x - 1, y)]) },
+                } };
+
+                std::uint64_t any_visible = 0;
+                for (const auto& [direction, mask] : visible_faces) {
+                    any_visible |= mask;
+                }
+                // Only visit the blocks that will add geometry.
+                std::uint64_t remaining = ((any_visible & has_parts_rows[row]) | has_cull_none_rows[row]) & surface_rows[row];
+
+                while (remaining) {
+                    const std::int32_t bit = std::countr_zero(remaining);
+                    remaining &= remaining - 1;
+                    const std::uint64_t block_mask = std::uint64_t(1) << bit;
+                    const std::int32_t z = bit - 1;
+
                     const auto& block_id = section_buffer[x * x_stride + y * y_stride + z];
                     const auto& mesh = get_block_mesh(0, 0, block_id);
+                    const float material = material_ids.empty() ? 0.0f : static_cast<float>(material_ids[block_id]);
 
-                    auto& buffer = mesh.transparency == BlockMeshTransparency::FullOpaque ? opaque_buffer : translucent_buffer;
+                    const bool is_opaque = mesh.transparency == BlockMeshTransparency::FullOpaque;
+                    auto& visible_parts = is_opaque ? opaque_parts : translucent_parts;
+                    auto& vert_count = is_opaque ? opaque_vert_count : translucent_vert_count;
 
                     auto add_part = [&](const BlockMeshPart& part, float shading) {
-                        auto add_vert = [&](size_t index, const std::tuple<float, float, float, float>& bounds) {
-                            const auto& vert = part.verts[index];
-                            size_t buffer_size = buffer.size();
-                            buffer.resize(buffer_size + sizeof(float) * 12);
-                            float* float_arr = reinterpret_cast<float*>(&buffer[buffer_size]);
-                            float_arr[0] = vert.coord.x + x;
-                            float_arr[1] = cy * y_shape + y + vert.coord.y;
-                            float_arr[2] = vert.coord.z + z;
-                            float_arr[3] = vert.texture_coord.x;
-                            float_arr[4] = vert.texture_coord.y;
-                            float_arr[5] = std::get<0>(bounds);
-                            float_arr[6] = std::get<1>(bounds);
-                            float_arr[7] = std::get<2>(bounds);
-                            float_arr[8] = std::get<3>(bounds);
-                            float_arr[9] = vert.tint.x * shading;
-                            float_arr[10] = vert.tint.y * shading;
-                            float_arr[11] = vert.tint.z * shading;
-                            };
-                        for (const auto& triangle : part.triangles) {
-                            const auto& bounds = resource_pack.texture_bounds(mesh.textures[triangle.texture_index]);
-                            add_vert(triangle.vert_index_a, bounds);
-                            add_vert(triangle.vert_index_b, bounds);
-                            add_vert(triangle.vert_index_c, bounds);
-                        }
-                        };
-
-                    auto add_part_conditional = [&](
-                        const std::optional<BlockMeshPart>& part, 
-                        std::int32_t dx, 
-                        std::int32_t dy, 
-                        std::int32_t dz,
-                        float shading
-                    ) {
-                        if (!part) {
-                            return;
-                        }
-                        std::int32_t x2 = x + dx + 1;
-                        std::int32_t y2 = y + dy + 1;
-                        std::int32_t z2 = z + dz + 1;
-
-                        switch (transparency_array[x2 * padded_x_stride + y2 * padded_y_stride + z2]) {
-                        case BlockMeshTransparency::FullOpaque:
-                            // If neighbour block is full and opque then skip.
-                            return;
-                        case BlockMeshTransparency::FullTranslucent:
-                            if (mesh.transparency == BlockMeshTransparency::FullTranslucent) {
-                                // If both blocks are full translucent then skip.
-                                return;
-                            }
-                        }
-
-                        add_part(*part, shading);
-                        };
+                        visible_parts.push_back(VisiblePart {
+                            &mesh,
+                            &part,
+                            static_cast<float>(x),
+                            static_cast<float>(cy * y_shape + y),
+                            static_cast<float>(z),
+                            shading,
+                            material });
+                        vert_count += part.triangles.size() * 3;
+                    };
 
                     const auto& parts = mesh.parts;
                     if (parts[BlockMeshCullDirection::BlockMeshCullNone]) {
                         add_part(*parts[BlockMeshCullDirection::BlockMeshCullNone], 1.0);
                     }
-                    add_part_conditional(parts[BlockMeshCullDirection::BlockMeshCullUp], 0, 1, 0, 1.0);
-                    add_part_conditional(parts[BlockMeshCullDirection::BlockMeshCullDown], 0, -1, 0, 0.55);
-                    add_part_conditional(parts[BlockMeshCullDirection::BlockMeshCullNorth], 0, 0, -1, 0.85);
-                    add_part_conditional(parts[BlockMeshCullDirection::BlockMeshCullSouth], 0, 0, 1, 0.85);
-                    add_part_conditional(parts[BlockMeshCullDirection::BlockMeshCullEast], 1, 0, 0, 0.7);
-                    add_part_conditional(parts[BlockMeshCullDirection::BlockMeshCullWest], -1, 0, 0, 0.7);
+                    for (const auto& [direction, mask] : visible_faces) {
+                        if (parts[direction] && (mask & block_mask)) {
+                            add_part(*parts[direction], FaceShading[direction]);
+                        }
+                    }
                 }
             }
         }
     }
+
+    // Second pass. The exact vertex count is now known so each buffer is allocated once.
+    auto write_parts = [&](const std::vector<VisiblePart>& visible_parts, size_t vert_count, std::vector<float>& buffer) {
+        buffer.resize(vert_count * VertexSize);
+        float* float_arr = buffer.data();
+        for (const auto& visible_part : visible_parts) {
+            const auto& part = *visible_part.part;
+            auto add_vert = [&](size_t index, const std::tuple<float, float, float, float>& bounds) {
+                const auto& vert = part.verts[index];
+                float_arr[0] = vert.coord.x + visible_part.x;
+                float_arr[1] = vert.coord.y + visible_part.y;
+                float_arr[2] = vert.coord.z + visible_part.z;
+                float_arr[3] = vert.texture_coord.x;
+                float_arr[4] = vert.texture_coord.y;
+                float_arr[5] = std::get<0>(bounds);
+                float_arr[6] = std::get<1>(bounds);
+                float_arr[7] = std::get<2>(bounds);
+                float_arr[8] = std::get<3>(bounds);
+                float_arr[9] = vert.tint.x * visible_part.shading;
+                float_arr[10] = vert.tint.y * visible_part.shading;
+                float_arr[11] = vert.tint.z * visible_part.shading;
+                float_arr[12] = visible_part.material;
+                float_arr += VertexSize;
+                };
+            for (const auto& triangle : part.triangles) {
+                const auto& bounds = resource_pack.texture_bounds(visible_part.mesh->textures[triangle.texture_index]);
+                add_vert(triangle.vert_index_a, bounds);
+                add_vert(triangle.vert_index_b, bounds);
+                add_vert(triangle.vert_index_c, bounds);
+            }
+        }
+    };
+    write_parts(opaque_parts, opaque_vert_count, opaque_buffer);
+    write_parts(translucent_parts, translucent_vert_count, translucent_buffer);
 }
 
 } // namespace Amulet
@@ -1,6 +1,11 @@
 #pragma once
 
+#include <algorithm>
+#include <array>
+#include <bit>
+#include <cstdint>
 #include <functional>
+#include <limits>
 #include <map>
 #include <memory>
 #include <optional>
@@ -24,12 +29,57 @@ namespace Amulet {
 // Self pointer must not be nullptr. All others may be nullptr.
 using ChunkData = std::array<const Amulet::BlockComponentData* const, 5>;
 
+// The number of floats in each vertex.
+// Position (3), texture coordinate (2), texture bounds (4), tint (3), material id (1)
+constexpr size_t VertexSize = 13;
+
+// The material id of each block in a palette.
+// Blocks with the same material can be shown, hidden or highlighted together when drawing.
+using MaterialIds = std::vector<std::uint32_t>;
+
+// A bit for each face of a section.
+// The bit for a face is (1 << (BlockMeshCullDirection - 1)).
+constexpr std::uint8_t AllSectionFaces = 0b111111;
+
+// A summary of the blocks in a section.
+struct SectionSummary {
+    // No block in the section has any geometry.
+    bool is_empty = false;
+    // Every block in the section is the same.
+    bool is_uniform = false;
+    // The faces of the section that are entirely covered by full opaque blocks.
+    std::uint8_t opaque_faces = 0;
+    // The index of the first vertex of the section in the opaque and translucent buffers.
+    // The vertices of each section follow the sections below it.
+    size_t opaque_start = 0;
+    size_t translucent_start = 0;
+    // A row for each x and y coordinate in the section at index x * y_shape + y.
+    // Bit z of a row is set if the block at x, y, z has any geometry.
+    // This is empty if the section is uniform or empty.
+    std::vector<std::uint64_t> occupancy;
+
+    // Is every face of the section covered by full opaque blocks.
+    bool has_opaque_shell() const { return opaque_faces == AllSectionFaces; }
+};
+
+using SectionSummaries = std::map<std::int64_t, SectionSummary>;
+
+// Mesh the chunk into the opaque and translucent vertex buffers.
+// The buffers are resized to fit the mesh exactly.
+// The summary of each section in the chunk is written to section_summaries.
+// Empty sections and uniform sections hidden by their neighbours are not meshed.
+// If surface_depth is set only the blocks at most that many blocks below the surface are meshed.
+// The surface of a column is the highest full opaque block in it or a horizontally neighbouring column.
+// Each vertex stores the material id of its block from material_ids. It is zero if material_ids is empty.
 void create_lod0_chunk(
     Amulet::AbstractOpenGLResourcePack& resource_pack,
     const std::int64_t cx,
     const std::int64_t cz,
     const ChunkData& all_chunk_data,
-    std::string& opaque_buffer,
-    std::string& translucent_buffer);
+    const std::optional<std::int64_t> surface_depth,
+    const MaterialIds& material_ids,
+    std::vector<float>& opaque_buffer,
+    std::vector<float>& translucent_buffer,
+    SectionSummaries& section_summaries);
 
 } // namespace Amulet
@@ -4,6 +4,7 @@
 #include <optional>
 #include <stdexcept>
 #include <string>
+#include <tuple>
 #include <utility>
 #include <vector>
 
@@ -22,11 +23,54 @@
 
 namespace py = pybind11;
 
+// Move a vertex buffer into a numpy array of shape (vertex_count, VertexSize).
+// The array takes ownership of the memory so the data is not copied.
+static py::array_t<float> to_vertex_array(std::vector<float>&& buffer)
+{
+	auto* owned_buffer = new std::vector<float>(std::move(buffer));
+	py::capsule owner(owned_buffer, [](void* ptr) { delete static_cast<std::vector<float>*>(ptr); });
+	return py::array_t<float>(
+		{ static_cast<py::ssize_t>(owned_buffer->size() / Amulet::VertexSize), static_cast<py::ssize_t>(Amulet::VertexSize) },
+		owned_buffer->data(),
+		owner
+	);
+}
+
 
 void init_chunk_mesher(py::module m_parent)
 {
 	auto m = m_parent.def_submodule("_chunk_mesher_lod0");
 	py::module::import("amulet.palette.block_palette");
+
+	py::class_<Amulet::SectionSummary>(m, "SectionSummary", "A summary of the blocks in a section.")
+		.def_readonly("is_empty", &Amulet::SectionSummary::is_empty, py::doc("No block in the section has any geometry."))
+		.def_readonly("is_uniform", &Amulet::SectionSummary::is_uniform, py::doc("Every block in the section is the same."))
+		.def_readonly(
+			"opaque_faces",
+			&Amulet::SectionSummary::opaque_faces,
+			py::doc("A bitmask of the faces of the section that are entirely covered by full opaque blocks. Up, Down, North, East, South, West from the least significant bit."))
+		.def_readonly(
+			"opaque_start",
+			&Amulet::SectionSummary::opaque_start,
+			py::doc("The index of the first vertex of the section in the opaque buffer."))
+		.def_readonly(
+			"translucent_start",
+			&Amulet::SectionSummary::translucent_start,
+			py::doc("The index of the first vertex of the section in the translucent buffer."))
+		.def_property_readonly(
+			"occupancy",
+			[](const Amulet::SectionSummary& self) {
+				return py::array_t<std::uint64_t>(static_cast<py::ssize_t>(self.occupancy.size()), self.occupancy.data());
+			},
+			py::doc(
+				"A row for each x and y coordinate in the section at index x * y_shape + y.\n"
+				"Bit z of a row is set if the block at x, y, z has any geometry.\n"
+				"This is empty if the section is uniform or empty."))
+		.def_property_readonly(
+			"has_opaque_shell",
+			&Amulet::SectionSummary::has_opaque_shell,
+			py::doc("Is every face of the section covered by full opaque blocks."));
+
 	m.def(
 		"create_lod0_chunk",
 		[](
@@ -37,10 +81,13 @@ void init_chunk_mesher(py::module m_parent)
 			pybind11_extensions::PyObjectCpp<std::optional<Amulet::BlockComponentData>> py_north_chunk_component,
             pybind11_extensions::PyObjectCpp<std::optional<Amulet::BlockComponentData>> py_east_chunk_component,
             pybind11_extensions::PyObjectCpp<std::optional<Amulet::BlockComponentData>> py_south_chunk_component,
-            pybind11_extensions::PyObjectCpp<std::optional<Amulet::BlockComponentData>> py_west_chunk_component
-			) -> std::pair<py::bytes, py::bytes> {
-				std::string opaque_buffer;
-				std::string translucent_buffer;
+            pybind11_extensions::PyObjectCpp<std::optional<Amulet::BlockComponentData>> py_west_chunk_component,
+			const std::optional<std::int64_t> surface_depth,
+			const Amulet::MaterialIds& material_ids
+			) -> std::tuple<py::array_t<float>, py::array_t<float>, Amulet::SectionSummaries> {
+				std::vector<float> opaque_buffer;
+				std::vector<float> translucent_buffer;
+				Amulet::SectionSummaries section_summaries;
 
 				auto get_chunk_data = [&](py::object py_obj) -> const Amulet::BlockComponentData* const {
 					if (py_obj.is_none()) {
@@ -61,10 +108,14 @@ void init_chunk_mesher(py::module m_parent)
 
 				{
 					py::gil_scoped_release gil;
-					Amulet::create_lod0_chunk(resource_pack, cx, cz, all_chunk_data, opaque_buffer, translucent_buffer);
+					Amulet::create_lod0_chunk(resource_pack, cx, cz, all_chunk_data, surface_depth, material_ids, opaque_buffer, translucent_buffer, section_summaries);
 				}
 
-				return std::make_pair(py::bytes(opaque_buffer), py::bytes(translucent_buffer));
+				return std::make_tuple(
+					to_vertex_array(std::move(opaque_buffer)),
+					to_vertex_array(std::move(translucent_buffer)),
+					std::move(section_summaries)
+				);
 		},
 		py::arg("resource_pack"),
 		py::arg("cx"),
@@ -73,6 +124,17 @@ void init_chunk_mesher(py::module m_parent)
 		py::arg("north_block_component"),
 		py::arg("east_block_component"),
 		py::arg("south_block_component"),
-		py::arg("west_block_component")
+		py::arg("west_block_component"),
+		py::arg("surface_depth") = py::none(),
+		py::arg("material_ids") = Amulet::MaterialIds(),
+		py::doc(
+			"Mesh a chunk.\n"
+			"Returns the opaque and translucent vertex arrays and a summary of each section in the chunk.\n"
+			"Each vertex array has shape (vertex_count, 13).\n"
+			"If surface_depth is not None only the blocks at most that many blocks below the surface are meshed.\n"
+			"The surface of a column is the highest full opaque block in it or a horizontally neighbouring column.\n"
+			"The last float of each vertex is the material id of its block from material_ids. "
+			"material_ids must be empty or have one value for each block in the palette."
+		)
 	);
 }
@@ -1,9 +1,62 @@
 from __future__ import annotations
 
+import collections.abc
+
 import amulet.chunk_components
 import amulet_team_3d_viewer._view_3d._resource_pack_base
+import numpy
+import numpy.typing
+
+__all__ = ["SectionSummary", "create_lod0_chunk"]
+
+class SectionSummary:
+    """
+    A summary of the blocks in a section.
+    """
+
+    @property
+    def has_opaque_shell(self) -> bool:
+        """
+        Is every face of the section covered by full opaque blocks.
+        """
+
+    @property
+    def is_empty(self) -> bool:
+        """
+        No block in the section has any geometry.
+        """
+
+    @property
+    def is_uniform(self) -> bool:
+        """
+        Every block in the section is the same.
+        """
+
+    @property
+    def occupancy(self) -> numpy.typing.NDArray[numpy.uint64]:
+        """
+        A row for each x and y coordinate in the section at index x * y_shape + y.
+        Bit z of a row is set if the block at x, y, z has any geometry.
+        This is empty if the section is uniform or empty.
+        """
+
+    @property
+    def opaque_faces(self) -> int:
+        """
+        A bitmask of the faces of the section that are entirely covered by full opaque blocks. Up, Down, North, East, South, West from the least significant bit.
+        """
+
+    @property
+    def opaque_start(self) -> int:
+        """
+        The index of the first vertex of the section in the opaque buffer.
+        """
 
-__all__ = ["create_lod0_chunk"]
+    @property
+    def translucent_start(self) -> int:
+        """
+        The index of the first vertex of the section in the translucent buffer.
+        """
 
 def create_lod0_chunk(
     resource_pack: amulet_team_3d_viewer._view_3d._resource_pack_base.AbstractOpenGLResourcePack,
@@ -14,4 +67,18 @@ def create_lod0_chunk(
     east_block_component: amulet.chunk_components.BlockComponentData | None,
     south_block_component: amulet.chunk_components.BlockComponentData | None,
     west_block_component: amulet.chunk_components.BlockComponentData | None,
-) -> tuple[bytes, bytes]: ...
+    surface_depth: int | None = None,
+    material_ids: collections.abc.Sequence[int] = [],
+) -> tuple[
+    numpy.typing.NDArray[numpy.float32],
+    numpy.typing.NDArray[numpy.float32],
+    dict[int, SectionSummary],
+]:
+    """
+    Mesh a chunk.
+    Returns the opaque and translucent vertex arrays and a summary of each section in the chunk.
+    Each vertex array has shape (vertex_count, 13).
+    If surface_depth is not None only the blocks at most that many blocks below the surface are meshed.
+    The surface of a column is the highest full opaque block in it or a horizontally neighbouring column.
+    The last float of each vertex is the material id of its block from material_ids. material_ids must be empty or have one value for each block in the palette.
+    """
@@ -0,0 +1,121 @@
+import time
+from math import ceil
+
+from PySide6.QtCore import QObject, QTimer, Qt, Signal
+
+from ._settings import render_settings
+
+# The number of seconds without user input after which the idle frame rate is used.
+IdleDelay = 1.0
+
+
+class FrameScheduler(QObject):
+    """
+    Groups input updates and repaint requests into frames.
+
+    Any number of repaint requests between two frames result in one repaint.
+    While animating (eg. when a movement key is held) a frame is run continuously and
+    :attr:`frame` is emitted once per frame so that all input can be integrated at once.
+    Frames are limited to the maximum frame rate in the render settings.
+    When there has been no user input for a while the idle frame rate is used instead.
+    This must be used from the main thread.
+    """
+
+    # Emitted at the start of each frame while animating.
+    # The argument is the number of seconds since the previous update.
+    frame = Signal(float)
+    # Emitted once per frame if a repaint was requested.
+    repaint = Signal()
+
+    def __init__(self, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._run_frame)
+        now = time.perf_counter()
+        # The time the last frame was run.
+        self._last_frame = now
+        # The time of the last user input.
+        self._last_activity = now
+        # The time of the last frame signal.
+        self._last_update = now
+        self._repaint_requested = False
+        self._animating = False
+        self._in_frame = False
+        render_settings.frame_rate_changed.connect(self._on_frame_rate_change)
+
+    @property
+    def animating(self) -> bool:
+        """Are frames being run continuously."""
+        return self._animating
+
+    def set_animating(self, animating: bool) -> None:
+        """
+        Start or stop running frames continuously.
+        This also counts as user input.
+        """
+        self.notify_activity()
+        if animating == self._animating:
+            return
+        self._animating = animating
+        if animating:
+            # Don't include the time before the animation started.
+            self._last_update = time.perf_counter()
+            self._schedule()
+
+    def notify_activity(self) -> None:
+        """Notify the scheduler of user input so that the idle frame rate is not used."""
+        now = time.perf_counter()
+        was_idle = self._is_idle(now)
+        self._last_activity = now
+        if was_idle and self._timer.isActive():
+            # Reschedule the pending frame with the faster frame rate.
+            self._timer.stop()
+            self._schedule()
+
+    def request_repaint(self) -> None:
+        """Request a repaint in the next frame."""
+        self._repaint_requested = True
+        if not self._in_frame:
+            self._schedule()
+
+    def _is_idle(self, now: float) -> bool:
+        return not self._animating and IdleDelay <= now - self._last_activity
+
+    def _frame_interval(self, now: float) -> float:
+        """The minimum number of seconds between two frames."""
+        fps = (
+            render_settings.idle_fps if self._is_idle(now) else render_settings.max_fps
+        )
+        return 1 / fps if fps else 0.0
+
+    def _schedule(self) -> None:
+        """Start the timer for the next frame if it is not already running."""
+        if self._timer.isActive():
+            return
+        now = time.perf_counter()
+        delay = self._last_frame + self._frame_interval(now) - now
+        self._timer.start(max(0, ceil(delay * 1000)))
+
+    def _on_frame_rate_change(self) -> None:
+        if self._timer.isActive():
+            self._timer.stop()
+            self._schedule()
+
+    def _run_frame(self) -> None:
+        now = time.perf_counter()
+        self._last_frame = now
+        if self._animating:
+            dt = now - self._last_update
+            self._last_update = now
+            self._in_frame = True
+            try:
+                self.frame.emit(dt)
+            finally:
+                self._in_frame = False
+        if self._repaint_requested:
+            self._repaint_requested = False
+            self.repaint.emit()
+        if self._animating:
+            self._schedule()
@@ -0,0 +1,979 @@
+from __future__ import annotations
+
+import hashlib
+import itertools
+import logging
+import os
+import shutil
+from collections.abc import Iterator
+from threading import Condition, Lock, RLock
+from weakref import ref, WeakKeyDictionary
+
+import numpy
+import numpy.typing
+
+from shiboken6 import VoidPtr
+from PySide6.QtCore import QObject, QThread, Signal
+from PySide6.QtGui import QMatrix4x4, QOpenGLContext, QOffscreenSurface
+from PySide6.QtOpenGL import (
+    QOpenGLShaderProgram,
+    QOpenGLShader,
+    QOpenGLVertexArrayObject,
+    QOpenGLBuffer,
+    QOpenGLTexture,
+)
+
+from amulet.block import BlockStack
+from amulet.chunk_components import BlockComponent
+from amulet.data_types import DimensionId
+from amulet.errors import ChunkLoadError
+from amulet.level.abc import Level, DiskLevel
+from amulet.utils.weakref import CallableWeakMethod
+
+from amulet_editor.data.paths._application import cache_directory
+from amulet_editor.models.widgets.traceback_dialog import DisplayException
+
+from ._settings import render_settings
+from ._chunk_index import RegionSize, DimensionChunkIndex, get_chunk_existence_index
+from ._resource_pack import (
+    OpenGLResourcePack,
+    DefaultTextureColour,
+    get_gl_resource_pack_container,
+)
+from ._level_geometry import (
+    Thread,
+    FloatSize,
+    GL_FLOAT,
+    GL_FALSE,
+    GL_TRIANGLES,
+    GL_CULL_FACE,
+    GL_BACK,
+    get_frustum_planes,
+    get_visible_boxes,
+)
+
+log = logging.getLogger(__name__)
+
+# The number of height samples along each side of a chunk.
+SamplesPerChunk = 2
+# Tiles are the same size as the regions of the chunk existence index.
+TileChunks = RegionSize
+# The number of height samples along each side of a tile.
+TileSamples = TileChunks * SamplesPerChunk
+# The height of samples without any blocks.
+NoHeight = -1.0e6
+# The number of chunks summarised between repaints of a tile.
+TileUpdateInterval = 64
+# The vertical range used to cull tiles.
+TileMinY = -2048.0
+TileMaxY = 4096.0
+
+TileKey = tuple[DimensionId, int, int]
+
+# Tile versions are unique so that a replaced tile never matches an old texture.
+_tile_versions = itertools.count(1)
+
+
+class HorizonTile:
+    """A low resolution summary of the surface of a tile of chunks."""
+
+    # The height and colour of the top block of each sample. (height, red, green, blue)
+    # Shape (TileSamples, TileSamples, 4) indexed by z then x.
+    samples: numpy.typing.NDArray[numpy.float32]
+    # Which chunks have been summarised. Shape (TileChunks, TileChunks) indexed by z then x.
+    summarised: numpy.typing.NDArray[numpy.bool_]
+    # Is every existing chunk summarised.
+    complete: bool
+    # A unique number that changes each time the samples change.
+    version: int
+
+    def __init__(
+        self,
+        samples: numpy.typing.NDArray[numpy.float32] | None = None,
+        summarised: numpy.typing.NDArray[numpy.bool_] | None = None,
+    ) -> None:
+        if samples is None or summarised is None:
+            samples = numpy.zeros((TileSamples, TileSamples, 4), dtype=numpy.float32)
+            samples[..., 0] = NoHeight
+            summarised = numpy.zeros((TileChunks, TileChunks), dtype=numpy.bool_)
+        self.samples = samples
+        self.summarised = summarised
+        self.complete = False
+        self.version = next(_tile_versions)
+
+
+class HorizonData(QObject):
+    """
+    Summaries of the surface of a level used to draw distant terrain.
+
+    Chunks are summarised by a background thread in tiles around every view.
+    Completed tiles are cached on disk so that they are only summarised once.
+    Chunks edited since the level was saved are summarised again but not written to disk.
+    The disk cache of a level is deleted when the level data is changed outside of the editor.
+    This must exist on the main thread.
+    """
+
+    # A tile has changed and needs repainting.
+    tile_changed = Signal()
+
+    def __init__(self, level: Level) -> None:
+        super().__init__()
+        self._level = ref[Level](level)
+        self._resource_pack_holder = get_gl_resource_pack_container(level)
+        self._chunk_index = get_chunk_existence_index(level)
+        self._lock = RLock()
+        self._condition = Condition(self._lock)
+        self._tiles: dict[TileKey, HorizonTile] = {}
+        # The dimension and chunk of each running view.
+        self._views: dict[object, tuple[DimensionId, int, int]] = {}
+        # Incremented each time a view moves so that the thread picks the nearest tile again.
+        self._view_generation = 0
+        # Whether each block is drawn and its colour. (is solid, red, green, blue)
+        self._block_summaries: dict[BlockStack, tuple[float, float, float, float]] = {}
+        # The chunks in each dimension that may differ from the saved level data.
+        self._edited_chunks: dict[DimensionId, set[tuple[int, int]]] = {}
+        # The signal handlers run in the thread changing the level, which may hold the level lock.
+        # They only set these flags. The thread acts on them.
+        self._level_changed = False
+        self._reset_pending = False
+        self._delete_cache_pending = False
+        self._thread: QThread | None = None
+
+        self._on_change = CallableWeakMethod(self._mark_changed)
+        self._on_reset = CallableWeakMethod(self._reset)
+        self._on_external_change = CallableWeakMethod(self._external_change)
+        level.changed.connect(self._on_change)
+        level.history_changed.connect(self._on_change)
+        level.external_changed.connect(self._on_external_change)
+        level.purged.connect(self._on_external_change)
+        level.closed.connect(self._on_reset)
+        self._resource_pack_holder.changed.connect(self._reset)
+        render_settings.render_distance_changed.connect(self._wake)
+
+    def __del__(self) -> None:
+        level = self._level()
+        if level is not None:
+            level.changed.disconnect(self._on_change)
+            level.history_changed.disconnect(self._on_change)
+            level.external_changed.disconnect(self._on_external_change)
+            level.purged.disconnect(self._on_external_change)
+            level.closed.disconnect(self._on_reset)
+
+    def _mark_changed(self) -> None:
+        self._level_changed = True
+
+    def _reset(self) -> None:
+        """The level data or resource pack has been replaced. Summarise everything again."""
+        self._reset_pending = True
+
+    def _external_change(self) -> None:
+        """The level data has been changed outside of the editor. The disk cache no longer matches it."""
+        self._delete_cache_pending = True
+        self._reset_pending = True
+
+    def _wake(self) -> None:
+        with self._lock:
+            self._condition.notify()
+
+    def set_view(self, view: object, dimension: DimensionId, cx: int, cz: int) -> None:
+        """
+        Summarise the tiles around a view.
+        This must be called by the main thread.
+        """
+        with self._lock:
+            location = (dimension, cx, cz)
+            if self._views.get(view) == location:
+                return
+            self._views[view] = location
+            self._view_generation += 1
+            self._condition.notify()
+        if self._thread is None:
+            self._thread = Thread(self._summary_thread)
+            self._thread.start(QThread.Priority.IdlePriority)
+
+    def remove_view(self, view: object) -> None:
+        """
+        Stop summarising the tiles around a view.
+        This must be called by the main thread.
+        """
+        with self._lock:
+            if self._views.pop(view, None) is None:
+                return
+            self._view_generation += 1
+        if not self._views and self._thread is not None:
+            self._thread.requestInterruption()
+            self._wake()
+            self._thread.wait()
+            self._thread = None
+
+    def get_tile_version(self, tile_key: TileKey) -> int | None:
+        """Get the version of a tile or None if it has no data."""
+        tile = self._tiles.get(tile_key)
+        return None if tile is None else tile.version
+
+    def get_tile_samples(self, tile_key: TileKey) -> tuple[int, bytes] | None:
+        """Get the version and a copy of the samples of a tile."""
+        with self._lock:
+            tile = self._tiles.get(tile_key)
+            if tile is None:
+                return None
+            return tile.version, tile.samples.tobytes()
+
+    def _get_wanted_tiles(self) -> Iterator[TileKey]:
+        """
+        Get the tiles around the views, nearest first.
+        This must be called with the lock acquired.
+        """
+        distance = render_settings.horizon_distance
+        if not distance:
+            return
+        for dimension, cx, cz in self._views.values():
+            min_rx = (cx - distance) // TileChunks
+            max_rx = (cx + distance) // TileChunks
+            min_rz = (cz - distance) // TileChunks
+            max_rz = (cz + distance) // TileChunks
+            rx = cx // TileChunks
+            rz = cz // TileChunks
+            for rx_, rz_ in sorted(
+                (
+                    (x, z)
+                    for x in range(min_rx, max_rx + 1)
+                    for z in range(min_rz, max_rz + 1)
+                ),
+                key=lambda tile: max(abs(tile[0] - rx), abs(tile[1] - rz)),
+            ):
+                yield dimension, rx_, rz_
+
+    def _summary_thread(self) -> None:
+        with DisplayException("Error in horizon thread."):
+            while not QThread.currentThread().isInterruptionRequested():
+                level = self._level()
+                if level is None:
+                    return
+                if self._delete_cache_pending:
+                    self._delete_cache_pending = False
+                    self._delete_level_cache(level)
+                if self._reset_pending:
+                    self._reset_pending = False
+                    with self._lock:
+                        self._tiles.clear()
+                        self._edited_chunks.clear()
+                        self._block_summaries.clear()
+                    self.tile_changed.emit()
+                if self._level_changed:
+                    self._level_changed = False
+                    self._update_edited_chunks(level)
+
+                with self._lock:
+                    if not self._resource_pack_holder.loaded:
+                        self._condition.wait(1.0)
+                        continue
+                    resource_pack = self._resource_pack_holder.resource_pack
+                    wanted_tiles = list(self._get_wanted_tiles())
+                    # Forget the tiles no view is near.
+                    wanted_set = set(wanted_tiles)
+                    for key in [key for key in self._tiles if key not in wanted_set]:
+                        del self._tiles[key]
+                    tile_key = next(
+                        (
+                            key
+                            for key in wanted_tiles
+                            if key not in self._tiles or not self._tiles[key].complete
+                        ),
+                        None,
+                    )
+                    if tile_key is None:
+                        # Everything is summarised. Wake up once in a while to check for level changes.
+                        self._condition.wait(1.0)
+                        continue
+                    generation = self._view_generation
+
+                try:
+                    chunk_index = self._chunk_index.get_dimension(tile_key[0])
+                except RuntimeError:
+                    # The level has been closed.
+                    return
+                self._summarise_tile(
+                    level, resource_pack, chunk_index, tile_key, generation
+                )
+
+    def _update_edited_chunks(self, level: Level) -> None:
+        """Mark the chunks changed since the level was saved as needing a new summary."""
+        with self._lock:
+            dimensions = {dimension for dimension, _, _ in self._tiles}
+        edited_chunks = {}
+        with level.lock_shared():
+            if not level.is_open():
+                return
+            for dimension_id in dimensions:
+                edited_chunks[dimension_id] = level.get_dimension(
+                    dimension_id
+                ).changed_chunk_coords()
+        with self._lock:
+            for dimension_id, chunk_coords in edited_chunks.items():
+                # Chunks reverted to their saved state are no longer reported so check the previous set again.
+                for cx, cz in chunk_coords | self._edited_chunks.get(
+                    dimension_id, set()
+                ):
+                    tile = self._tiles.get(
+                        (dimension_id, cx // TileChunks, cz // TileChunks)
+                    )
+                    if tile is not None:
+                        tile.summarised[cz % TileChunks, cx % TileChunks] = False
+                        tile.complete = False
+                self._edited_chunks[dimension_id] = chunk_coords
+
+    def _summarise_tile(
+        self,
+        level: Level,
+        resource_pack: OpenGLResourcePack,
+        chunk_index: DimensionChunkIndex,
+        tile_key: TileKey,
+        generation: int,
+    ) -> None:
+        """
+        Summarise the chunks in a tile that have not been summarised.
+        This stops early if a view moves so that the nearest tile is processed first.
+        """
+        dimension_id, rx, rz = tile_key
+        tile = self._tiles.get(tile_key)
+        if tile is None:
+            tile = self._load_tile(level, resource_pack, tile_key)
+            with self._lock:
+                self._tiles[tile_key] = tile
+            self.tile_changed.emit()
+
+        count = 0
+        for dz in range(TileChunks):
+            for dx in range(TileChunks):
+                if tile.summarised[dz, dx]:
+                    continue
+                if (
+                    QThread.currentThread().isInterruptionRequested()
+                    or generation != self._view_generation
+                    or self._reset_pending
+                ):
+                    if count:
+                        self.tile_changed.emit()
+                    return
+                cx = rx * TileChunks + dx
+                cz = rz * TileChunks + dz
+                samples = None
+                if chunk_index.exists(cx, cz):
+                    samples = self._summarise_chunk(
+                        level, resource_pack, dimension_id, cx, cz
+                    )
+                with self._lock:
+                    if samples is not None:
+                        tile.samples[
+                            dz * SamplesPerChunk : (dz + 1) * SamplesPerChunk,
+                            dx * SamplesPerChunk : (dx + 1) * SamplesPerChunk,
+                        ] = samples
+                        tile.version = next(_tile_versions)
+                    tile.summarised[dz, dx] = True
+                count += 1
+                if count % TileUpdateInterval == 0:
+                    self.tile_changed.emit()
+
+        tile.complete = True
+        if count:
+            self._save_tile(level, resource_pack, tile_key, tile)
+            self.tile_changed.emit()
+
+    def _get_block_summary(
+        self, resource_pack: OpenGLResourcePack, block_stack: BlockStack
+    ) -> tuple[float, float, float, float]:
+        """Get whether a block is drawn and the colour of its top face. (is solid, red, green, blue)"""
+        summary = self._block_summaries.get(block_stack)
+        if summary is None:
+            mesh = resource_pack.get_block_model(block_stack)
+            parts = mesh.parts
+            # Prefer the top face.
+            part = next(
+                (
+                    part
+                    for part in (parts[1], parts[0], *parts[2:])
+                    if part is not None and part.triangles
+                ),
+                None,
+            )
+            if part is None:
+                summary = (0.0, *DefaultTextureColour)
+            else:
+                triangle = part.triangles[0]
+                red, green, blue = resource_pack.texture_colour(
+                    mesh.textures[triangle.texture_index]
+                )
+                tint = part.verts[triangle.vert_index_a].tint
+                summary = (1.0, red * tint.x, green * tint.y, blue * tint.z)
+            self._block_summaries[block_stack] = summary
+        return summary
+
+    def _summarise_chunk(
+        self,
+        level: Level,
+        resource_pack: OpenGLResourcePack,
+        dimension_id: DimensionId,
+        cx: int,
+        cz: int,
+    ) -> numpy.typing.NDArray[numpy.float32] | None:
+        """
+        Find the height and colour of the top block at each sample of a chunk.
+
+        :return: An array of shape (SamplesPerChunk, SamplesPerChunk, 4) indexed by z then x or None if the chunk has no blocks.
+        """
+        with level.lock_shared():
+            if not level.is_open():
+                return None
+            try:
+                chunk = (
+                    level.get_dimension(dimension_id)
+                    .get_chunk_handle(cx, cz)
+                    .get([BlockComponent.ComponentID])
+                )
+            except ChunkLoadError:
+                return None
+        if not isinstance(chunk, BlockComponent):
+            return None
+
+        block_component = chunk.block
+        block_summaries = numpy.array(
+            [
+                self._get_block_summary(resource_pack, block_stack)
+                for block_stack in block_component.palette
+            ],
+            dtype=numpy.float32,
+        ).reshape(-1, 4)
+        is_solid = block_summaries[:, 0] > 0
+        sections = block_component.sections
+        x_shape, y_shape, z_shape = sections.array_shape
+        # Sample the column at the centre of each cell.
+        x_step = x_shape // SamplesPerChunk
+        z_step = z_shape // SamplesPerChunk
+
+        # Indexed by x then z.
+        samples = numpy.zeros(
+            (SamplesPerChunk, SamplesPerChunk, 4), dtype=numpy.float32
+        )
+        samples[..., 0] = NoHeight
+        remaining = numpy.ones((SamplesPerChunk, SamplesPerChunk), dtype=numpy.bool_)
+        for cy in sorted(sections.keys(), reverse=True):
+            # Shape (SamplesPerChunk, y_shape, SamplesPerChunk)
+            blocks = numpy.asarray(sections[cy])[
+                x_step // 2 :: x_step, :, z_step // 2 :: z_step
+            ]
+            solid = is_solid[blocks]
+            found = solid.any(axis=1) & remaining
+            if not found.any():
+                continue
+            # The highest solid block in each column.
+            top = y_shape - 1 - numpy.argmax(solid[:, ::-1, :], axis=1)
+            xs, zs = numpy.nonzero(found)
+            ys = top[found]
+            samples[xs, zs, 0] = cy * y_shape + ys + 1
+            samples[xs, zs, 1:] = block_summaries[blocks[xs, ys, zs], 1:]
+            remaining &= ~found
+            if not remaining.any():
+                break
+        return samples.transpose(1, 0, 2)
+
+    @staticmethod
+    def _get_level_cache_path(level: Level) -> str | None:
+        """Get the directory of the disk cache of a level or None if the level is not on disk."""
+        if not isinstance(level, DiskLevel):
+            return None
+        level_key = hashlib.sha1(level.path.encode("utf-8")).hexdigest()
+        return os.path.join(cache_directory(), "horizon", level_key)
+
+    def _get_tile_path(
+        self, level: Level, resource_pack: OpenGLResourcePack, tile_key: TileKey
+    ) -> str | None:
+        """Get the path of the disk cache of a tile or None if the level is not on disk."""
+        level_path = self._get_level_cache_path(level)
+        if level_path is None:
+            return None
+        dimension_id, rx, rz = tile_key
+        resource_pack_key = hashlib.sha1(resource_pack.cache_digest).hexdigest()
+        dimension_key = hashlib.sha1(dimension_id.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(
+            level_path, resource_pack_key, dimension_key, f"{rx}.{rz}.npz"
+        )
+
+    def _delete_level_cache(self, level: Level) -> None:
+        """Delete every cached tile of a level."""
+        path = self._get_level_cache_path(level)
+        if path is None or not os.path.isdir(path):
+            return
+        try:
+            shutil.rmtree(path)
+        except Exception:
+            # The cache is an optimisation. Failing to delete it must not break anything.
+            log.exception(f"Could not delete the horizon cache {path}")
+
+    def _load_tile(
+        self, level: Level, resource_pack: OpenGLResourcePack, tile_key: TileKey
+    ) -> HorizonTile:
+        """Load a tile from the disk cache. A missing or invalid cache gives an empty tile."""
+        path = self._get_tile_path(level, resource_pack, tile_key)
+        if path is None or not os.path.isfile(path):
+            return HorizonTile()
+        try:
+            with numpy.load(path) as data:
+                samples = data["samples"]
+                summarised = data["summarised"]
+            if samples.shape != (TileSamples, TileSamples, 4) or summarised.shape != (
+                TileChunks,
+                TileChunks,
+            ):
+                raise ValueError("The tile has the wrong shape.")
+        except Exception:
+            log.exception(f"Could not load the horizon tile {path}")
+            return HorizonTile()
+        tile = HorizonTile(
+            samples.astype(numpy.float32), summarised.astype(numpy.bool_)
+        )
+        # The edited chunks may not match the cached data.
+        dimension_id, rx, rz = tile_key
+        with self._lock:
+            for cx, cz in self._edited_chunks.get(dimension_id, ()):
+                if cx // TileChunks == rx and cz // TileChunks == rz:
+                    tile.summarised[cz % TileChunks, cx % TileChunks] = False
+        return tile
+
+    def _save_tile(
+        self,
+        level: Level,
+        resource_pack: OpenGLResourcePack,
+        tile_key: TileKey,
+        tile: HorizonTile,
+    ) -> None:
+        """Write a tile to the disk cache. Edited chunks are not saved."""
+        path = self._get_tile_path(level, resource_pack, tile_key)
+        if path is None:
+            return
+        dimension_id, rx, rz = tile_key
+        with self._lock:
+            samples = tile.samples.copy()
+            summarised = tile.summarised.copy()
+            for cx, cz in self._edited_chunks.get(dimension_id, ()):
+                if cx // TileChunks == rx and cz // TileChunks == rz:
+                    summarised[cz % TileChunks, cx % TileChunks] = False
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "wb") as f:
+                numpy.savez(f, samples=samples, summarised=summarised)
+            os.replace(temp_path, path)
+        except Exception:
+            # The cache is an optimisation. Failing to write it must not break anything.
+            log.exception(f"Could not save the horizon tile {path}")
+
+
+_lock = Lock()
+_level_data: WeakKeyDictionary[Level, HorizonData] = WeakKeyDictionary()
+
+
+def get_horizon_data(level: Level) -> HorizonData:
+    """
+    Get the horizon summaries of a level.
+    This must be called by the main thread.
+    """
+    with _lock:
+        horizon_data = _level_data.get(level)
+        if horizon_data is None:
+            horizon_data = _level_data[level] = HorizonData(level)
+        return horizon_data
+
+
+def create_horizon_grid() -> numpy.typing.NDArray[numpy.float32]:
+    """
+    Create the mesh shared by all horizon tiles.
+    Each vertex is the corner of a sample. The shader reads the height and colour from the tile texture.
+
+    :return: An array of shape (TileSamples * TileSamples * 6, 2). (x corner, z corner)
+    """
+    quad = numpy.array(
+        [(0, 0), (0, 1), (1, 1), (0, 0), (1, 1), (1, 0)], dtype=numpy.float32
+    )
+    x, z = numpy.meshgrid(
+        numpy.arange(TileSamples, dtype=numpy.float32),
+        numpy.arange(TileSamples, dtype=numpy.float32),
+    )
+    corners = numpy.stack((x.ravel(), z.ravel()), axis=1)
+    return (corners[:, None, :] + quad[None, :, :]).reshape(-1, 2)
+
+
+HorizonVertexShaderSource = f"""#version 150
+            // The corner of a sample in the tile.
+            in vec2 corner;
+
+            out vec3 fColour;
+            out float fMissing;
+            out vec2 fWorld;
+
+            uniform mat4 transformation_matrix;
+            // The world x and z coordinate of the tile.
+            uniform vec2 tile_origin;
+            // The height and colour of each sample.
+            uniform sampler2D samples;
+
+            const int tile_samples = {TileSamples};
+            const float sample_size = {16 // SamplesPerChunk}.0;
+
+            vec4 get_sample(ivec2 cell) {{
+                return texelFetch(samples, clamp(cell, ivec2(0), ivec2(tile_samples - 1)), 0);
+            }}
+
+            void main() {{
+                ivec2 cell = ivec2(corner);
+                // Average the samples sharing this corner.
+                float height = 0.0;
+                vec3 colour = vec3(0.0);
+                float count = 0.0;
+                for (int dz = -1; dz <= 0; dz++) {{
+                    for (int dx = -1; dx <= 0; dx++) {{
+                        vec4 value = get_sample(cell + ivec2(dx, dz));
+                        if (value.x > {NoHeight / 2}) {{
+                            height += value.x;
+                            colour += value.yzw;
+                            count += 1.0;
+                        }}
+                    }}
+                }}
+                fMissing = count == 0.0 ? 1.0 : 0.0;
+                count = max(count, 1.0);
+                height /= count;
+                colour /= count;
+
+                // Shade slopes facing away from the light.
+                vec4 previous = get_sample(cell - ivec2(1));
+                vec4 next = get_sample(cell);
+                float shading = 1.0;
+                if (previous.x > {NoHeight / 2} && next.x > {NoHeight / 2}) {{
+                    shading = clamp(1.0 + (next.x - previous.x) * 0.03, 0.6, 1.15);
+                }}
+
+                fWorld = tile_origin + corner * sample_size;
+                gl_Position = transformation_matrix * vec4(fWorld.x, height, fWorld.y, 1.0);
+                fColour = colour * shading;
+            }}"""
+
+HorizonFragmentShaderSource = """#version 150
+            in vec3 fColour;
+            in float fMissing;
+            in vec2 fWorld;
+
+            out vec4 outColor;
+
+            // The area drawn by the chunk geometry. (min x, min z, max x, max z)
+            uniform vec4 inner_bounds;
+
+            void main(){
+                if (fMissing > 0.0)
+                    discard;
+                if (all(greaterThanEqual(fWorld, inner_bounds.xy)) && all(lessThan(fWorld, inner_bounds.zw)))
+                    discard;
+                outColor = vec4(fColour * 0.85, 1.0);
+            }"""
+
+
+class HorizonGLData:
+    """All data owned by one view that only exists after OpenGL initialisation."""
+
+    context: QOpenGLContext
+    program: QOpenGLShaderProgram
+    matrix_location: int
+    tile_origin_location: int
+    inner_bounds_location: int
+    vao: QOpenGLVertexArrayObject
+    vbo: QOpenGLBuffer
+    vertex_count: int
+    # The texture of each tile and the tile version it was created from.
+    textures: dict[TileKey, tuple[int, QOpenGLTexture]]
+
+    def __init__(
+        self,
+        context: QOpenGLContext,
+        program: QOpenGLShaderProgram,
+        matrix_location: int,
+        tile_origin_location: int,
+        inner_bounds_location: int,
+        vao: QOpenGLVertexArrayObject,
+        vbo: QOpenGLBuffer,
+        vertex_count: int,
+    ):
+        self.context = context
+        self.program = program
+        self.matrix_location = matrix_location
+        self.tile_origin_location = tile_origin_location
+        self.inner_bounds_location = inner_bounds_location
+        self.vao = vao
+        self.vbo = vbo
+        self.vertex_count = vertex_count
+        self.textures = {}
+
+
+class HorizonGeometry(QObject):
+    """
+    Draws the terrain beyond the chunk load distance as a low resolution heightfield.
+    Each tile of chunks is drawn with one shared grid mesh and a small texture of heights and colours.
+    The area drawn by the chunk geometry is not drawn.
+    This must exist on the main thread.
+    """
+
+    _gl_data: HorizonGLData | None
+
+    # The horizon has changed and needs repainting.
+    geometry_changed = Signal()
+
+    def __init__(self, level: Level) -> None:
+        super().__init__()
+        self._data = get_horizon_data(level)
+        self._gl_data = None
+        self._running = False
+        self._dimension: DimensionId | None = None
+        self._chunk: tuple[int, int] | None = None
+        # Used to destroy the OpenGL data.
+        self._surface = QOffscreenSurface()
+        self._surface.create()
+        self._data.tile_changed.connect(self.geometry_changed.emit)
+
+    def init_gl(self) -> None:
+        """
+        Initialise the OpenGL data.
+        This must be called by the main thread with the view's context active.
+        """
+        if self._gl_data is not None:
+            raise RuntimeError("gl_data is not None.")
+        program = QOpenGLShaderProgram()
+        program.addShaderFromSourceCode(
+            QOpenGLShader.ShaderTypeBit.Vertex, HorizonVertexShaderSource
+        )
+        program.addShaderFromSourceCode(
+            QOpenGLShader.ShaderTypeBit.Fragment, HorizonFragmentShaderSource
+        )
+        program.bindAttributeLocation("corner", 0)
+        program.link()
+        program.bind()
+        matrix_location = program.uniformLocation("transformation_matrix")
+        tile_origin_location = program.uniformLocation("tile_origin")
+        inner_bounds_location = program.uniformLocation("inner_bounds")
+        program.setUniformValue1i(program.uniformLocation("samples"), 0)
+        program.release()
+
+        f = QOpenGLContext.currentContext().functions()
+        grid = create_horizon_grid()
+
+        vao = QOpenGLVertexArrayObject()
+        vao.create()
+        vao.bind()
+
+        vbo = QOpenGLBuffer()
+        vbo.create()
+        vbo.bind()
+        vbo.allocate(grid, grid.nbytes)
+
+        # corner
+        f.glEnableVertexAttribArray(0)
+        f.glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, 2 * FloatSize, VoidPtr(0))
+
+        vao.release()
+        vbo.release()
+
+        self._gl_data = HorizonGLData(
+            QOpenGLContext.currentContext(),
+            program,
+            matrix_location,
+            tile_origin_location,
+            inner_bounds_location,
+            vao,
+            vbo,
+            len(grid),
+        )
+
+    def destroy_gl(self) -> None:
+        """
+        Destroy the OpenGL data.
+        This must be called by the main thread.
+        """
+        gl_data = self._gl_data
+        if gl_data is None:
+            raise RuntimeError("gl_data is None.")
+        if gl_data.context.makeCurrent(self._surface):
+            for _, texture in gl_data.textures.values():
+                texture.destroy()
+            gl_data.vao.destroy()
+            gl_data.vbo.destroy()
+            gl_data.context.doneCurrent()
+        gl_data.textures.clear()
+        self._gl_data = None
+
+    def start(self) -> None:
+        """
+        Start summarising the tiles around the view.
+        This must be called by the main thread.
+        """
+        self._running = True
+        self._update_view()
+
+    def stop(self) -> None:
+        """
+        Stop summarising the tiles around the view.
+        This must be called by the main thread.
+        """
+        self._running = False
+        self._update_view()
+
+    def set_dimension(self, dimension: DimensionId) -> None:
+        """
+        Set the dimension the camera is in.
+        This must be called by the main thread.
+        """
+        self._dimension = dimension
+        self._update_view()
+
+    def set_location(self, cx: int, cz: int) -> None:
+        """
+        Set the chunk the camera is in.
+        This must be called by the main thread.
+        """
+        self._chunk = (cx, cz)
+        self._update_view()
+
+    def _update_view(self) -> None:
+        if self._running and self._dimension is not None and self._chunk is not None:
+            self._data.set_view(self, self._dimension, *self._chunk)
+        else:
+            self._data.remove_view(self)
+
+    def paint_gl(self, projection_matrix: QMatrix4x4, view_matrix: QMatrix4x4) -> None:
+        """
+        Draw the horizon.
+        This must be called by the main thread with the context active.
+
+        :param projection_matrix: The camera internal projection matrix.
+        :param view_matrix: The camera external matrix.
+        """
+        gl_data = self._gl_data
+        distance = render_settings.horizon_distance
+        dimension = self._dimension
+        chunk = self._chunk
+        if gl_data is None or not distance or dimension is None or chunk is None:
+            return
+        cx, cz = chunk
+        load_distance = render_settings.chunk_load_distance
+        if distance <= load_distance:
+            return
+
+        # Find the tiles in range that are not entirely covered by the chunk geometry.
+        tile_keys = [
+            (dimension, rx, rz)
+            for rx in range(
+                (cx - distance) // TileChunks, (cx + distance) // TileChunks + 1
+            )
+            for rz in range(
+                (cz - distance) // TileChunks, (cz + distance) // TileChunks + 1
+            )
+            if not (
+                cx - load_distance <= rx * TileChunks
+                and (rx + 1) * TileChunks - 1 <= cx + load_distance
+                and cz - load_distance <= rz * TileChunks
+                and (rz + 1) * TileChunks - 1 <= cz + load_distance
+            )
+        ]
+        self._prune_textures(gl_data, set(tile_keys))
+        if not tile_keys:
+            return
+
+        transform = projection_matrix * view_matrix
+        boxes = numpy.array(
+            [
+                (
+                    rx * TileChunks * 16,
+                    TileMinY,
+                    rz * TileChunks * 16,
+                    (rx + 1) * TileChunks * 16,
+                    TileMaxY,
+                    (rz + 1) * TileChunks * 16,
+                )
+                for _, rx, rz in tile_keys
+            ],
+            dtype=numpy.float64,
+        )
+        visible = get_visible_boxes(get_frustum_planes(transform), boxes)
+
+        f = QOpenGLContext.currentContext().functions()
+        f.glEnable(GL_CULL_FACE)
+        f.glCullFace(GL_BACK)
+
+        program = gl_data.program
+        program.bind()
+        program.setUniformValue(gl_data.matrix_location, transform)
+        f.glUniform4f(
+            gl_data.inner_bounds_location,
+            (cx - load_distance) * 16,
+            (cz - load_distance) * 16,
+            (cx + load_distance + 1) * 16,
+            (cz + load_distance + 1) * 16,
+        )
+        gl_data.vao.bind()
+        for tile_key, is_visible in zip(tile_keys, visible):
+            if not is_visible:
+                continue
+            texture = self._get_texture(gl_data, tile_key)
+            if texture is None:
+                continue
+            _, rx, rz = tile_key
+            f.glUniform2f(
+                gl_data.tile_origin_location,
+                rx * TileChunks * 16,
+                rz * TileChunks * 16,
+            )
+            texture.bind(0)
+            f.glDrawArrays(GL_TRIANGLES, 0, gl_data.vertex_count)
+        gl_data.vao.release()
+        program.release()
+
+    def _get_texture(
+        self, gl_data: HorizonGLData, tile_key: TileKey
+    ) -> QOpenGLTexture | None:
+        """
+        Get the texture of a tile, updating it if the tile has changed.
+        This must be called by the main thread with the context active.
+        """
+        version = self._data.get_tile_version(tile_key)
+        entry = gl_data.textures.get(tile_key)
+        if version is None:
+            return None
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        tile_samples = self._data.get_tile_samples(tile_key)
+        if tile_samples is None:
+            return None
+        version, samples = tile_samples
+        if entry is None:
+            texture = QOpenGLTexture(QOpenGLTexture.Target.Target2D)
+            texture.setSize(TileSamples, TileSamples)
+            texture.setFormat(QOpenGLTexture.TextureFormat.RGBA32F)
+            texture.setMinificationFilter(QOpenGLTexture.Filter.Nearest)
+            texture.setMagnificationFilter(QOpenGLTexture.Filter.Nearest)
+            texture.allocateStorage(
+                QOpenGLTexture.PixelFormat.RGBA, QOpenGLTexture.PixelType.Float32
+            )
+        else:
+            texture = entry[1]
+        texture.setData(
+            QOpenGLTexture.PixelFormat.RGBA, QOpenGLTexture.PixelType.Float32, samples
+        )
+        gl_data.textures[tile_key] = (version, texture)
+        return texture
+
+    @staticmethod
+    def _prune_textures(gl_data: HorizonGLData, tile_keys: set[TileKey]) -> None:
+        """
+        Destroy the textures of tiles out of range.
+        This must be called by the main thread with the context active.
+        """
+        for tile_key in [key for key in gl_data.textures if key not in tile_keys]:
+            _, texture = gl_data.textures.pop(tile_key)
+            texture.destroy()
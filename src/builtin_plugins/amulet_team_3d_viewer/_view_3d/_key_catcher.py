@@ -82,6 +82,9 @@ class KeyCatcher(QObject):
     >>> widget.installEventFilter(key_catcher)
     """
 
+    # Emitted after a key is pressed or released.
+    pressed_changed = Signal()
+
     def __init__(self, parent: QObject | None = None) -> None:
         super().__init__(parent)
         self._lock = Lock()
@@ -110,6 +113,10 @@ class KeyCatcher(QObject):
             pass
         return super().eventFilter(watched, event)
 
+    def is_pressed(self, key: KeyT) -> bool:
+        """Is the key currently held down."""
+        return key in self._pressed_buttons
+
     def _key_pressed(self, key: KeyT) -> None:
         with self._lock:
             if key not in self._pressed_buttons:
@@ -138,6 +145,7 @@ class KeyCatcher(QObject):
                         else:
                             del best_storage.timers[interval]
                     best_storage.one_shot.emit()
+        self.pressed_changed.emit()
 
     def _key_released(self, key: KeyT) -> None:
         with self._lock:
@@ -146,6 +154,7 @@ class KeyCatcher(QObject):
                     timer_data.stop()
             if key in self._pressed_buttons:
                 self._pressed_buttons.remove(key)
+        self.pressed_changed.emit()
 
     def _get_storage(self, key: KeyT, modifiers: frozenset[KeyT]) -> EventStorage:
         """Lock must be acquired when calling this"""
@@ -1,14 +1,28 @@
-from typing import Any, TypeVar, Callable, TypeAlias
-from collections.abc import Iterator, MutableMapping
+from typing import Any, TypeVar, Callable
+from collections.abc import Iterable, Iterator, MutableMapping
 import logging
 from bisect import bisect_left
-from threading import Condition, RLock
+from contextlib import contextmanager
+from threading import Condition, Lock, RLock
+from weakref import ref, WeakKeyDictionary
 import traceback
 import ctypes
+import itertools
+from math import atan2, ceil, cos, hypot, pi, sin
+
+import numpy
+import numpy.typing
 
 from shiboken6 import VoidPtr
-from PySide6.QtCore import QObject, Signal, QThreadPool, QThread
-from PySide6.QtGui import QMatrix4x4, QOpenGLContext, QOffscreenSurface
+from PySide6.QtCore import QObject, Signal, QThreadPool, QThread, QTimer
+from PySide6.QtGui import (
+    QImage,
+    QMatrix4x4,
+    QVector3D,
+    QVector4D,
+    QOpenGLContext,
+    QOffscreenSurface,
+)
 from PySide6.QtOpenGL import (
     QOpenGLShaderProgram,
     QOpenGLShader,
@@ -29,6 +43,7 @@ from OpenGL.GL import (
     GL_BLEND as _GL_BLEND,
     GL_SRC_ALPHA as _GL_SRC_ALPHA,
     GL_ONE_MINUS_SRC_ALPHA as _GL_ONE_MINUS_SRC_ALPHA,
+    GL_CLIP_DISTANCE0 as _GL_CLIP_DISTANCE0,
 )
 
 from amulet.data_types import DimensionId
@@ -39,16 +54,26 @@ from amulet_editor.models.widgets.traceback_dialog import (
     display_exception,
 )
 from ._settings import render_settings
-from ._chunk_mesher import mesh_chunk
+from ._chunk_mesher import (
+    VertexSize,
+    mesh_chunk,
+    ChunkMesh,
+    create_placeholder_grid,
+    get_placeholder_mesh,
+)
+from ._chunk_index import DimensionChunkIndex, get_chunk_existence_index
+from ._chunk_changes import ChunkKey, get_chunk_change_notifier
+from ._mesh_cache import ChunkMeshCache, CompressedMesh
 from ._resource_pack import OpenGLResourcePack, get_gl_resource_pack_container
-from ._chunk_geometry import ChunkData, ChunkGLData
+from ._chunk_geometry import ChunkData, ChunkGLData, PlaceholderType
+from ._materials import BlockFilter, MaterialState, material_index
+from ._raycast import ChunkOccupancy, RaycastHit, raycast
+from ._unload_ring import get_unload_ring, get_unload_ring_size
 
 FloatSize = ctypes.sizeof(ctypes.c_float)
 
 log = logging.getLogger(__name__)
 
-ChunkKey: TypeAlias = tuple[DimensionId, int, int]
-
 T = TypeVar("T")
 
 
@@ -69,6 +94,7 @@ GL_LEQUAL = dynamic_cast(_GL_LEQUAL, IntConstant)
 GL_BLEND = dynamic_cast(_GL_BLEND, IntConstant)
 GL_SRC_ALPHA = dynamic_cast(_GL_SRC_ALPHA, IntConstant)
 GL_ONE_MINUS_SRC_ALPHA = dynamic_cast(_GL_ONE_MINUS_SRC_ALPHA, IntConstant)
+GL_CLIP_DISTANCE0 = dynamic_cast(_GL_CLIP_DISTANCE0, IntConstant)
 
 
 class Thread(QThread):
@@ -127,6 +153,14 @@ class ChunkContainer(MutableMapping[ChunkKey, ChunkData]):
         self._chunks.clear()
         self._order.clear()
 
+    def remove_chunks(self, chunk_keys: Iterable[ChunkKey]) -> None:
+        """Remove many chunks at once. This is faster than deleting them one at a time."""
+        for chunk_key in chunk_keys:
+            del self._chunks[chunk_key]
+        self._order = [
+            chunk_key for chunk_key in self._order if chunk_key in self._chunks
+        ]
+
 
 def empty_iterator() -> Iterator[ChunkKey]:
     yield from ()
@@ -149,55 +183,497 @@ def get_grid_spiral(
         length += 1
 
 
-class LevelGeometryGLData:
+# The maximum number of chunk buffers destroyed in each event loop iteration.
+DeletionBudget = 32
+# The number of unused chunk buffers kept for reuse by new uploads.
+BufferPoolSize = 64
+
+
+# The camera speed in blocks per second below which chunks are not prefetched.
+PrefetchMinSpeed = 8.0
+# The number of seconds of travel to prefetch ahead of the camera.
+PrefetchTime = 3.0
+# The maximum number of chunks to prefetch ahead of the camera.
+PrefetchMaxDistance = 32
+# The number of chunks either side of the flight path to prefetch.
+PrefetchRadius = 2
+# The number of directions the flight direction is rounded to.
+PrefetchDirections = 16
+
+
+def get_prefetch_path(
+    dimension: DimensionId, cx: int, cz: int, angle: float, length: int, radius: int
+) -> list[ChunkKey]:
+    """
+    Get the chunks along a straight flight path ordered by distance from the start.
+
+    :param dimension: The dimension the path is in.
+    :param cx: The chunk x coordinate of the start.
+    :param cz: The chunk z coordinate of the start.
+    :param angle: The direction of travel in radians. 0 is +x and pi/2 is +z.
+    :param length: The number of chunks to follow the path for.
+    :param radius: The number of chunks either side of the path to include.
+    :return: The chunk keys.
+    """
+    dx = cos(angle)
+    dz = sin(angle)
+    seen: set[ChunkKey] = set()
+    path: list[ChunkKey] = []
+    for step in range(1, length + 1):
+        px = cx + round(dx * step)
+        pz = cz + round(dz * step)
+        for ox in range(-radius, radius + 1):
+            for oz in range(-radius, radius + 1):
+                chunk_key = (dimension, px + ox, pz + oz)
+                if chunk_key not in seen:
+                    seen.add(chunk_key)
+                    path.append(chunk_key)
+    return path
+
+
+def get_frustum_planes(transform: QMatrix4x4) -> numpy.typing.NDArray[numpy.float64]:
+    """
+    Get the planes of the view frustum from a combined projection and view matrix.
+
+    :param transform: The matrix transforming world space to clip space.
+    :return: An array of shape (6, 4). A point (x, y, z) is inside a plane if a*x + b*y + c*z + d >= 0.
+    """
+    # QMatrix4x4 stores the data in column-major order.
+    matrix = numpy.array(transform.data(), dtype=numpy.float64).reshape(4, 4).T
+    return numpy.array(
+        [
+            matrix[3] + matrix[0],
+            matrix[3] - matrix[0],
+            matrix[3] + matrix[1],
+            matrix[3] - matrix[1],
+            matrix[3] + matrix[2],
+            matrix[3] - matrix[2],
+        ]
+    )
+
+
+def get_visible_boxes(
+    planes: numpy.typing.NDArray[numpy.float64],
+    boxes: numpy.typing.NDArray[numpy.float64],
+) -> numpy.typing.NDArray[numpy.bool_]:
+    """
+    Find which axis aligned boxes are at least partially inside the view frustum.
+
+    :param planes: The frustum planes from :func:`get_frustum_planes`.
+    :param boxes: An array of shape (N, 6). (min_x, min_y, min_z, max_x, max_y, max_z)
+    :return: A bool array of shape (N,).
+    """
+    normals = planes[:, None, :3]
+    # The corner of each box furthest along each plane normal.
+    corners = numpy.where(normals >= 0, boxes[None, :, 3:], boxes[None, :, :3])
+    distances = numpy.sum(corners * normals, axis=2) + planes[:, None, 3]
+    return numpy.all(distances >= 0, axis=0)
+
+
+def get_boxes_in_box(
+    box: tuple[float, float, float, float, float, float],
+    boxes: numpy.typing.NDArray[numpy.float64],
+) -> numpy.typing.NDArray[numpy.bool_]:
+    """
+    Find which axis aligned boxes intersect a box.
+
+    :param box: The box to test against. (min_x, min_y, min_z, max_x, max_y, max_z)
+    :param boxes: An array of shape (N, 6). (min_x, min_y, min_z, max_x, max_y, max_z)
+    :return: A bool array of shape (N,).
+    """
+    box_array = numpy.array(box, dtype=numpy.float64)
+    return numpy.all(boxes[:, :3] < box_array[3:], axis=1) & numpy.all(
+        box_array[:3] < boxes[:, 3:], axis=1
+    )
+
+
+# The width of the material state texture.
+MaterialTextureWidth = 256
+
+# A coordinate beyond any geometry. Used for the unbounded sides of the clip box.
+ClipUnbounded = 1.0e9
+# The number of clip distances written by the vertex shaders. One for each side of the clip box.
+ClipPlaneCount = 6
+# The colour of the inside of geometry opened up by the clip box.
+CutColour = (0.3, 0.3, 0.35, 1.0)
+
+ClipShaderSource = """
+            // Geometry outside this world space box is clipped when the clip distances are enabled.
+            uniform vec3 clip_min;
+            uniform vec3 clip_max;
+
+            out float gl_ClipDistance[6];
+
+            void clip(vec3 world_position) {
+                gl_ClipDistance[0] = world_position.x - clip_min.x;
+                gl_ClipDistance[1] = world_position.y - clip_min.y;
+                gl_ClipDistance[2] = world_position.z - clip_min.z;
+                gl_ClipDistance[3] = clip_max.x - world_position.x;
+                gl_ClipDistance[4] = clip_max.y - world_position.y;
+                gl_ClipDistance[5] = clip_max.z - world_position.z;
+            }
+"""
+
+FragmentShaderSource = """#version 150
+            in vec2 fTexCoord;
+            in vec4 fTexOffset;
+            in vec3 fTint;
+
+            out vec4 outColor;
+
+            uniform sampler2D image;
+            // The colour of back faces. These are only drawn when the geometry is clipped.
+            uniform vec4 cut_color;
+
+            void main(){
+                if(!gl_FrontFacing){
+                    outColor = cut_color;
+                    return;
+                }
+                vec4 texColor = texture(
+                    image,
+                    vec2(
+                        mix(fTexOffset.x, fTexOffset.z, mod(fTexCoord.x, 1.0)),
+                        mix(fTexOffset.y, fTexOffset.w, mod(fTexCoord.y, 1.0))
+                    )
+                );
+                if(texColor.a < 0.02)
+                    discard;
+                texColor.xyz = texColor.xyz * fTint * 0.85;
+                outColor = texColor;
+            }"""
+
+# The number of placeholders drawn by each instanced draw call.
+PlaceholderBatchSize = 64
+
+PlaceholderVertexShaderSource = """#version 150""" + ClipShaderSource + """
+            // The y value is 0 for the floor and 1 for the ceiling.
+            in vec3 position;
+            in vec2 vTexCoord;
+
+            out vec2 fTexCoord;
+            out vec4 fTexOffset;
+            out vec3 fTint;
+
+            uniform mat4 transformation_matrix;
+            // Two values for each instance. The array size must be PlaceholderBatchSize * 2.
+            // (x offset, z offset, tint, placeholder type), (min y, max y, unused, unused)
+            uniform vec4 instances[128];
+            // The texture bounds for each placeholder type.
+            uniform vec4 texture_bounds[2];
+
+            void main() {
+                vec4 instance = instances[gl_InstanceID * 2];
+                vec4 y_range = instances[gl_InstanceID * 2 + 1];
+                vec3 world_position = vec3(
+                    position.x + instance.x,
+                    mix(y_range.x, y_range.y, position.y),
+                    position.z + instance.y
+                );
+                gl_Position = transformation_matrix * vec4(world_position, 1.0);
+                clip(world_position);
+                fTexCoord = vTexCoord;
+                fTexOffset = texture_bounds[int(instance.w)];
+                fTint = vec3(instance.z);
+            }"""
+
+ChunkVertexShaderSource = """#version 150""" + ClipShaderSource + """
+            in vec3 position;
+            in vec2 vTexCoord;
+            in vec4 vTexOffset;
+            in vec3 vTint;
+            in float vMaterial;
+
+            out vec2 fTexCoord;
+            out vec4 fTexOffset;
+            out vec3 fTint;
+
+            uniform mat4 transformation_matrix;
+            // The transform from chunk space to world space.
+            uniform mat4 model_matrix;
+            // The MaterialState of each material id in the red channel.
+            // This is only read if filter_materials is true.
+            uniform sampler2D material_states;
+            uniform bool filter_materials;
+
+            const vec3 highlight_tint = vec3(1.8, 1.5, 0.6);
+
+            void main() {
+                fTint = vTint;
+                if (filter_materials) {
+                    int material = int(vMaterial);
+                    ivec2 size = textureSize(material_states, 0);
+                    if (material < size.x * size.y) {
+                        int state = int(
+                            texelFetch(
+                                material_states,
+                                ivec2(material % size.x, material / size.x),
+                                0
+                            ).r * 255.0 + 0.5
+                        );
+                        if (state == 0) {
+                            // Every vertex of a triangle has the same material.
+                            // Moving them all outside the clip volume discards the triangle.
+                            gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+                            return;
+                        }
+                        if (state == 2) {
+                            fTint = vTint * highlight_tint;
+                        }
+                    }
+                }
+                gl_Position = transformation_matrix * vec4(position, 1.0);
+                clip((model_matrix * vec4(position, 1.0)).xyz);
+                fTexCoord = vTexCoord;
+                fTexOffset = vTexOffset;
+            }"""
+
+
+class PlaceholderGLData:
+    """The OpenGL data shared by all chunk placeholders."""
+
+    program: QOpenGLShaderProgram
+    matrix_location: int
+    instances_location: int
+    texture_bounds_location: int
+    vao: QOpenGLVertexArrayObject
+    vbo: QOpenGLBuffer
+    vertex_count: int
+
+    def __init__(
+        self,
+        program: QOpenGLShaderProgram,
+        matrix_location: int,
+        instances_location: int,
+        texture_bounds_location: int,
+        vao: QOpenGLVertexArrayObject,
+        vbo: QOpenGLBuffer,
+        vertex_count: int,
+    ):
+        self.program = program
+        self.matrix_location = matrix_location
+        self.instances_location = instances_location
+        self.texture_bounds_location = texture_bounds_location
+        self.vao = vao
+        self.vbo = vbo
+        self.vertex_count = vertex_count
+
+
+class DrawList:
+    """
+    An immutable snapshot of everything to draw.
+    Painting reads the current snapshot without locking.
+    Writers build a new snapshot and replace the old one.
+    """
+
+    # The model transform and geometry of each chunk with geometry.
+    chunks: tuple[tuple[QMatrix4x4, ChunkGLData], ...]
+    # The bounds of each chunk in chunks. Shape (N, 6)
+    chunk_boxes: numpy.typing.NDArray[numpy.float64]
+    # The placeholder instances. Shape (M, 8)
+    # (x offset, z offset, tint, type, min y, max y, unused, unused)
+    placeholders: numpy.typing.NDArray[numpy.float32]
+    # The bounds of each placeholder. Shape (M, 6)
+    placeholder_boxes: numpy.typing.NDArray[numpy.float64]
+    # The occupancy of each chunk with geometry. Used to pick blocks without locking.
+    occupancy: dict[tuple[int, int], ChunkOccupancy]
+
+    def __init__(self, chunks: ChunkContainer | None = None) -> None:
+        chunk_list = []
+        placeholder_list = []
+        self.occupancy = {}
+        if chunks is not None:
+            for (_, cx, cz), chunk_data in chunks.items():
+                if chunk_data.occupancy is not None:
+                    self.occupancy[(cx, cz)] = chunk_data.occupancy
+                geometry = chunk_data.geometry
+                if geometry is not None and geometry.vertex_count:
+                    chunk_list.append((chunk_data.model_transform, geometry))
+                placeholder = chunk_data.placeholder
+                if placeholder is not None:
+                    placeholder_list.append(
+                        (
+                            cx * 16,
+                            cz * 16,
+                            0,
+                            placeholder.type,
+                            placeholder.min_y,
+                            placeholder.max_y,
+                            0,
+                            0,
+                        )
+                    )
+        self.chunks = tuple(chunk_list)
+        self.chunk_boxes = numpy.array(
+            [geometry.bounds for _, geometry in chunk_list], dtype=numpy.float64
+        ).reshape(-1, 6)
+
+        placeholders = numpy.array(placeholder_list, dtype=numpy.float32).reshape(-1, 8)
+        # Alternate the tint in a checkerboard pattern.
+        checker = ((placeholders[:, 0] + placeholders[:, 1]) // 16) % 2 == 1
+        is_error = placeholders[:, 3] == PlaceholderType.Error
+        placeholders[:, 2] = numpy.where(
+            is_error,
+            numpy.where(checker, 0.5, 0.6),
+            numpy.where(checker, 0.1, 0.0),
+        )
+        self.placeholders = placeholders
+
+        boxes = numpy.empty((len(placeholders), 6), dtype=numpy.float64)
+        boxes[:, 0] = placeholders[:, 0]
+        boxes[:, 1] = placeholders[:, 4]
+        boxes[:, 2] = placeholders[:, 1]
+        boxes[:, 3] = placeholders[:, 0] + 16
+        boxes[:, 4] = placeholders[:, 5]
+        boxes[:, 5] = placeholders[:, 1] + 16
+        self.placeholder_boxes = boxes
+
+
+EmptyDrawList = DrawList()
+
+
+class ViewCamera:
+    """
+    The region of the level a view needs loaded.
+    All writes must be done by the main thread with the shared geometry lock.
+    """
+
+    # The dimension the camera is in.
+    dimension: DimensionId | None
+    # The chunk the camera is in.
+    chunk: tuple[int, int] | None
+    # The rounded flight direction index and distance in chunks or None if not prefetching.
+    prefetch: tuple[int, int] | None
+    # The camera chunk when far chunks were last unloaded.
+    # All loaded chunks are within the unload distance of the unload position of a camera in the same dimension.
+    unload_position: tuple[int, int] | None
+    # Does the view want chunks to be processed.
+    running: bool
+
+    def __init__(self) -> None:
+        self.dimension = None
+        self.chunk = None
+        self.prefetch = None
+        self.unload_position = None
+        self.running = False
+
+
+def interleave(iterators: Iterable[Iterator[T]]) -> Iterator[T]:
+    """Yield one value from each iterator in turn until all are exhausted."""
+    active = list(iterators)
+    while active:
+        for iterator in list(active):
+            try:
+                yield next(iterator)
+            except StopIteration:
+                active.remove(iterator)
+
+
+class SharedLevelGeometryGLData:
     """
-    All data that only exists after OpenGL initialisation.
+    All shared data that only exists while a view has initialised OpenGL.
     This is grouped together so there is only one "is not None" check.
     """
 
     # Immutable data
+    # The context the chunk buffers are created in.
+    # This shares with the global share context so every view can draw the buffers.
     context: QOpenGLContext
-    program: QOpenGLShaderProgram
-    matrix_location: int
 
     # Mutable data. All read and writes must be done with the lock.
-    # Chunk data.
-    chunks: ChunkContainer
+    # The chunk data of each dimension a camera is in.
+    chunks: dict[DimensionId, ChunkContainer]
     # Chunks that are currently being processed.
     processing_chunks: set[ChunkKey]
+    # The chunks of dimensions that are not being viewed, least recently viewed first.
+    # These are kept so that switching back does not need to mesh everything again.
+    retained_chunks: dict[DimensionId, ChunkContainer]
+
+    def __init__(self, context: QOpenGLContext):
+        self.context = context
+        self.chunks = {}
+        self.processing_chunks = set()
+        self.retained_chunks = {}
+
+    def __del__(self) -> None:
+        log.debug("SharedLevelGeometryGLData.__del__")
+
+
+class LevelGeometryGLData:
+    """
+    All data owned by one view that only exists after OpenGL initialisation.
+    This is grouped together so there is only one "is not None" check.
+    """
+
+    context: QOpenGLContext
+    program: QOpenGLShaderProgram
+    matrix_location: int
+    model_matrix_location: int
+    filter_location: int
+    placeholder: PlaceholderGLData
+    # The state of each material for the block filter. Created when a filter is first drawn.
+    material_texture: QOpenGLTexture | None
+    # The block filter and material count the texture was created for.
+    material_texture_key: tuple[BlockFilter, int] | None
+    # The vertex array of each shared chunk buffer in this context, keyed by the id of the buffer.
+    # Vertex arrays cannot be shared between contexts so each view creates its own.
+    # The buffer is stored so that the id is not reused while the entry exists.
+    vertex_arrays: dict[int, tuple[QOpenGLBuffer, QOpenGLVertexArrayObject]]
+    # The draw list the vertex arrays were last pruned against.
+    vertex_arrays_draw_list: DrawList | None
 
     def __init__(
         self,
         context: QOpenGLContext,
         program: QOpenGLShaderProgram,
         matrix_location: int,
+        model_matrix_location: int,
+        filter_location: int,
+        placeholder: PlaceholderGLData,
     ):
         self.context = context
         self.program = program
         self.matrix_location = matrix_location
-        self.chunks = ChunkContainer()
-        self.processing_chunks = set()
+        self.model_matrix_location = model_matrix_location
+        self.filter_location = filter_location
+        self.placeholder = placeholder
+        self.material_texture = None
+        self.material_texture_key = None
+        self.vertex_arrays = {}
+        self.vertex_arrays_draw_list = None
 
     def __del__(self) -> None:
         log.debug("LevelGeometryGLData.__del__")
 
 
+def _get_geometry_size(chunk_data: ChunkData) -> int:
+    """The number of bytes of OpenGL buffer data used by a chunk."""
+    geometry = chunk_data.geometry
+    if geometry is None:
+        return 0
+    return geometry.vertex_count * VertexSize * FloatSize
+
+
 # MaxThreadCount = QThread.idealThreadCount() * 4
 MaxThreadCount = 4
 
 
-class LevelGeometry(QObject):
+class SharedLevelGeometry(QObject):
     """
-    A class to render a level.
+    The chunk geometry of a level shared by all views of it.
+    Chunks are loaded around every attached camera.
+    Each chunk is meshed and uploaded once no matter how many views draw it.
+    Each view keeps its own culling and draw state.
     This must exist on the main thread.
     """
 
-    _dimension: DimensionId | None
-    _camera_chunk: tuple[int, int] | None
+    # The cameras of the attached views.
+    # This is replaced rather than modified so that other threads can iterate it.
+    _cameras: tuple[ViewCamera, ...]
     _chunk_finder: Iterator[ChunkKey]
 
     # OpenGL attributes
-    _gl_data: LevelGeometryGLData | None
+    _gl_data: SharedLevelGeometryGLData | None
     _surface: QOffscreenSurface
 
     # Threads
@@ -212,30 +688,58 @@ class LevelGeometry(QObject):
     geometry_changed = Signal()
     # Signal to call OpenGL chunk data initialisation in the main thread.
     _init_chunk_gl_signal = Signal(
-        LevelGeometryGLData,
+        SharedLevelGeometryGLData,
         tuple,  # ChunkKey,
         ChunkData,
         int,
-        bytes,
-        int,
+        object,  # ChunkMesh
+        object,  # CompressedMesh | None
     )
 
     def __init__(self, level: Level) -> None:
-        log.debug("LevelGeometry.__init__ start")
+        log.debug("SharedLevelGeometry.__init__ start")
         super().__init__()
-        self._level = level
+        # The shared geometry is stored per level so it must not keep the level alive.
+        self._level = ref[Level](level)
         self._resource_pack_holder = get_gl_resource_pack_container(level)
+        self._chunk_index = get_chunk_existence_index(level)
+        self._chunk_changes = get_chunk_change_notifier(level)
+        # Compressed meshes of recently meshed chunks.
+        # Chunks that are loaded again are uploaded from this before falling back to meshing.
+        self._mesh_cache = ChunkMeshCache(level)
         self._resource_pack: OpenGLResourcePack | None = None
         self._texture: QOpenGLTexture | None = None
+        # The texture bounds of each placeholder type. Flattened for the shader uniform.
+        self._placeholder_texture_bounds: list[float] = [0.0] * 8
 
         self._lock = RLock()
-        self._dimension = None
-        self._camera_chunk = None
+        self._cameras = ()
         self._chunk_finder = empty_iterator()
+        # The chunks ahead of the cameras that are loaded before the chunks around them.
+        self._prefetch_chunks: frozenset[ChunkKey] = frozenset()
 
         self._gl_data = None
+        # The snapshot of each dimension being viewed. These are only replaced by the main thread.
+        self._draw_lists: dict[DimensionId, DrawList] = {}
+        # The dimensions whose chunk data has changed since the draw list was created.
+        self._dirty_draw_lists: set[DimensionId] = set()
+        # Request another paint when a dirty draw list could not be rebuilt because the lock was busy.
+        # Without this the last change of a burst may not be drawn until something else repaints.
+        self._draw_list_retry_timer = QTimer(self)
+        self._draw_list_retry_timer.setSingleShot(True)
+        self._draw_list_retry_timer.setInterval(0)
+        self._draw_list_retry_timer.timeout.connect(self.geometry_changed.emit)
+        # Geometry removed from the chunks that the draw list of its dimension may still reference.
+        # This is freed when the draw list is replaced.
+        self._retired_geometry: dict[DimensionId, list[ChunkGLData]] = {}
+        # Geometry no longer referenced by anything.
+        # New uploads reuse these buffers rather than creating new ones.
+        # Buffers beyond the pool size are destroyed a few at a time so that unloading many chunks does not stall a frame.
+        self._free_geometry: list[ChunkGLData] = []
+        self._free_geometry_timer = QTimer(self)
+        self._free_geometry_timer.setInterval(0)
+        self._free_geometry_timer.timeout.connect(self._process_free_geometry)
         # Used to modify the OpenGL data.
-        # The owner surface may have been destroyed in some cases.
         self._surface = QOffscreenSurface()
         self._surface.create()
 
@@ -247,122 +751,88 @@ class LevelGeometry(QObject):
         self._worker_threads.setMaxThreadCount(MaxThreadCount)
 
         render_settings.render_distance_changed.connect(self._on_render_distance_change)
+        render_settings.render_mode_changed.connect(self._on_render_mode_change)
         self._resource_pack_holder.changed.connect(self._on_resource_pack_change)
         self._init_chunk_gl_signal.connect(self._init_chunk_gl)
+        self._chunk_changes.chunks_changed.connect(self._on_chunks_changed)
 
-    def init_gl(self) -> None:
-        """
-        Initialise the OpenGL data.
-        Must be called once by the main thread with a valid OpenGL context enabled.
-        This context must be active for all calls that need one.
-        """
-        log.debug("LevelGeometry.initializeGL start")
-        context = QOpenGLContext.currentContext()
-        # if not QOpenGLContext.areSharing(context, QOpenGLContext.globalShareContext()):
-        #     raise RuntimeError(
-        #         "The widget context is not sharing with the global context."
-        #     )
-
-        if self._gl_data is not None:
-            raise RuntimeError("gl_data is not None.")
-
-        # Initialise the shader
-        program = QOpenGLShaderProgram()
-        program.addShaderFromSourceCode(
-            QOpenGLShader.ShaderTypeBit.Vertex,
-            """#version 150
-            in vec3 position;
-            in vec2 vTexCoord;
-            in vec4 vTexOffset;
-            in vec3 vTint;
-
-            out vec2 fTexCoord;
-            out vec4 fTexOffset;
-            out vec3 fTint;
-
-            uniform mat4 transformation_matrix;
-
-            void main() {
-                gl_Position = transformation_matrix * vec4(position, 1.0);
-                fTexCoord = vTexCoord;
-                fTexOffset = vTexOffset;
-                fTint = vTint;
-            }""",
-        )
-
-        program.addShaderFromSourceCode(
-            QOpenGLShader.ShaderTypeBit.Fragment,
-            """#version 150
-            in vec2 fTexCoord;
-            in vec4 fTexOffset;
-            in vec3 fTint;
-
-            out vec4 outColor;
-
-            uniform sampler2D image;
-
-            void main(){
-                vec4 texColor = texture(
-                    image,
-                    vec2(
-                        mix(fTexOffset.x, fTexOffset.z, mod(fTexCoord.x, 1.0)),
-                        mix(fTexOffset.y, fTexOffset.w, mod(fTexCoord.y, 1.0))
-                    )
-                );
-                if(texColor.a < 0.02)
-                    discard;
-                texColor.xyz = texColor.xyz * fTint * 0.85;
-                outColor = texColor;
-            }""",
-        )
-
-        program.bindAttributeLocation("position", 0)
-        program.bindAttributeLocation("vTexCoord", 1)
-        program.bindAttributeLocation("vTexOffset", 2)
-        program.bindAttributeLocation("vTint", 3)
-        program.link()
-        program.bind()
-        matrix_location = program.uniformLocation("transformation_matrix")
-        # Init the texture location
-        texture_location = program.uniformLocation("image")
-        program.setUniformValue1i(texture_location, 0)
-        program.release()
+    def __del__(self) -> None:
+        log.debug("SharedLevelGeometry.__del__")
 
-        self._gl_data = LevelGeometryGLData(context, program, matrix_location)
-        log.debug("LevelGeometry.initializeGL end")
+    def _get_level(self) -> Level:
+        level = self._level()
+        if level is None:
+            raise RuntimeError("The level no longer exists.")
+        return level
+
+    @property
+    def texture(self) -> QOpenGLTexture | None:
+        """The texture atlas of the resource pack the geometry was created with."""
+        return self._texture
+
+    @property
+    def placeholder_texture_bounds(self) -> list[float]:
+        """The texture bounds of each placeholder type. Flattened for the shader uniform."""
+        return self._placeholder_texture_bounds
+
+    @property
+    def meshing_backlog(self) -> int:
+        """The number of chunks currently being meshed or uploaded."""
+        gl_data = self._gl_data
+        if gl_data is None:
+            return 0
+        return len(gl_data.processing_chunks)
 
-    def start(self) -> None:
+    def attach(self, camera: ViewCamera) -> None:
         """
-        Start background processing.
-        This must be called by the main thread.
-        Call this on canvas.showEvent
+        Start loading the chunks around a view's camera.
+        The first view creates the shared OpenGL data.
+        This must be called by the main thread after the global share context has been created.
         """
-        # Create and start the manager thread.
-        if self._manager_thread is None:
-            self._manager_thread = Thread(self._chunk_thread)
-            self._manager_thread.start(QThread.Priority.IdlePriority)
+        with self._lock:
+            if camera in self._cameras:
+                raise RuntimeError("The camera is already attached.")
+            if self._gl_data is None:
+                context = QOpenGLContext()
+                context.setShareContext(QOpenGLContext.globalShareContext())
+                if not context.create():
+                    raise RuntimeError("Could not create the OpenGL context.")
+                self._gl_data = SharedLevelGeometryGLData(context)
+            self._cameras = (*self._cameras, camera)
+            if camera.dimension is not None:
+                self._activate_dimension(camera.dimension, camera)
+            self._reset_chunk_finder()
+        if self._resource_pack is None and self._resource_pack_holder.loaded:
+            # The resource pack was loaded before any view was attached.
+            self._on_resource_pack_change()
+        if camera.running:
+            self._start_manager_thread()
 
-    def stop(self) -> None:
+    def detach(self, camera: ViewCamera) -> None:
         """
-        Stops background processing.
-        If any chunks are still processing they will finish.
+        Stop loading the chunks around a view's camera.
+        The chunks only that camera needed are unloaded.
+        The last view destroys the shared OpenGL data.
         This must be called by the main thread.
-        Call this on canvas.hideEvent
         """
-        if self._manager_thread is not None:
-            # Set the interruption flag.
-            self._manager_thread.requestInterruption()
-            # Wake the manager thread if it is sleeping.
-            self._wake_chunk_thread()
-            # Wait for the thread to finish.
-            self._manager_thread.wait()
-            self._manager_thread = None
+        if camera not in self._cameras:
+            raise RuntimeError("The camera is not attached.")
+        cameras = tuple(
+            attached for attached in self._cameras if attached is not camera
+        )
+        if not any(attached.running for attached in cameras):
+            self._stop_manager_thread()
+        with self._lock:
+            self._set_camera_dimension(camera, None)
+            self._cameras = cameras
+            self._reset_chunk_finder()
+        if not cameras:
+            self._destroy_gl()
 
-    def destroy_gl(self) -> None:
+    def _destroy_gl(self) -> None:
         """
-        Destroy the OpenGL data.
+        Destroy the shared OpenGL data.
         This must be called by the main thread.
-        This must be called by the context.aboutToBeDestroyed signal.
         """
         gl_data = self._gl_data
         if gl_data is None:
@@ -372,98 +842,301 @@ class LevelGeometry(QObject):
         # Wait for running chunk meshing to finish.
         self._worker_threads.waitForDone()
         self._clear_chunks()
-        self._gl_data = None
-
-    def __del__(self) -> None:
-        log.debug("SharedLevelGeometry.__del__")
-
-    def paint_gl(self, projection_matrix: QMatrix4x4, view_matrix: QMatrix4x4) -> None:
+        self._free_geometry_timer.stop()
+        with self._lock:
+            self._draw_lists.clear()
+            self._dirty_draw_lists.clear()
+            with self._shared_context(gl_data):
+                self._destroy_geometry(len(self._free_geometry))
+            self._gl_data = None
+
+    @contextmanager
+    def _shared_context(self, gl_data: SharedLevelGeometryGLData) -> Iterator[None]:
         """
-        Draw the level.
-        This must be called by the main thread with the context active.
-
-        :param projection_matrix: The camera internal projection matrix.
-        :param view_matrix: The camera external matrix.
+        Make the shared context current and restore the previously current context afterwards.
+        This must be called by the main thread.
         """
-        gl_data = self._gl_data
-        texture = self._texture
-        if gl_data is None or texture is None:
-            return
-
-        if QOpenGLContext.currentContext() is not gl_data.context:
-            raise RuntimeError("Context is different.")
-
-        f = QOpenGLContext.currentContext().functions()
+        previous_context = QOpenGLContext.currentContext()
+        previous_surface = (
+            None if previous_context is None else previous_context.surface()
+        )
+        if not gl_data.context.makeCurrent(self._surface):
+            raise RuntimeError("Could not make context current.")
+        try:
+            yield
+        finally:
+            # Other contexts only see the new buffer contents once the commands have been flushed.
+            gl_data.context.functions().glFlush()
+            gl_data.context.doneCurrent()
+            if previous_context is not None and previous_surface is not None:
+                previous_context.makeCurrent(previous_surface)
 
-        # Set OpenGL attributes.
-        f.glEnable(GL_DEPTH_TEST)
-        f.glDepthFunc(GL_LEQUAL)
-        f.glEnable(GL_BLEND)
-        f.glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        f.glEnable(GL_CULL_FACE)
-        f.glCullFace(GL_BACK)
+    def start(self, camera: ViewCamera) -> None:
+        """
+        Start background processing for a view.
+        This must be called by the main thread.
+        """
+        camera.running = True
+        if camera in self._cameras:
+            self._start_manager_thread()
 
-        # Bind the shader program
-        program = gl_data.program
-        program.bind()
+    def stop(self, camera: ViewCamera) -> None:
+        """
+        Stop background processing for a view.
+        Processing continues while any other attached view is running.
+        If any chunks are still processing they will finish.
+        This must be called by the main thread.
+        """
+        camera.running = False
+        if not any(attached.running for attached in self._cameras):
+            self._stop_manager_thread()
 
-        transform = projection_matrix * view_matrix
-        # Lock so that other threads can't write to chunks
-        with self._lock:
-            texture.bind(0)
-            for chunk_data in gl_data.chunks.values():
-                geometry = chunk_data.geometry
-                if geometry is None:
-                    continue
-                program.setUniformValue(
-                    gl_data.matrix_location, transform * chunk_data.model_transform
-                )
-                geometry.vao.bind()
-                f.glDrawArrays(GL_TRIANGLES, 0, geometry.vertex_count)
-                geometry.vao.release()
+    def _start_manager_thread(self) -> None:
+        # Create and start the manager thread.
+        if self._manager_thread is None and self._gl_data is not None:
+            self._manager_thread = Thread(self._chunk_thread)
+            self._manager_thread.start(QThread.Priority.IdlePriority)
 
-        program.release()
+    def _stop_manager_thread(self) -> None:
+        if self._manager_thread is not None:
+            # Set the interruption flag.
+            self._manager_thread.requestInterruption()
+            # Wake the manager thread if it is sleeping.
+            self._wake_chunk_thread()
+            # Wait for the thread to finish.
+            self._manager_thread.wait()
+            self._manager_thread = None
 
-    def set_dimension(self, dimension: DimensionId) -> None:
+    def get_draw_list(self, dimension: DimensionId | None) -> DrawList:
         """
-        Set the active dimension.
+        Get the latest snapshot of the chunks in a dimension.
         This must be called by the main thread.
         """
-        if dimension != self._dimension:
+        if dimension in self._dirty_draw_lists:
+            if self._lock.acquire(blocking=False):
+                # Rebuild the draw list if no other thread is using the chunk data.
+                try:
+                    self._publish_draw_list(dimension)
+                finally:
+                    self._lock.release()
+            else:
+                # Use the previous snapshot rather than waiting and try again on the next paint.
+                self._draw_list_retry_timer.start()
+        if dimension is None:
+            return EmptyDrawList
+        return self._draw_lists.get(dimension, EmptyDrawList)
+
+    def set_dimension(self, camera: ViewCamera, dimension: DimensionId) -> None:
+        """
+        Set the dimension a camera is in.
+        This must be called by the main thread.
+        """
+        if dimension != camera.dimension:
             with self._lock:
-                self._dimension = dimension
-                self._clear_chunks()
+                self._set_camera_dimension(camera, dimension)
                 self._reset_chunk_finder()
 
-    def set_location(self, cx: int, cz: int) -> None:
+    def set_location(self, camera: ViewCamera, cx: int, cz: int) -> None:
         """
-        Set the chunk the camera is in.
+        Set the chunk a camera is in.
         This must be called by the main thread.
         """
         location = (cx, cz)
-        if location != self._camera_chunk:
+        if location != camera.chunk:
+            with self._lock:
+                camera.chunk = location
+                if camera.dimension is not None:
+                    self._clear_far_chunks(camera.dimension, camera)
+                    if self._gl_data is not None:
+                        chunks = self._gl_data.chunks.get(camera.dimension)
+                        if chunks is not None:
+                            chunks.set_position(cx, cz)
+                self._reset_chunk_finder()
+
+    def set_velocity(self, camera: ViewCamera, vx: float, vz: float) -> None:
+        """
+        Set the horizontal velocity of a camera in blocks per second.
+        When moving fast the chunks ahead of the camera are loaded first.
+        This must be called by the main thread.
+        """
+        speed = hypot(vx, vz)
+        prefetch: tuple[int, int] | None
+        if speed < PrefetchMinSpeed:
+            prefetch = None
+        else:
+            # Round the direction and distance so that the path is only rebuilt when they change noticeably.
+            direction = round(atan2(vz, vx) / (2 * pi) * PrefetchDirections)
+            distance = min(PrefetchMaxDistance, ceil(speed * PrefetchTime / 16))
+            prefetch = (direction % PrefetchDirections, distance)
+        if prefetch != camera.prefetch:
             with self._lock:
-                self._camera_chunk = location
-                self._clear_far_chunks()
+                camera.prefetch = prefetch
                 self._reset_chunk_finder()
-                if self._gl_data is not None:
-                    self._gl_data.chunks.set_position(cx, cz)
+
+    def raycast(
+        self,
+        camera: ViewCamera,
+        origin: tuple[float, float, float],
+        direction: tuple[float, float, float],
+        max_distance: float,
+        bounds: tuple[float, float, float, float, float, float] | None = None,
+    ) -> RaycastHit | None:
+        """
+        Find the first block with geometry along a ray in the dimension of a camera.
+        This uses the occupancy in the latest draw list so it never waits for the lock.
+        The occupancy does not record block types so blocks hidden by a block filter are still hit.
+        This must be called by the main thread.
+
+        :param bounds: If defined geometry outside this box is ignored.
+        """
+        if camera.dimension is None:
+            return None
+        draw_list = self._draw_lists.get(camera.dimension)
+        if draw_list is None:
+            return None
+        occupancy = draw_list.occupancy
+        return raycast(
+            lambda cx, cz: occupancy.get((cx, cz)),
+            origin,
+            direction,
+            max_distance,
+            bounds,
+        )
 
     def _on_render_distance_change(self) -> None:
         with self._lock:
-            self._clear_far_chunks()
+            if self._gl_data is not None:
+                for dimension in list(self._gl_data.chunks):
+                    self._clear_far_chunks(dimension)
             self._reset_chunk_finder()
 
-    def _on_resource_pack_change(self) -> None:
+    def _on_render_mode_change(self) -> None:
+        """
+        Mesh all chunks again with the new settings.
+        The old geometry is drawn until each chunk is replaced.
+        This must be called by the main thread.
+        """
         with self._lock:
-            # Mark all existing chunks as changed
+            # The cached meshes use the old settings.
+            # Meshes still in progress are not cached because their chunk is marked as changed.
+            self._mesh_cache.clear()
             gl_data = self._gl_data
             if gl_data is None:
                 return
-            self._clear_chunks()
+            for chunks in (*gl_data.chunks.values(), *gl_data.retained_chunks.values()):
+                for chunk_data in chunks.values():
+                    chunk_data.mark_changed()
             self._reset_chunk_finder()
+
+    def _on_chunks_changed(
+        self, dimension_id: DimensionId, chunk_coords: set[tuple[int, int]]
+    ) -> None:
+        """
+        Mark the loaded chunks that changed as needing meshing.
+        This is called by the main thread once per batch of changes.
+        """
+        # A changed chunk may have been created.
+        self._chunk_index.mark_chunks_changed(dimension_id, chunk_coords)
+        with self._lock:
+            gl_data = self._gl_data
+            if gl_data is None:
+                return
+            # Retained chunks are marked so that they are meshed again when the dimension is viewed.
+            chunks = gl_data.chunks.get(dimension_id)
+            is_active = chunks is not None
+            if chunks is None:
+                chunks = gl_data.retained_chunks.get(dimension_id)
+            if chunks is None:
+                return
+            changed = False
+            for cx, cz in chunk_coords:
+                chunk_data = chunks.get((dimension_id, cx, cz))
+                if chunk_data is not None:
+                    chunk_data.mark_changed()
+                    changed = True
+            if changed and is_active:
+                self._reset_chunk_finder()
+
+    def _on_resource_pack_change(self) -> None:
+        with self._lock:
             self._resource_pack = self._resource_pack_holder.resource_pack
             self._texture = self._resource_pack.get_texture()
+            self._placeholder_texture_bounds = [
+                bound
+                for texture_path in (
+                    "amulet_ui/chunk_grid_null",
+                    "amulet_ui/chunk_grid_error",
+                )
+                for bound in self._resource_pack.texture_bounds(
+                    self._resource_pack.get_texture_path("amulet", texture_path)
+                )
+            ]
+            # The cached meshes use the old textures.
+            self._mesh_cache.clear()
+            # Mark all existing chunks as changed
+            if self._gl_data is not None:
+                self._clear_chunks()
+                self._reset_chunk_finder()
+
+    def _publish_draw_list(self, dimension: DimensionId) -> None:
+        """
+        Replace the draw list of a dimension with a snapshot of its chunk data.
+        The draw list is removed if no camera is in the dimension.
+        The retired geometry of the dimension is freed because the previous draw list no longer references it.
+        This must be called by the main thread with the lock acquired.
+        """
+        gl_data = self._gl_data
+        chunks = None if gl_data is None else gl_data.chunks.get(dimension)
+        if chunks is None:
+            self._draw_lists.pop(dimension, None)
+        else:
+            self._draw_lists[dimension] = DrawList(chunks)
+        self._dirty_draw_lists.discard(dimension)
+        retired_geometry = self._retired_geometry.pop(dimension, None)
+        if retired_geometry:
+            self._release_geometry(retired_geometry)
+
+    def _retire_geometry(self, dimension: DimensionId, geometry: ChunkGLData) -> None:
+        """
+        Free geometry once the draw list of its dimension no longer references it.
+        This must be called by the main thread with the lock acquired.
+        """
+        if dimension in self._draw_lists:
+            self._retired_geometry.setdefault(dimension, []).append(geometry)
+        else:
+            # Nothing can be drawing it.
+            self._release_geometry((geometry,))
+
+    def _release_geometry(self, geometry: Iterable[ChunkGLData]) -> None:
+        """
+        Add geometry that nothing references to the free pool.
+        This must be called by the main thread.
+        """
+        self._free_geometry.extend(geometry)
+        if BufferPoolSize < len(self._free_geometry):
+            self._free_geometry_timer.start()
+
+    def _destroy_geometry(self, count: int) -> None:
+        """
+        Destroy the oldest free geometry.
+        This must be called by the main thread with the shared context active.
+        """
+        for geometry in self._free_geometry[:count]:
+            geometry.vbo.destroy()
+        del self._free_geometry[:count]
+
+    def _process_free_geometry(self) -> None:
+        """Destroy the next batch of free geometry beyond the pool size."""
+        gl_data = self._gl_data
+        excess = len(self._free_geometry) - BufferPoolSize
+        if gl_data is None or excess <= 0:
+            self._free_geometry_timer.stop()
+            return
+        with self._shared_context(gl_data):
+            # The oldest free geometry is destroyed first.
+            self._destroy_geometry(min(excess, DeletionBudget))
+        if len(self._free_geometry) <= BufferPoolSize:
+            self._free_geometry_timer.stop()
 
     def _clear_chunks(self) -> None:
         """
@@ -475,69 +1148,248 @@ class LevelGeometry(QObject):
             return
 
         with self._lock:
-            if not gl_data.context.makeCurrent(self._surface):
-                raise RuntimeError("Could not make context current.")
-            # unload the OpenGL data.
-            for chunk in gl_data.chunks.values():
-                chunk.chunk_handle.changed.disconnect(self._reset_chunk_finder)
-                geometry = chunk.geometry
+            for dimension, chunks in (
+                *gl_data.chunks.items(),
+                *gl_data.retained_chunks.items(),
+            ):
+                self._chunk_changes.unwatch(chunks)
+                # unload the OpenGL data.
+                for chunk in chunks.values():
+                    geometry = chunk.geometry
+                    if geometry is not None:
+                        self._retire_geometry(dimension, geometry)
+                chunks.clear()
+            gl_data.retained_chunks.clear()
+            for camera in self._cameras:
+                camera.unload_position = None
+            for dimension in gl_data.chunks:
+                self._publish_draw_list(dimension)
+
+    def _set_camera_dimension(
+        self, camera: ViewCamera, dimension: DimensionId | None
+    ) -> None:
+        """
+        Move a camera to another dimension.
+        This must be called by the main thread with the lock acquired.
+        """
+        old_dimension = camera.dimension
+        camera.dimension = dimension
+        camera.unload_position = None
+        if old_dimension is not None and old_dimension != dimension:
+            self._release_dimension(old_dimension)
+        if dimension is not None and camera in self._cameras:
+            self._activate_dimension(dimension, camera)
+
+    def _activate_dimension(self, dimension: DimensionId, camera: ViewCamera) -> None:
+        """
+        Restore the retained chunks of a dimension a camera has entered.
+        This must be called by the main thread with the lock acquired.
+        """
+        gl_data = self._gl_data
+        if gl_data is None or dimension in gl_data.chunks:
+            return
+        chunks = gl_data.retained_chunks.pop(dimension, None)
+        gl_data.chunks[dimension] = ChunkContainer() if chunks is None else chunks
+        if camera.chunk is not None:
+            gl_data.chunks[dimension].set_position(*camera.chunk)
+        if chunks:
+            # The restored chunks may be anywhere so they must all be checked.
+            self._clear_far_chunks(dimension)
+        self._publish_draw_list(dimension)
+
+    def _release_dimension(self, dimension: DimensionId) -> None:
+        """
+        Unload the chunks of a dimension that a camera has left and no other camera needs.
+        If no camera remains in the dimension its chunks are retained.
+        This must be called by the main thread with the lock acquired.
+        """
+        gl_data = self._gl_data
+        if gl_data is None or dimension not in gl_data.chunks:
+            return
+        if any(camera.dimension == dimension for camera in self._cameras):
+            self._clear_far_chunks(dimension)
+        else:
+            self._retain_dimension_chunks(dimension)
+
+    def _retain_dimension_chunks(self, dimension: DimensionId) -> None:
+        """
+        Retain the chunks of a dimension that is no longer being viewed.
+        The least recently viewed chunks are destroyed if the retained geometry exceeds the budget.
+        This must be called by the main thread with the lock acquired.
+        """
+        gl_data = self._gl_data
+        if gl_data is None:
+            return
+
+        chunks = gl_data.chunks.pop(dimension)
+        if chunks:
+            gl_data.retained_chunks[dimension] = chunks
+        # The dimension is no longer drawn.
+        self._publish_draw_list(dimension)
+
+        # Unload the retained chunks over the budget.
+        # Whole dimensions are unloaded least recently viewed first.
+        # Within a dimension the furthest chunks are unloaded first.
+        budget = render_settings.retained_geometry_budget
+        sizes = {
+            dimension_id: sum(map(_get_geometry_size, chunks.values()))
+            for dimension_id, chunks in gl_data.retained_chunks.items()
+        }
+        excess = sum(sizes.values()) - budget
+        for dimension_id, chunks in list(gl_data.retained_chunks.items()):
+            if excess <= 0:
+                break
+            unloaded_chunks: list[ChunkKey] = []
+            if sizes[dimension_id] <= excess:
+                # Unload the whole dimension.
+                unloaded_chunks.extend(chunks)
+                del gl_data.retained_chunks[dimension_id]
+                excess -= sizes[dimension_id]
+            else:
+                # Chunks are iterated furthest first.
+                for chunk_key in chunks:
+                    if excess <= 0:
+                        break
+                    unloaded_chunks.append(chunk_key)
+                    excess -= _get_geometry_size(chunks[chunk_key])
+            for chunk_key in unloaded_chunks:
+                geometry = chunks[chunk_key].geometry
                 if geometry is not None:
-                    geometry.vao.destroy()
-                    geometry.vbo.destroy()
-            gl_data.chunks.clear()
-            gl_data.context.doneCurrent()
+                    self._retire_geometry(dimension_id, geometry)
+            chunks.remove_chunks(unloaded_chunks)
+            self._chunk_changes.unwatch(unloaded_chunks)
 
-    def _clear_far_chunks(self) -> None:
+    def _clear_far_chunks(
+        self, dimension: DimensionId, moved_camera: ViewCamera | None = None
+    ) -> None:
         """
-        Unload all chunk data outside the unload render distance.
+        Unload the chunks of a dimension outside the unload distance of every camera in it.
+        If a camera moved only the chunks that left its unload distance since the last call are checked.
+        Otherwise every loaded chunk is checked.
+        This is needed if the unload distance decreased or a camera left the dimension.
         This must be called by the main thread.
+
+        :param dimension: The dimension to unload chunks from.
+        :param moved_camera: The camera that moved, if any.
         """
         gl_data = self._gl_data
         if gl_data is None:
             return
-
-        if self._camera_chunk is None:
+        chunks = gl_data.chunks.get(dimension)
+        if chunks is None:
+            return
+        cameras = [
+            camera
+            for camera in self._cameras
+            if camera.dimension == dimension and camera.chunk is not None
+        ]
+        if not cameras:
             return
-        camera_dimension = self._dimension
-        camera_cx, camera_cz = self._camera_chunk
 
         unload_distance = render_settings.chunk_unload_distance
 
         with self._lock:
-            if not gl_data.context.makeCurrent(self._surface):
-                raise RuntimeError("Could not make context current.")
-            # unload the OpenGL data.
-            safe_chunks: dict[ChunkKey, ChunkData] = {}
-            for chunk_key, chunk_data in gl_data.chunks.items():
-                dimension_id, cx, cz = chunk_key
-                distance = max(
-                    abs(camera_cx - cx),
-                    abs(camera_cz - cz),
-                )
-                if unload_distance <= distance or camera_dimension != dimension_id:
+            candidates: Iterable[ChunkKey] = list(chunks)
+            if (
+                moved_camera is not None
+                and moved_camera.chunk is not None
+                and moved_camera.unload_position is not None
+            ):
+                old_cx, old_cz = moved_camera.unload_position
+                camera_cx, camera_cz = moved_camera.chunk
+                moved_camera.unload_position = moved_camera.chunk
+                if get_unload_ring_size(
+                    old_cx, old_cz, camera_cx, camera_cz, unload_distance
+                ) <= len(chunks):
+                    # It is faster to check the chunks that left the unload distance.
+                    # Only these can have left the unload distance of every camera.
+                    candidates = get_unload_ring(
+                        dimension,
+                        old_cx,
+                        old_cz,
+                        camera_cx,
+                        camera_cz,
+                        unload_distance,
+                    )
+            else:
+                for camera in cameras:
+                    camera.unload_position = camera.chunk
+
+            camera_chunks = [camera.chunk for camera in cameras]
+            unloaded_chunks: list[ChunkKey] = []
+            for chunk_key in candidates:
+                chunk_data = chunks.get(chunk_key)
+                if chunk_data is None:
+                    continue
+                _, cx, cz = chunk_key
+                if all(
+                    unload_distance <= max(abs(camera_cx - cx), abs(camera_cz - cz))
+                    for camera_cx, camera_cz in camera_chunks
+                ):
                     # Unload the chunk
-                    chunk_data.chunk_handle.changed.disconnect(self._reset_chunk_finder)
+                    unloaded_chunks.append(chunk_key)
                     geometry = chunk_data.geometry
                     if geometry is not None:
-                        geometry.vao.destroy()
-                        geometry.vbo.destroy()
-                else:
-                    # Store it to be re-added
-                    safe_chunks[chunk_key] = chunk_data
-
-            gl_data.chunks.clear()
-            gl_data.chunks.update(safe_chunks)
-            gl_data.context.doneCurrent()
+                        self._retire_geometry(dimension, geometry)
+
+            if unloaded_chunks:
+                self._chunk_changes.unwatch(unloaded_chunks)
+                chunks.remove_chunks(unloaded_chunks)
+                self._publish_draw_list(dimension)
 
     def _reset_chunk_finder(self) -> None:
-        if self._dimension is None or self._camera_chunk is None:
-            self._chunk_finder = empty_iterator()
-        else:
-            cx, cz = self._camera_chunk
-            self._chunk_finder = get_grid_spiral(
-                self._dimension, cx, cz, render_settings.chunk_load_distance
+        prefetch_paths: list[list[ChunkKey]] = []
+        spirals: list[Iterator[ChunkKey]] = []
+        for camera in self._cameras:
+            if camera.dimension is None or camera.chunk is None:
+                continue
+            cx, cz = camera.chunk
+            spirals.append(
+                get_grid_spiral(
+                    camera.dimension, cx, cz, render_settings.chunk_load_distance
+                )
             )
+            if camera.prefetch is not None:
+                # Load the chunks along the flight path first.
+                # If the direction changes the old path is dropped along with the chunks queued from it.
+                direction, distance = camera.prefetch
+                # Incremental unloading requires all chunks to be within the unload distance.
+                distance = min(
+                    distance, render_settings.chunk_unload_distance - PrefetchRadius - 1
+                )
+                prefetch_paths.append(
+                    get_prefetch_path(
+                        camera.dimension,
+                        cx,
+                        cz,
+                        direction * 2 * pi / PrefetchDirections,
+                        distance,
+                        PrefetchRadius,
+                    )
+                )
+        self._prefetch_chunks = frozenset(itertools.chain.from_iterable(prefetch_paths))
+        if spirals:
+            # The chunks around each camera are found in turn so that no view waits for the others.
+            self._chunk_finder = itertools.chain(*prefetch_paths, interleave(spirals))
             self._wake_chunk_thread()
+        else:
+            self._chunk_finder = empty_iterator()
+
+    def _is_chunk_wanted(self, chunk_key: ChunkKey) -> bool:
+        """
+        Is the chunk within the load distance of a camera or on a prefetch path.
+        Thread safe.
+        """
+        dimension, cx, cz = chunk_key
+        load_distance = render_settings.chunk_load_distance
+        for camera in self._cameras:
+            camera_chunk = camera.chunk
+            if camera.dimension != dimension or camera_chunk is None:
+                continue
+            camera_cx, camera_cz = camera_chunk
+            if max(abs(cx - camera_cx), abs(cz - camera_cz)) <= load_distance:
+                return True
+        return chunk_key in self._prefetch_chunks
 
     def _wake_chunk_thread(self) -> None:
         """
@@ -571,7 +1423,14 @@ class LevelGeometry(QObject):
             processed_count = 0
             # Loop until thread interruption is requested.
             while not QThread.currentThread().isInterruptionRequested():
+                # This may need to read the level so it must be done without the lock.
+                chunk_indexes = {
+                    dimension: self._chunk_index.get_dimension(dimension)
+                    for dimension in {camera.dimension for camera in self._cameras}
+                    if dimension is not None
+                }
                 with self._lock:
+                    self._mark_created_chunks(gl_data, chunk_indexes)
                     if (
                         self._worker_threads.maxThreadCount()
                         <= self._worker_threads.activeThreadCount()
@@ -582,6 +1441,7 @@ class LevelGeometry(QObject):
 
                     # Find the next chunk to process.
                     chunk_key: ChunkKey | None
+                    chunks: ChunkContainer | None = None
                     chunk_data: ChunkData | None = None
                     while True:
                         try:
@@ -595,12 +1455,16 @@ class LevelGeometry(QObject):
                             if chunk_key in gl_data.processing_chunks:
                                 # If the chunk is being meshed then skip.
                                 continue
-                            chunk_data = gl_data.chunks.get(chunk_key)
+                            chunks = gl_data.chunks.get(chunk_key[0])
+                            if chunks is None:
+                                # No camera is in the dimension any more.
+                                continue
+                            chunk_data = chunks.get(chunk_key)
                             if chunk_data is None or chunk_data.has_changed():
                                 # has not been generated yet or has changed since it was last generated
                                 break
 
-                    if chunk_key is None:
+                    if chunk_key is None or chunks is None:
                         # There are no more chunks to process. Sleep until woken.
                         self._manager_condition.wait()
                         continue
@@ -613,15 +1477,31 @@ class LevelGeometry(QObject):
                         transform = QMatrix4x4()
                         transform.translate(cx * 16, 0, cz * 16)
                         chunk_data = ChunkData(
-                            self._level.get_dimension(dimension).get_chunk_handle(
-                                cx, cz
-                            ),
+                            self._get_level()
+                            .get_dimension(dimension)
+                            .get_chunk_handle(cx, cz),
                             transform,
                         )
-                        chunk_data.chunk_handle.changed.connect(
-                            self._reset_chunk_finder
+                        self._chunk_changes.watch(chunk_key, chunk_data.chunk_handle)
+                        chunks[chunk_key] = chunk_data
+
+                    dimension, cx, cz = chunk_key
+                    chunk_index = chunk_indexes.get(dimension)
+                    if chunk_index is not None and not chunk_index.exists(cx, cz):
+                        # The chunk does not exist so there is nothing to mesh.
+                        # Draw the placeholder without using the thread pool or the level.
+                        self._init_chunk_gl_signal.emit(
+                            gl_data,
+                            chunk_key,
+                            chunk_data,
+                            chunk_data.chunk_state,
+                            get_placeholder_mesh(
+                                chunk_index.bounds, PlaceholderType.Empty
+                            ),
+                            None,
                         )
-                        gl_data.chunks[chunk_key] = chunk_data
+                        continue
+
                     # Add the chunk meshing job.
                     self._start_chunk_mesher(chunk_key, gl_data, chunk_data)
 
@@ -631,10 +1511,30 @@ class LevelGeometry(QObject):
                         processed_count = 0
                         self._reset_chunk_finder()
 
+    def _mark_created_chunks(
+        self,
+        gl_data: SharedLevelGeometryGLData,
+        chunk_indexes: dict[DimensionId, DimensionChunkIndex],
+    ) -> None:
+        """
+        Mark the loaded chunks that the index has found to exist since they were drawn as missing.
+        This must be called with the lock acquired.
+        """
+        for dimension, chunk_index in chunk_indexes.items():
+            created = chunk_index.pop_created()
+            chunks = gl_data.chunks.get(dimension)
+            if not created or chunks is None:
+                continue
+            for cx, cz in created:
+                chunk_data = chunks.get((dimension, cx, cz))
+                if chunk_data is not None:
+                    chunk_data.mark_changed()
+            self._reset_chunk_finder()
+
     def _start_chunk_mesher(
         self,
         chunk_key: ChunkKey,
-        level_gl_data: LevelGeometryGLData,
+        level_gl_data: SharedLevelGeometryGLData,
         chunk_data: ChunkData,
     ) -> None:
         """Needed so that the variables in the lambda don't change."""
@@ -643,7 +1543,7 @@ class LevelGeometry(QObject):
         )
 
     def _finish_chunk_mesher(
-        self, level_gl_data: LevelGeometryGLData, chunk_key: ChunkKey
+        self, level_gl_data: SharedLevelGeometryGLData, chunk_key: ChunkKey
     ) -> None:
         with self._lock:
             # Remove the chunk key from the processing set.
@@ -654,7 +1554,7 @@ class LevelGeometry(QObject):
     def _chunk_mesher(
         self,
         chunk_key: ChunkKey,
-        level_gl_data: LevelGeometryGLData,
+        level_gl_data: SharedLevelGeometryGLData,
         chunk_data: ChunkData,
     ) -> None:
         """
@@ -664,15 +1564,30 @@ class LevelGeometry(QObject):
         try:
             chunk_state = chunk_data.chunk_state
             resource_pack = self._resource_pack
-            if resource_pack is None:
+            if resource_pack is None or not self._is_chunk_wanted(chunk_key):
+                # The camera moved or turned away since the job was queued.
+                # The chunk will be queued again if it is needed.
                 self._finish_chunk_mesher(level_gl_data, chunk_key)
                 return
 
-            # Do the chunk meshing
-            dimension, cx, cz = chunk_key
-            buffer, vertex_count = mesh_chunk(
-                self._level, resource_pack, dimension, cx, cz
-            )
+            compressed_mesh: CompressedMesh | None = None
+            # Unloaded chunks that have not changed are uploaded again without meshing.
+            # The cache drops the mesh of a chunk when it changes.
+            chunk_mesh = self._mesh_cache.get(chunk_key)
+            if chunk_mesh is None:
+                # Do the chunk meshing
+                dimension, cx, cz = chunk_key
+                chunk_mesh = mesh_chunk(
+                    self._get_level(),
+                    resource_pack,
+                    dimension,
+                    cx,
+                    cz,
+                    render_settings.surface_depth,
+                )
+                if chunk_mesh.placeholder is None and render_settings.mesh_cache_budget:
+                    # Compress here so that the main thread only has to store it.
+                    compressed_mesh = CompressedMesh(chunk_mesh)
 
         except Exception as e:
             self._finish_chunk_mesher(level_gl_data, chunk_key)
@@ -689,81 +1604,66 @@ class LevelGeometry(QObject):
                 chunk_key,
                 chunk_data,
                 chunk_state,
-                buffer,
-                vertex_count,
+                chunk_mesh,
+                compressed_mesh,
             )
 
     def _init_chunk_gl(
         self,
-        level_gl_data: LevelGeometryGLData,
+        level_gl_data: SharedLevelGeometryGLData,
         chunk_key: ChunkKey,
         chunk_data: ChunkData,
         chunk_state: int,
-        buffer: bytes,
-        vertex_count: int,
+        chunk_mesh: ChunkMesh,
+        compressed_mesh: CompressedMesh | None,
     ) -> None:
         try:
             with self._lock:
                 log.debug(f"Creating OpenGL data for chunk {chunk_key}")
-                if level_gl_data.chunks.get(chunk_key) is not chunk_data:
+                dimension = chunk_key[0]
+                chunks = level_gl_data.chunks.get(dimension)
+                if chunks is None or chunks.get(chunk_key) is not chunk_data:
                     # The chunk data was removed during meshing.
                     # This could be because we changed dimension or moved away from the chunk.
                     # In these cases just discard the mesh.
                     return
 
-                if not level_gl_data.context.makeCurrent(self._surface):
-                    raise RuntimeError("Could not make context current.")
-
-                f = QOpenGLContext.currentContext().functions()
-
-                # Create the VAO.
-                vao = QOpenGLVertexArrayObject()
-                vao.create()
-                vao.bind()
-
-                # Create and associate the vbo with the vao
-                vbo = QOpenGLBuffer()
-                vbo.create()
-                vbo.bind()
-                vbo.allocate(buffer, len(buffer))
-
-                # vertex coord
-                f.glEnableVertexAttribArray(0)
-                f.glVertexAttribPointer(
-                    0, 3, GL_FLOAT, GL_FALSE, 12 * FloatSize, VoidPtr(0)
-                )
-                # texture coord
-                f.glEnableVertexAttribArray(1)
-                f.glVertexAttribPointer(
-                    1, 2, GL_FLOAT, GL_FALSE, 12 * FloatSize, VoidPtr(3 * FloatSize)
-                )
-                # texture bounds
-                f.glEnableVertexAttribArray(2)
-                f.glVertexAttribPointer(
-                    2, 4, GL_FLOAT, GL_FALSE, 12 * FloatSize, VoidPtr(5 * FloatSize)
-                )
-                # tint
-                f.glEnableVertexAttribArray(3)
-                f.glVertexAttribPointer(
-                    3, 3, GL_FLOAT, GL_FALSE, 12 * FloatSize, VoidPtr(9 * FloatSize)
-                )
-
-                vao.release()
-                vbo.release()
+                # Chunks without geometry have nothing to upload.
+                # Placeholders are drawn from the shared grid mesh.
+                geometry: ChunkGLData | None = None
+                if chunk_mesh.vertex_count:
+                    free_geometry = (
+                        self._free_geometry.pop() if self._free_geometry else None
+                    )
+                    try:
+                        with self._shared_context(level_gl_data):
+                            geometry = self._create_chunk_gl_data(
+                                chunk_key, chunk_mesh, free_geometry
+                            )
+                    except Exception:
+                        if free_geometry is not None:
+                            # Return the buffer to the pool so that it is reused or destroyed later.
+                            self._free_geometry.append(free_geometry)
+                        raise
 
-                geometry = ChunkGLData(
-                    vbo,
-                    vertex_count,
-                    vao,
-                )
                 # Update the chunk geometry
-                old_geometry = chunk_data.set_geometry(chunk_state, geometry)
+                old_geometry = chunk_data.set_geometry(
+                    chunk_state,
+                    geometry,
+                    chunk_mesh.placeholder,
+                    chunk_mesh.occupancy,
+                )
                 if old_geometry is not None:
-                    # destroy the old data.
-                    old_geometry.vao.destroy()
-                    old_geometry.vbo.destroy()
-
-                level_gl_data.context.doneCurrent()
+                    # The draw list may still use the old data.
+                    # It is freed when the draw list is replaced.
+                    self._retire_geometry(dimension, old_geometry)
+                if compressed_mesh is not None and not chunk_data.has_changed():
+                    # The chunk has not changed since it was meshed.
+                    # If it changes later the cache is notified and drops the mesh.
+                    self._mesh_cache.put(
+                        chunk_key, chunk_data.chunk_handle, compressed_mesh
+                    )
+                self._dirty_draw_lists.add(dimension)
                 self.geometry_changed.emit()
         except Exception as e:
             display_exception(
@@ -774,3 +1674,617 @@ class LevelGeometry(QObject):
         finally:
             self._finish_chunk_mesher(level_gl_data, chunk_key)
             log.debug(f"Finished creating OpenGL data for chunk {chunk_key}")
+
+    @staticmethod
+    def _create_chunk_gl_data(
+        chunk_key: ChunkKey,
+        chunk_mesh: ChunkMesh,
+        free_geometry: ChunkGLData | None = None,
+    ) -> ChunkGLData:
+        """
+        Upload the chunk mesh.
+        This must be called by the main thread with the shared context active.
+        Each view creates its own vertex array for the buffer.
+
+        :param chunk_key: The chunk the mesh is for.
+        :param chunk_mesh: The mesh to upload.
+        :param free_geometry: Unused geometry to reuse the buffer of.
+        """
+        if free_geometry is None:
+            vbo = QOpenGLBuffer()
+            vbo.create()
+        else:
+            vbo = free_geometry.vbo
+        vbo.bind()
+
+        # Allocate once and write each array in place to avoid joining them.
+        # This replaces the storage of a reused buffer.
+        vbo.allocate(sum(buffer.nbytes for buffer in chunk_mesh.buffers))
+        offset = 0
+        for buffer in chunk_mesh.buffers:
+            if buffer.nbytes:
+                vbo.write(offset, buffer, buffer.nbytes)
+                offset += buffer.nbytes
+
+        vbo.release()
+
+        # Block models may extend up to one block outside the chunk.
+        _, cx, cz = chunk_key
+        min_y, max_y = chunk_mesh.y_range
+        return ChunkGLData(
+            vbo,
+            chunk_mesh.vertex_count,
+            (cx * 16 - 1, min_y, cz * 16 - 1, cx * 16 + 17, max_y, cz * 16 + 17),
+            chunk_mesh.opaque_vertex_count,
+            chunk_mesh.section_ranges,
+        )
+
+
+_lock = Lock()
+_level_data: WeakKeyDictionary[Level, SharedLevelGeometry] = WeakKeyDictionary()
+
+
+def get_shared_level_geometry(level: Level) -> SharedLevelGeometry:
+    """
+    Get the geometry shared by all views of a level.
+    This must be called by the main thread.
+    """
+    with _lock:
+        shared_geometry = _level_data.get(level)
+        if shared_geometry is None:
+            shared_geometry = _level_data[level] = SharedLevelGeometry(level)
+        return shared_geometry
+
+
+class LevelGeometry(QObject):
+    """
+    A view of a level.
+    The chunk geometry is shared with all other views of the level.
+    Each view has its own camera, culling and draw state.
+    This must exist on the main thread.
+    """
+
+    # OpenGL attributes
+    _gl_data: LevelGeometryGLData | None
+    _surface: QOffscreenSurface
+
+    # The geometry has changed and needs repainting.
+    geometry_changed = Signal()
+
+    def __init__(self, level: Level) -> None:
+        log.debug("LevelGeometry.__init__ start")
+        super().__init__()
+        self._shared = get_shared_level_geometry(level)
+        self._camera = ViewCamera()
+        self._gl_data = None
+        self._clip_box: tuple[float, float, float, float, float, float] | None = None
+        self._slice_y: float | None = None
+        self._block_filter: BlockFilter | None = None
+        # Used to destroy the OpenGL data.
+        # The owner surface may have been destroyed in some cases.
+        self._surface = QOffscreenSurface()
+        self._surface.create()
+        self._shared.geometry_changed.connect(self.geometry_changed.emit)
+
+    def init_gl(self) -> None:
+        """
+        Initialise the OpenGL data.
+        Must be called once by the main thread with a valid OpenGL context enabled.
+        This context must be active for all calls that need one.
+        """
+        log.debug("LevelGeometry.initializeGL start")
+        context = QOpenGLContext.currentContext()
+        # if not QOpenGLContext.areSharing(context, QOpenGLContext.globalShareContext()):
+        #     raise RuntimeError(
+        #         "The widget context is not sharing with the global context."
+        #     )
+
+        if self._gl_data is not None:
+            raise RuntimeError("gl_data is not None.")
+
+        # Initialise the shader
+        program = QOpenGLShaderProgram()
+        program.addShaderFromSourceCode(
+            QOpenGLShader.ShaderTypeBit.Vertex, ChunkVertexShaderSource
+        )
+
+        program.addShaderFromSourceCode(
+            QOpenGLShader.ShaderTypeBit.Fragment, FragmentShaderSource
+        )
+
+        program.bindAttributeLocation("position", 0)
+        program.bindAttributeLocation("vTexCoord", 1)
+        program.bindAttributeLocation("vTexOffset", 2)
+        program.bindAttributeLocation("vTint", 3)
+        program.bindAttributeLocation("vMaterial", 4)
+        program.link()
+        program.bind()
+        matrix_location = program.uniformLocation("transformation_matrix")
+        model_matrix_location = program.uniformLocation("model_matrix")
+        filter_location = program.uniformLocation("filter_materials")
+        # Init the texture location
+        texture_location = program.uniformLocation("image")
+        program.setUniformValue1i(texture_location, 0)
+        program.setUniformValue1i(program.uniformLocation("material_states"), 1)
+        program.setUniformValue("cut_color", QVector4D(*CutColour))
+        program.release()
+
+        self._gl_data = LevelGeometryGLData(
+            context,
+            program,
+            matrix_location,
+            model_matrix_location,
+            filter_location,
+            self._init_placeholder_gl(),
+        )
+        self._shared.attach(self._camera)
+        log.debug("LevelGeometry.initializeGL end")
+
+    @staticmethod
+    def _init_placeholder_gl() -> PlaceholderGLData:
+        """
+        Create the shader and the mesh shared by all chunk placeholders.
+        This must be called by the main thread with the context active.
+        """
+        program = QOpenGLShaderProgram()
+        program.addShaderFromSourceCode(
+            QOpenGLShader.ShaderTypeBit.Vertex, PlaceholderVertexShaderSource
+        )
+        program.addShaderFromSourceCode(
+            QOpenGLShader.ShaderTypeBit.Fragment, FragmentShaderSource
+        )
+        program.bindAttributeLocation("position", 0)
+        program.bindAttributeLocation("vTexCoord", 1)
+        program.link()
+        program.bind()
+        matrix_location = program.uniformLocation("transformation_matrix")
+        instances_location = program.uniformLocation("instances")
+        texture_bounds_location = program.uniformLocation("texture_bounds")
+        texture_location = program.uniformLocation("image")
+        program.setUniformValue1i(texture_location, 0)
+        program.release()
+
+        f = QOpenGLContext.currentContext().functions()
+        grid = create_placeholder_grid()
+
+        vao = QOpenGLVertexArrayObject()
+        vao.create()
+        vao.bind()
+
+        vbo = QOpenGLBuffer()
+        vbo.create()
+        vbo.bind()
+        vbo.allocate(grid, grid.nbytes)
+
+        # vertex coord
+        f.glEnableVertexAttribArray(0)
+        f.glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 5 * FloatSize, VoidPtr(0))
+        # texture coord
+        f.glEnableVertexAttribArray(1)
+        f.glVertexAttribPointer(
+            1, 2, GL_FLOAT, GL_FALSE, 5 * FloatSize, VoidPtr(3 * FloatSize)
+        )
+
+        vao.release()
+        vbo.release()
+
+        return PlaceholderGLData(
+            program,
+            matrix_location,
+            instances_location,
+            texture_bounds_location,
+            vao,
+            vbo,
+            len(grid),
+        )
+
+    def start(self) -> None:
+        """
+        Start background processing.
+        This must be called by the main thread.
+        Call this on canvas.showEvent
+        """
+        self._shared.start(self._camera)
+
+    def stop(self) -> None:
+        """
+        Stops background processing.
+        If any chunks are still processing they will finish.
+        This must be called by the main thread.
+        Call this on canvas.hideEvent
+        """
+        self._shared.stop(self._camera)
+
+    def destroy_gl(self) -> None:
+        """
+        Destroy the OpenGL data.
+        This must be called by the main thread.
+        This must be called by the context.aboutToBeDestroyed signal.
+        """
+        gl_data = self._gl_data
+        if gl_data is None:
+            raise RuntimeError("gl_data is None.")
+        if gl_data.context.makeCurrent(self._surface):
+            for _, vao in gl_data.vertex_arrays.values():
+                vao.destroy()
+            gl_data.placeholder.vao.destroy()
+            gl_data.placeholder.vbo.destroy()
+            if gl_data.material_texture is not None:
+                gl_data.material_texture.destroy()
+            gl_data.context.doneCurrent()
+        gl_data.vertex_arrays.clear()
+        self._gl_data = None
+        self._shared.detach(self._camera)
+
+    def __del__(self) -> None:
+        log.debug("LevelGeometry.__del__")
+
+    def paint_gl(self, projection_matrix: QMatrix4x4, view_matrix: QMatrix4x4) -> None:
+        """
+        Draw the level.
+        This must be called by the main thread with the context active.
+
+        :param projection_matrix: The camera internal projection matrix.
+        :param view_matrix: The camera external matrix.
+        """
+        gl_data = self._gl_data
+        texture = self._shared.texture
+        if gl_data is None or texture is None:
+            return
+
+        if QOpenGLContext.currentContext() is not gl_data.context:
+            raise RuntimeError("Context is different.")
+
+        f = QOpenGLContext.currentContext().functions()
+
+        # Set OpenGL attributes.
+        f.glEnable(GL_DEPTH_TEST)
+        f.glDepthFunc(GL_LEQUAL)
+        f.glEnable(GL_BLEND)
+        f.glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        clip_box = self.clip_bounds
+        if clip_box is None:
+            f.glEnable(GL_CULL_FACE)
+            f.glCullFace(GL_BACK)
+        else:
+            # Back faces are drawn in a flat colour so that the cut through solid geometry reads as solid.
+            f.glDisable(GL_CULL_FACE)
+            for i in range(ClipPlaneCount):
+                f.glEnable(GL_CLIP_DISTANCE0 + i)
+
+        # Bind the shader program
+        program = gl_data.program
+        program.bind()
+
+        transform = projection_matrix * view_matrix
+        draw_list = self._shared.get_draw_list(self._camera.dimension)
+        self._prune_vertex_arrays(gl_data, draw_list)
+        planes = get_frustum_planes(transform)
+
+        texture.bind(0)
+        block_filter = self._block_filter
+        program.setUniformValue1i(
+            gl_data.filter_location, int(block_filter is not None)
+        )
+        if block_filter is not None:
+            self._get_material_texture(gl_data, block_filter).bind(1)
+        # Skip the chunks outside the view frustum.
+        visible = get_visible_boxes(planes, draw_list.chunk_boxes)
+        if clip_box is not None:
+            self._set_clip_uniforms(program, clip_box)
+            # Skip the chunks outside the clip box.
+            visible &= get_boxes_in_box(clip_box, draw_list.chunk_boxes)
+        for (model_transform, geometry), is_visible in zip(draw_list.chunks, visible):
+            if not is_visible:
+                continue
+            program.setUniformValue(
+                gl_data.matrix_location, transform * model_transform
+            )
+            vao = self._get_vertex_array(gl_data, geometry)
+            vao.bind()
+            if clip_box is None:
+                f.glDrawArrays(GL_TRIANGLES, 0, geometry.vertex_count)
+            else:
+                program.setUniformValue(gl_data.model_matrix_location, model_transform)
+                # Only draw the sections inside the clip box.
+                for first, count in geometry.get_vertex_ranges(
+                    clip_box[1], clip_box[4]
+                ):
+                    f.glDrawArrays(GL_TRIANGLES, first, count)
+            vao.release()
+
+        program.release()
+        self._paint_placeholders(gl_data, draw_list, transform, planes, clip_box)
+
+        if clip_box is not None:
+            for i in range(ClipPlaneCount):
+                f.glDisable(GL_CLIP_DISTANCE0 + i)
+
+    @staticmethod
+    def _get_material_texture(
+        gl_data: LevelGeometryGLData, block_filter: BlockFilter
+    ) -> QOpenGLTexture:
+        """
+        Get the texture storing the state of each material for the block filter.
+        It is created again when the filter changes or new materials have been meshed.
+        This must be called by the main thread with the context active.
+        """
+        key = (block_filter, len(material_index))
+        texture = gl_data.material_texture
+        if texture is not None and key == gl_data.material_texture_key:
+            return texture
+        if texture is not None:
+            texture.destroy()
+
+        states = material_index.get_states(block_filter)
+        height = max(1, -(-len(states) // MaterialTextureWidth))
+        pixels = numpy.zeros((height, MaterialTextureWidth, 4), dtype=numpy.uint8)
+        # Materials meshed after the texture was created are drawn until it is created again.
+        pixels[..., 0] = MaterialState.Shown
+        pixels.reshape(-1, 4)[: len(states), 0] = states
+        image = QImage(
+            pixels.tobytes(),
+            MaterialTextureWidth,
+            height,
+            QImage.Format.Format_RGBA8888,
+        )
+
+        texture = QOpenGLTexture(QOpenGLTexture.Target.Target2D)
+        texture.setMinificationFilter(QOpenGLTexture.Filter.Nearest)
+        texture.setMagnificationFilter(QOpenGLTexture.Filter.Nearest)
+        texture.setData(image, QOpenGLTexture.MipMapGeneration.DontGenerateMipMaps)
+        gl_data.material_texture = texture
+        gl_data.material_texture_key = key
+        return texture
+
+    @staticmethod
+    def _set_clip_uniforms(
+        program: QOpenGLShaderProgram,
+        clip_box: tuple[float, float, float, float, float, float],
+    ) -> None:
+        """Set the clip box of a bound program."""
+        program.setUniformValue("clip_min", QVector3D(*clip_box[:3]))
+        program.setUniformValue("clip_max", QVector3D(*clip_box[3:]))
+
+    @staticmethod
+    def _get_vertex_array(
+        gl_data: LevelGeometryGLData, geometry: ChunkGLData
+    ) -> QOpenGLVertexArrayObject:
+        """
+        Get the vertex array of a shared chunk buffer in this context.
+        It is created the first time the buffer is drawn.
+        A reused buffer keeps its vertex array because the layout does not change.
+        This must be called by the main thread with the context active.
+        """
+        entry = gl_data.vertex_arrays.get(id(geometry.vbo))
+        if entry is not None:
+            return entry[1]
+
+        f = QOpenGLContext.currentContext().functions()
+
+        # Create the VAO.
+        vao = QOpenGLVertexArrayObject()
+        vao.create()
+        vao.bind()
+
+        # Associate the shared vbo with the vao
+        vbo = geometry.vbo
+        vbo.bind()
+
+        # vertex coord
+        f.glEnableVertexAttribArray(0)
+        f.glVertexAttribPointer(
+            0, 3, GL_FLOAT, GL_FALSE, VertexSize * FloatSize, VoidPtr(0)
+        )
+        # texture coord
+        f.glEnableVertexAttribArray(1)
+        f.glVertexAttribPointer(
+            1, 2, GL_FLOAT, GL_FALSE, VertexSize * FloatSize, VoidPtr(3 * FloatSize)
+        )
+        # texture bounds
+        f.glEnableVertexAttribArray(2)
+        f.glVertexAttribPointer(
+            2, 4, GL_FLOAT, GL_FALSE, VertexSize * FloatSize, VoidPtr(5 * FloatSize)
+        )
+        # tint
+        f.glEnableVertexAttribArray(3)
+        f.glVertexAttribPointer(
+            3, 3, GL_FLOAT, GL_FALSE, VertexSize * FloatSize, VoidPtr(9 * FloatSize)
+        )
+        # material id
+        f.glEnableVertexAttribArray(4)
+        f.glVertexAttribPointer(
+            4, 1, GL_FLOAT, GL_FALSE, VertexSize * FloatSize, VoidPtr(12 * FloatSize)
+        )
+
+        vao.release()
+        vbo.release()
+        gl_data.vertex_arrays[id(vbo)] = (vbo, vao)
+        return vao
+
+    @staticmethod
+    def _prune_vertex_arrays(gl_data: LevelGeometryGLData, draw_list: DrawList) -> None:
+        """
+        Destroy the vertex arrays of buffers that are not in the draw list.
+        The buffers may have been destroyed by the shared geometry.
+        This must be called by the main thread with the context active.
+        """
+        if draw_list is gl_data.vertex_arrays_draw_list:
+            return
+        gl_data.vertex_arrays_draw_list = draw_list
+        used = {id(geometry.vbo) for _, geometry in draw_list.chunks}
+        for key in [key for key in gl_data.vertex_arrays if key not in used]:
+            _, vao = gl_data.vertex_arrays.pop(key)
+            vao.destroy()
+
+    def _paint_placeholders(
+        self,
+        gl_data: LevelGeometryGLData,
+        draw_list: DrawList,
+        transform: QMatrix4x4,
+        planes: numpy.typing.NDArray[numpy.float64],
+        clip_box: tuple[float, float, float, float, float, float] | None,
+    ) -> None:
+        """
+        Draw the placeholders of all chunks without geometry as instances of one mesh.
+        This must be called by the main thread with the context active.
+        """
+        if not len(draw_list.placeholders):
+            return
+        # Skip the placeholders outside the view frustum.
+        visible = get_visible_boxes(planes, draw_list.placeholder_boxes)
+        if clip_box is not None:
+            visible &= get_boxes_in_box(clip_box, draw_list.placeholder_boxes)
+        instances = draw_list.placeholders[visible]
+        if not len(instances):
+            return
+
+        f = QOpenGLContext.currentContext().functions()
+        ef = QOpenGLContext.currentContext().extraFunctions()
+        placeholder = gl_data.placeholder
+        placeholder.program.bind()
+        placeholder.program.setUniformValue(placeholder.matrix_location, transform)
+        if clip_box is not None:
+            self._set_clip_uniforms(placeholder.program, clip_box)
+        f.glUniform4fv(
+            placeholder.texture_bounds_location,
+            2,
+            self._shared.placeholder_texture_bounds,
+        )
+        placeholder.vao.bind()
+        for start in range(0, len(instances), PlaceholderBatchSize):
+            batch = instances[start : start + PlaceholderBatchSize]
+            f.glUniform4fv(
+                placeholder.instances_location, len(batch) * 2, batch.ravel().tolist()
+            )
+            ef.glDrawArraysInstanced(
+                GL_TRIANGLES, 0, placeholder.vertex_count, len(batch)
+            )
+        placeholder.vao.release()
+        placeholder.program.release()
+
+    @property
+    def meshing_backlog(self) -> int:
+        """The number of chunks currently being meshed or uploaded for all views."""
+        return self._shared.meshing_backlog
+
+    def set_dimension(self, dimension: DimensionId) -> None:
+        """
+        Set the active dimension.
+        This must be called by the main thread.
+        """
+        self._shared.set_dimension(self._camera, dimension)
+
+    def set_location(self, cx: int, cz: int) -> None:
+        """
+        Set the chunk the camera is in.
+        This must be called by the main thread.
+        """
+        self._shared.set_location(self._camera, cx, cz)
+
+    def set_velocity(self, vx: float, vz: float) -> None:
+        """
+        Set the horizontal velocity of the camera in blocks per second.
+        When moving fast the chunks ahead of the camera are loaded first.
+        This must be called by the main thread.
+        """
+        self._shared.set_velocity(self._camera, vx, vz)
+
+    def raycast(
+        self,
+        origin: tuple[float, float, float],
+        direction: tuple[float, float, float],
+        max_distance: float,
+    ) -> RaycastHit | None:
+        """
+        Find the first block with geometry along a ray.
+        Only loaded chunks are tested. Chunks that are not loaded are treated as empty.
+        Geometry hidden by the clip box or the slice plane is not hit.
+        Blocks hidden by the block filter are still hit.
+        This is fast enough to call on every mouse move.
+        This must be called by the main thread.
+
+        :param origin: The start of the ray.
+        :param direction: The direction of the ray.
+        :param max_distance: The maximum distance along the ray to search.
+        :return: The hit or None if nothing was hit.
+        """
+        return self._shared.raycast(
+            self._camera, origin, direction, max_distance, self.clip_bounds
+        )
+
+    @property
+    def clip_box(self) -> tuple[float, float, float, float, float, float] | None:
+        """
+        The world space box outside which geometry is hidden.
+        (min_x, min_y, min_z, max_x, max_y, max_z)
+        None if geometry is not clipped by a box.
+        """
+        return self._clip_box
+
+    def set_clip_box(
+        self, clip_box: tuple[float, float, float, float, float, float] | None
+    ) -> None:
+        """
+        Hide the geometry outside a world space box.
+        This does not mesh any chunks so it can be changed every frame.
+        This must be called by the main thread.
+
+        :param clip_box: The box to show. (min_x, min_y, min_z, max_x, max_y, max_z) None to show everything.
+        """
+        if clip_box is not None and len(clip_box) != 6:
+            raise ValueError("The clip box must have six values.")
+        if clip_box != self._clip_box:
+            self._clip_box = clip_box
+            self.geometry_changed.emit()
+
+    @property
+    def slice_y(self) -> float | None:
+        """The height above which geometry is hidden. None if geometry is not sliced."""
+        return self._slice_y
+
+    def set_slice_y(self, slice_y: float | None) -> None:
+        """
+        Hide the geometry above a horizontal plane.
+        This does not mesh any chunks so it can be changed every frame.
+        This must be called by the main thread.
+
+        :param slice_y: The height of the plane. None to show everything.
+        """
+        if slice_y is not None:
+            slice_y = float(slice_y)
+        if slice_y != self._slice_y:
+            self._slice_y = slice_y
+            self.geometry_changed.emit()
+
+    @property
+    def clip_bounds(self) -> tuple[float, float, float, float, float, float] | None:
+        """
+        The box combining the clip box and the slice plane.
+        None if geometry is not clipped.
+        """
+        clip_box = self._clip_box
+        slice_y = self._slice_y
+        if slice_y is None:
+            return clip_box
+        if clip_box is None:
+            clip_box = (-ClipUnbounded,) * 3 + (ClipUnbounded,) * 3
+        min_x, min_y, min_z, max_x, max_y, max_z = clip_box
+        return min_x, min_y, min_z, max_x, min(max_y, slice_y), max_z
+
+    @property
+    def block_filter(self) -> BlockFilter | None:
+        """The block types to draw. None if all block types are drawn."""
+        return self._block_filter
+
+    def set_block_filter(self, block_filter: BlockFilter | None) -> None:
+        """
+        Hide or highlight block types.
+        This does not mesh any chunks so it can be changed freely.
+        This must be called by the main thread.
+
+        :param block_filter: The block types to draw. None to draw all block types.
+        """
+        if block_filter != self._block_filter:
+            self._block_filter = block_filter
+            self.geometry_changed.emit()
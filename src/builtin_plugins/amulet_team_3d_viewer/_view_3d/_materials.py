@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from enum import IntEnum
+from threading import Lock
+from typing import NamedTuple
+
+import numpy
+import numpy.typing
+
+from amulet.palette import BlockPalette
+
+
+class MaterialState(IntEnum):
+    """How the blocks of a material are drawn."""
+
+    Hidden = 0
+    Shown = 1
+    Highlighted = 2
+
+
+class BlockFilter(NamedTuple):
+    """
+    Which block types to draw.
+    Block types are namespaced names like "minecraft:stone". Block properties are ignored.
+    """
+
+    # If not None only these block types are drawn.
+    shown: frozenset[str] | None = None
+    # These block types are not drawn.
+    hidden: frozenset[str] = frozenset()
+    # These block types are drawn tinted.
+    highlighted: frozenset[str] = frozenset()
+
+    def get_state(self, name: str) -> MaterialState:
+        if name in self.hidden or (self.shown is not None and name not in self.shown):
+            return MaterialState.Hidden
+        if name in self.highlighted:
+            return MaterialState.Highlighted
+        return MaterialState.Shown
+
+
+class MaterialIndex:
+    """
+    Assigns a material id to each block type.
+    The id of a block type never changes so meshes can be filtered without meshing them again.
+    Thread safe.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._ids: dict[str, int] = {}
+        self._names: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def get_material_ids(self, palette: BlockPalette) -> list[int]:
+        """Get the material id of each block in a palette."""
+        material_ids = []
+        with self._lock:
+            for block_stack in palette:
+                name = block_stack[0].namespaced_name
+                material_id = self._ids.get(name)
+                if material_id is None:
+                    material_id = self._ids[name] = len(self._names)
+                    self._names.append(name)
+                material_ids.append(material_id)
+        return material_ids
+
+    def get_states(
+        self, block_filter: BlockFilter
+    ) -> numpy.typing.NDArray[numpy.uint8]:
+        """Get the MaterialState of every material id."""
+        with self._lock:
+            names = list(self._names)
+        return numpy.fromiter(
+            (block_filter.get_state(name) for name in names),
+            dtype=numpy.uint8,
+            count=len(names),
+        )
+
+
+material_index = MaterialIndex()
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Iterable
+from threading import Lock
+from weakref import ref
+import zlib
+
+import numpy
+
+from PySide6.QtCore import QObject
+
+from amulet.data_types import DimensionId
+from amulet.level.abc import Level, ChunkHandle
+from amulet.utils.weakref import CallableWeakMethod
+
+from ._settings import render_settings
+from ._chunk_mesher import ChunkMesh, VertexSize
+from ._raycast import ChunkOccupancy
+from ._chunk_changes import ChunkKey, get_chunk_change_notifier
+
+# The zlib compression level.
+# Meshes are compressed on the mesher threads so speed matters more than size.
+CompressionLevel = 1
+# The offsets of the chunks a mesh depends on.
+# Border faces are culled against the neighbouring chunks and the surface height depends on their columns.
+_MeshDependencyOffsets = ((0, 0), (-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def _get_mesh_dependencies(chunk_key: ChunkKey) -> list[ChunkKey]:
+    """Get the chunks that the mesh of a chunk was created from. This includes the chunk itself."""
+    dimension, cx, cz = chunk_key
+    return [(dimension, cx + dx, cz + dz) for dx, dz in _MeshDependencyOffsets]
+
+
+class CompressedMesh:
+    """
+    A chunk mesh compressed to keep in memory.
+    The bytes of each float are grouped together before compression.
+    The same few values repeat in each vertex attribute so this compresses much better than the raw floats.
+    """
+
+    # The compressed byte planes of each buffer.
+    data: bytes
+    # The number of floats in each buffer.
+    buffer_sizes: tuple[int, ...]
+    vertex_count: int
+    y_range: tuple[float, float]
+    opaque_vertex_count: int
+    section_ranges: tuple[tuple[int, int, int, int], ...]
+    occupancy: ChunkOccupancy | None
+
+    def __init__(self, mesh: ChunkMesh) -> None:
+        """
+        Compress a mesh.
+        This should be called by a worker thread.
+        """
+        compressor = zlib.compressobj(CompressionLevel)
+        parts = []
+        buffer_sizes = []
+        for buffer in mesh.buffers:
+            if not buffer.size:
+                continue
+            # Each row is one byte of every float.
+            planes = numpy.ascontiguousarray(
+                buffer.reshape(-1).view(numpy.uint8).reshape(-1, 4).T
+            )
+            parts.append(compressor.compress(planes))
+            buffer_sizes.append(buffer.size)
+        parts.append(compressor.flush())
+        self.data = b"".join(parts)
+        self.buffer_sizes = tuple(buffer_sizes)
+        self.vertex_count = mesh.vertex_count
+        self.y_range = mesh.y_range
+        self.opaque_vertex_count = mesh.opaque_vertex_count
+        self.section_ranges = mesh.section_ranges
+        self.occupancy = mesh.occupancy
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def decompress(self) -> ChunkMesh:
+        """
+        Recreate the mesh with all buffers joined into one array.
+        This should be called by a worker thread.
+        """
+        planes = numpy.frombuffer(zlib.decompress(self.data), dtype=numpy.uint8)
+        vertices = numpy.empty((self.vertex_count, VertexSize), dtype=numpy.float32)
+        vertex_bytes = vertices.reshape(-1).view(numpy.uint8).reshape(-1, 4)
+        offset = 0
+        for size in self.buffer_sizes:
+            vertex_bytes[offset : offset + size] = (
+                planes[offset * 4 : (offset + size) * 4].reshape(4, size).T
+            )
+            offset += size
+        if offset != len(vertex_bytes):
+            raise ValueError("The compressed mesh does not match the vertex count.")
+        return ChunkMesh(
+            (vertices,),
+            self.vertex_count,
+            self.y_range,
+            opaque_vertex_count=self.opaque_vertex_count,
+            section_ranges=self.section_ranges,
+            occupancy=self.occupancy,
+        )
+
+
+class ChunkMeshCache(QObject):
+    """
+    Keeps compressed copies of chunk meshes so that unloaded chunks can be uploaded again without meshing.
+
+    The least recently used meshes are dropped when the size exceeds the mesh cache budget in the render settings.
+    Each stored chunk and its four neighbours are watched so that its mesh is dropped when any of them change.
+    Thread safe.
+    This must be created on the main thread.
+    """
+
+    def __init__(self, level: Level) -> None:
+        super().__init__()
+        self._level = ref[Level](level)
+        self._lock = Lock()
+        self._meshes: OrderedDict[ChunkKey, CompressedMesh] = OrderedDict()
+        # The total size of the compressed meshes in bytes.
+        self._size = 0
+        self._chunk_changes = get_chunk_change_notifier(level)
+        self._chunk_changes.chunks_changed.connect(self._on_chunks_changed)
+        # The level data has been replaced.
+        self._on_reset = CallableWeakMethod(self.clear)
+        level.external_changed.connect(self._on_reset)
+        level.purged.connect(self._on_reset)
+        level.closed.connect(self._on_reset)
+
+    def __del__(self) -> None:
+        level = self._level()
+        if level is not None:
+            level.external_changed.disconnect(self._on_reset)
+            level.purged.disconnect(self._on_reset)
+            level.closed.disconnect(self._on_reset)
+
+    @property
+    def size(self) -> int:
+        """The number of bytes of compressed mesh data stored."""
+        return self._size
+
+    def get(self, chunk_key: ChunkKey) -> ChunkMesh | None:
+        """
+        Get the mesh of a chunk if it is stored.
+        This decompresses the mesh so it should be called by a worker thread.
+        """
+        with self._lock:
+            compressed_mesh = self._meshes.get(chunk_key)
+            if compressed_mesh is None:
+                return None
+            self._meshes.move_to_end(chunk_key)
+        return compressed_mesh.decompress()
+
+    def put(
+        self,
+        chunk_key: ChunkKey,
+        chunk_handle: ChunkHandle,
+        compressed_mesh: CompressedMesh,
+    ) -> None:
+        """
+        Store the mesh of a chunk.
+        The mesh must have been created from the current chunk data.
+        """
+        budget = render_settings.mesh_cache_budget
+        if budget < len(compressed_mesh):
+            self.invalidate((chunk_key,))
+            return
+        level = self._level()
+        if level is None:
+            return
+        dimension = level.get_dimension(chunk_key[0])
+        with self._lock:
+            old_mesh = self._meshes.pop(chunk_key, None)
+            if old_mesh is None:
+                self._chunk_changes.watch(chunk_key, chunk_handle)
+                for dependency in _get_mesh_dependencies(chunk_key)[1:]:
+                    self._chunk_changes.watch(
+                        dependency,
+                        dimension.get_chunk_handle(dependency[1], dependency[2]),
+                    )
+            else:
+                self._size -= len(old_mesh)
+            self._meshes[chunk_key] = compressed_mesh
+            self._size += len(compressed_mesh)
+            evicted: list[ChunkKey] = []
+            while budget < self._size:
+                evicted_key, evicted_mesh = self._meshes.popitem(last=False)
+                self._size -= len(evicted_mesh)
+                evicted.extend(_get_mesh_dependencies(evicted_key))
+        self._chunk_changes.unwatch(evicted)
+
+    def invalidate(self, chunk_keys: Iterable[ChunkKey]) -> None:
+        """Drop the meshes of the chunks."""
+        removed: list[ChunkKey] = []
+        with self._lock:
+            for chunk_key in chunk_keys:
+                compressed_mesh = self._meshes.pop(chunk_key, None)
+                if compressed_mesh is not None:
+                    self._size -= len(compressed_mesh)
+                    removed.extend(_get_mesh_dependencies(chunk_key))
+        self._chunk_changes.unwatch(removed)
+
+    def clear(self) -> None:
+        """Drop all meshes."""
+        with self._lock:
+            removed = [
+                dependency
+                for chunk_key in self._meshes
+                for dependency in _get_mesh_dependencies(chunk_key)
+            ]
+            self._meshes.clear()
+            self._size = 0
+        self._chunk_changes.unwatch(removed)
+
+    def _on_chunks_changed(
+        self, dimension_id: DimensionId, chunk_coords: set[tuple[int, int]]
+    ) -> None:
+        # The meshes of the neighbouring chunks depend on the changed chunks too.
+        self.invalidate(
+            {
+                (dimension_id, cx + dx, cz + dz)
+                for cx, cz in chunk_coords
+                for dx, dz in _MeshDependencyOffsets
+            }
+        )
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping
+from math import ceil, floor, inf, sqrt
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from ._chunk_mesher_lod0 import SectionSummary
+
+# The number of blocks along the x and z axes of a chunk.
+ChunkWidth = 16
+
+
+class ChunkOccupancy(NamedTuple):
+    """
+    Which blocks in a chunk have geometry.
+    This is created from the section summaries of the mesher so it costs nothing extra to build.
+    """
+
+    # The shape of each section. (x_shape, y_shape, z_shape)
+    section_shape: tuple[int, int, int]
+    # The sections that contain any blocks with geometry.
+    # The value is True if every block in the section has geometry.
+    # Otherwise it is a row for each x and y at index x * y_shape + y with bit z set if the block at x, y, z has geometry.
+    sections: Mapping[int, tuple[int, ...] | bool]
+
+
+def get_chunk_occupancy(
+    section_summaries: Mapping[int, SectionSummary],
+    section_shape: tuple[int, int, int],
+) -> ChunkOccupancy:
+    """Get the occupancy of a chunk from the summary of each section."""
+    sections: dict[int, tuple[int, ...] | bool] = {}
+    for cy, summary in section_summaries.items():
+        if summary.is_empty:
+            continue
+        if summary.is_uniform:
+            sections[cy] = True
+        else:
+            # Python ints are much faster to test than numpy scalars.
+            sections[cy] = tuple(summary.occupancy.tolist())
+    return ChunkOccupancy(section_shape, sections)
+
+
+class RaycastHit(NamedTuple):
+    """The block hit by a ray."""
+
+    # The block coordinate.
+    block: tuple[int, int, int]
+    # The normal of the face the ray entered the block through.
+    # (0, 0, 0) if the ray started inside the block.
+    face: tuple[int, int, int]
+    # The distance along the ray to the hit.
+    distance: float
+
+
+def _exit_distance(
+    origin: float, direction: float, step: int, min_coord: float, max_coord: float
+) -> float:
+    """Get the distance along the ray at which it leaves the range [min_coord, max_coord) on one axis."""
+    if step > 0:
+        return (max_coord - origin) / direction
+    elif step < 0:
+        return (min_coord - origin) / direction
+    return inf
+
+
+def _clip_ray(
+    origin: tuple[float, float, float],
+    direction: tuple[float, float, float],
+    bounds: tuple[float, float, float, float, float, float],
+) -> tuple[float, float, int] | None:
+    """
+    Get the distances along a ray at which it enters and leaves a box.
+
+    :return: The entry distance, the exit distance and the axis the ray enters through.
+        The entry distance is 0 and the axis is -1 if the ray starts inside the box.
+        None if the ray misses the box.
+    """
+    start = 0.0
+    end = inf
+    axis = -1
+    for i in range(3):
+        min_coord = bounds[i]
+        max_coord = bounds[i + 3]
+        if not direction[i]:
+            if not min_coord <= origin[i] <= max_coord:
+                return None
+            continue
+        enter = (min_coord - origin[i]) / direction[i]
+        leave = (max_coord - origin[i]) / direction[i]
+        if leave < enter:
+            enter, leave = leave, enter
+        if start < enter:
+            start = enter
+            axis = i
+        end = min(end, leave)
+    if end < start:
+        return None
+    return start, end, axis
+
+
+def raycast(
+    get_chunk: Callable[[int, int], ChunkOccupancy | None],
+    origin: tuple[float, float, float],
+    direction: tuple[float, float, float],
+    max_distance: float,
+    bounds: tuple[float, float, float, float, float, float] | None = None,
+) -> RaycastHit | None:
+    """
+    Find the first block with geometry along a ray.
+
+    This walks the blocks along the ray one at a time.
+    Sections that are missing or have no geometry and chunks that are not loaded are skipped in one step
+    so the cost depends on the number of occupied sections the ray passes through rather than its length.
+
+    :param get_chunk: Get the occupancy of a chunk from its chunk coordinates. None if the chunk is not known.
+    :param origin: The start of the ray.
+    :param direction: The direction of the ray. This does not need to be normalised.
+    :param max_distance: The maximum distance along the ray to search.
+    :param bounds: If defined only the parts of blocks inside this box are hit. (min_x, min_y, min_z, max_x, max_y, max_z)
+    :return: The hit or None if nothing was hit.
+    """
+    ox, oy, oz = origin
+    dx, dy, dz = direction
+    length = sqrt(dx * dx + dy * dy + dz * dz)
+    if not length:
+        return None
+    dx /= length
+    dy /= length
+    dz /= length
+
+    step_x = (dx > 0) - (dx < 0)
+    step_y = (dy > 0) - (dy < 0)
+    step_z = (dz > 0) - (dz < 0)
+    distance = 0.0
+    face = (0, 0, 0)
+    # The distance at which the ray leaves the bounds. Blocks entered at this distance are outside.
+    end = inf
+    if bounds is None:
+        x, y, z = floor(ox), floor(oy), floor(oz)
+    else:
+        clipped = _clip_ray(origin, (dx, dy, dz), bounds)
+        if clipped is None:
+            return None
+        distance, end, axis = clipped
+        # Start the walk from the block the ray enters the box in.
+        block = [
+            floor(ox + dx * distance),
+            floor(oy + dy * distance),
+            floor(oz + dz * distance),
+        ]
+        if axis != -1:
+            # Use the box side directly so that rounding cannot put the block outside the box.
+            step = (step_x, step_y, step_z)[axis]
+            block[axis] = (
+                floor(bounds[axis]) if step > 0 else ceil(bounds[axis + 3]) - 1
+            )
+            face = (
+                -step_x if axis == 0 else 0,
+                -step_y if axis == 1 else 0,
+                -step_z if axis == 2 else 0,
+            )
+        x, y, z = block
+    # The distance along the ray between block boundaries on each axis.
+    delta_x = abs(1 / dx) if dx else inf
+    delta_y = abs(1 / dy) if dy else inf
+    delta_z = abs(1 / dz) if dz else inf
+
+    # The distance along the ray at which it leaves the current block on each axis.
+    max_x = _exit_distance(ox, dx, step_x, x, x + 1)
+    max_y = _exit_distance(oy, dy, step_y, y, y + 1)
+    max_z = _exit_distance(oz, dz, step_z, z, z + 1)
+
+    chunk_key: tuple[int, int] | None = None
+    chunk: ChunkOccupancy | None = None
+
+    while distance <= max_distance and distance < end:
+        cx = x // ChunkWidth
+        cz = z // ChunkWidth
+        if chunk_key != (cx, cz):
+            chunk_key = (cx, cz)
+            chunk = get_chunk(cx, cz)
+
+        # The box to skip if nothing in it has geometry.
+        skip_box: tuple[float, float, float, float, float, float] | None = None
+        if chunk is None:
+            # The chunk is not loaded. Skip the whole column.
+            skip_box = (
+                cx * ChunkWidth,
+                -inf,
+                cz * ChunkWidth,
+                (cx + 1) * ChunkWidth,
+                inf,
+                (cz + 1) * ChunkWidth,
+            )
+        else:
+            y_shape = chunk.section_shape[1]
+            cy = y // y_shape
+            section = chunk.sections.get(cy)
+            if section is None:
+                skip_box = (
+                    cx * ChunkWidth,
+                    cy * y_shape,
+                    cz * ChunkWidth,
+                    (cx + 1) * ChunkWidth,
+                    (cy + 1) * y_shape,
+                    (cz + 1) * ChunkWidth,
+                )
+            elif isinstance(section, bool):
+                # Every block in the section has geometry.
+                return RaycastHit((x, y, z), face, distance)
+            elif (
+                section[(x - cx * ChunkWidth) * y_shape + y - cy * y_shape]
+                >> (z - cz * ChunkWidth)
+                & 1
+            ):
+                return RaycastHit((x, y, z), face, distance)
+
+        if skip_box is not None:
+            # Move to the first block outside the box in one step.
+            min_x, min_y, min_z, max_box_x, max_box_y, max_box_z = skip_box
+            exit_x = _exit_distance(ox, dx, step_x, min_x, max_box_x)
+            exit_y = _exit_distance(oy, dy, step_y, min_y, max_box_y)
+            exit_z = _exit_distance(oz, dz, step_z, min_z, max_box_z)
+            if min(exit_x, exit_y, exit_z) == inf:
+                # The ray never leaves the box.
+                return None
+            if exit_x <= exit_y and exit_x <= exit_z:
+                distance = exit_x
+                x = int(max_box_x) if step_x > 0 else int(min_x) - 1
+                y = floor(oy + dy * distance)
+                z = floor(oz + dz * distance)
+                face = (-step_x, 0, 0)
+            elif exit_y <= exit_z:
+                distance = exit_y
+                x = floor(ox + dx * distance)
+                y = int(max_box_y) if step_y > 0 else int(min_y) - 1
+                z = floor(oz + dz * distance)
+                face = (0, -step_y, 0)
+            else:
+                distance = exit_z
+                x = floor(ox + dx * distance)
+                y = floor(oy + dy * distance)
+                z = int(max_box_z) if step_z > 0 else int(min_z) - 1
+                face = (0, 0, -step_z)
+            # The boundaries only depend on the block so the walk can continue from here.
+            max_x = _exit_distance(ox, dx, step_x, x, x + 1)
+            max_y = _exit_distance(oy, dy, step_y, y, y + 1)
+            max_z = _exit_distance(oz, dz, step_z, z, z + 1)
+            continue
+
+        # Step to the next block.
+        if max_x <= max_y and max_x <= max_z:
+            x += step_x
+            distance = max_x
+            max_x += delta_x
+            face = (-step_x, 0, 0)
+        elif max_y <= max_z:
+            y += step_y
+            distance = max_y
+            max_y += delta_y
+            face = (0, -step_y, 0)
+        else:
+            z += step_z
+            distance = max_z
+            max_z += delta_z
+            face = (0, 0, -step_z)
+    return None
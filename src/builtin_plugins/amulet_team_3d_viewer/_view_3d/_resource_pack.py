@@ -8,6 +8,7 @@ import logging
 from threading import Lock, RLock
 from weakref import WeakKeyDictionary, ref
 
+import numpy
 from PIL import Image
 from PIL.ImageQt import ImageQt
 
@@ -36,6 +37,45 @@ from ._resource_pack_base import AbstractOpenGLResourcePack
 
 log = logging.getLogger(__name__)
 
+# The colour of textures that are fully transparent or not in the atlas.
+DefaultTextureColour = (0.5, 0.5, 0.5)
+
+
+def _get_texture_colours(
+    atlas: QImage, texture_bounds: dict[str, tuple[float, float, float, float]]
+) -> dict[str, tuple[float, float, float]]:
+    """Get the average colour of each texture in the atlas. Transparent pixels are ignored."""
+    image = atlas.convertToFormat(QImage.Format.Format_RGBA8888)
+    width = image.width()
+    height = image.height()
+    pixels = (
+        numpy.frombuffer(image.constBits(), dtype=numpy.uint8)[
+            : height * image.bytesPerLine()
+        ]
+        .reshape(height, image.bytesPerLine())[:, : width * 4]
+        .reshape(height, width, 4)
+    )
+    colours = {}
+    for texture_path, (min_u, min_v, max_u, max_v) in texture_bounds.items():
+        min_x = int(min_u * width)
+        min_y = int(min_v * height)
+        region = pixels[
+            min_y : max(min_y + 1, int(max_v * height)),
+            min_x : max(min_x + 1, int(max_u * width)),
+        ]
+        alpha = region[..., 3].astype(numpy.float32)
+        weight = alpha.sum()
+        if weight:
+            colour = (region[..., :3] * alpha[..., None]).sum(axis=(0, 1)) / (
+                weight * 255
+            )
+            colours[texture_path] = (
+                float(colour[0]),
+                float(colour[1]),
+                float(colour[2]),
+            )
+    return colours
+
 
 class OpenGLResourcePack(AbstractOpenGLResourcePack):
     """
@@ -54,6 +94,15 @@ class OpenGLResourcePack(AbstractOpenGLResourcePack):
     _context: Optional[QOpenGLContext]
     _surface: Optional[QOffscreenSurface]
 
+    # Block model cache
+    _block_model_cache_path: Optional[str]
+    _block_model_cache_digest: bytes
+    # The digest and number of block models of the cache file as last loaded or saved.
+    # The file is only written when this differs from the current state.
+    _saved_block_model_state: tuple[bytes, int]
+    # The average colour of each texture.
+    _texture_colours: dict[str, tuple[float, float, float]]
+
     def __init__(self, resource_pack: BaseResourcePackManager, translator: GameVersion):
         super().__init__()
         self._lock = Lock()
@@ -62,6 +111,10 @@ class OpenGLResourcePack(AbstractOpenGLResourcePack):
         self._texture = None
         self._context = None
         self._surface = None
+        self._block_model_cache_path = None
+        self._block_model_cache_digest = b""
+        self._saved_block_model_state = (b"", 0)
+        self._texture_colours = {}
 
     def __del__(self) -> None:
         if (
@@ -108,6 +161,22 @@ class OpenGLResourcePack(AbstractOpenGLResourcePack):
                     cache_dir = os.path.join(cache_directory(), "resource_pack")
                     img_path = os.path.join(cache_dir, f"{cache_id}.png")
                     bounds_path = os.path.join(cache_dir, f"{cache_id}.json")
+                    # The version is part of the name so that levels on different versions do not replace each other's cache.
+                    self._block_model_cache_path = os.path.join(
+                        cache_dir,
+                        f"{cache_id}_{self._game_version.platform}_{self._game_version.max_version}_block_models.bin",
+                    )
+                    # The block models depend on the resource packs and the version they are translated to.
+                    self._block_model_cache_digest = hashlib.sha1(
+                        json.dumps(
+                            [
+                                list(self._resource_pack.pack_paths),
+                                mod_time,
+                                self._game_version.platform,
+                                str(self._game_version.max_version),
+                            ]
+                        ).encode("utf-8")
+                    ).digest()
                     try:
                         with open(bounds_path) as f:
                             cache_mod_time, bounds = json.load(f)
@@ -131,6 +200,7 @@ class OpenGLResourcePack(AbstractOpenGLResourcePack):
                         _atlas = ImageQt(atlas)
 
                     self._texture_bounds = bounds
+                    self._texture_colours = _get_texture_colours(_atlas, bounds)
                     self._default_texture_bounds = self._texture_bounds[
                         self._resource_pack.missing_no
                     ]
@@ -170,6 +240,69 @@ class OpenGLResourcePack(AbstractOpenGLResourcePack):
 
         return Promise(func)
 
+    def warm_up(self) -> Promise[None]:
+        """
+        Preload the block models resolved by a previous session from the cache directory.
+        This must be called after :meth:`initialise` has finished.
+        A missing or stale cache is ignored.
+        """
+
+        def func(promise_data: Promise.Data) -> None:
+            with self._lock:
+                path = self._block_model_cache_path
+                if path is None:
+                    raise RuntimeError(
+                        "The OpenGLResourcePack has not been initialised."
+                    )
+                try:
+                    with open(path, "rb") as f:
+                        digest = self._block_model_cache_digest
+                        if f.read(len(digest)) != digest:
+                            log.debug("The block model cache is out of date.")
+                            return
+                        data = f.read()
+                    promise_data.progress_change.emit(0.5)
+                    added = self.deserialise_block_models(data)
+                except FileNotFoundError:
+                    return
+                except Exception:
+                    log.exception("Could not load the block model cache.")
+                else:
+                    log.debug(f"Loaded {added} block models from the cache.")
+                    self._saved_block_model_state = (
+                        self._block_model_cache_digest,
+                        self.block_model_count(),
+                    )
+
+        return Promise(func)
+
+    def save_block_model_cache(self) -> None:
+        """
+        Write all resolved block models to the cache directory so that :meth:`warm_up` can load them next session.
+        This does nothing if the cache file already contains the same block models.
+        """
+        with self._lock:
+            path = self._block_model_cache_path
+            if path is None:
+                return
+            state = (self._block_model_cache_digest, self.block_model_count())
+            if state == self._saved_block_model_state:
+                return
+            data = self.serialise_block_models()
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f"{path}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(self._block_model_cache_digest)
+                    f.write(data)
+                os.replace(temp_path, path)
+            except OSError:
+                # The cache is an optimisation. Failing to write it must not break anything.
+                log.exception(f"Could not save the block model cache {path}")
+                return
+            self._saved_block_model_state = state
+            log.debug(f"Saved {state[1]} block models to the cache.")
+
     def get_texture(self) -> QOpenGLTexture:
         """
         Get the opengl texture for the atlas.
@@ -181,6 +314,18 @@ class OpenGLResourcePack(AbstractOpenGLResourcePack):
                 raise RuntimeError("The OpenGLResourcePack has not been initialised.")
             return self._texture
 
+    @property
+    def cache_digest(self) -> bytes:
+        """
+        A digest of the resource packs and the version the block models are translated to.
+        Data derived from the resource pack may be cached on disk under this key.
+        """
+        return self._block_model_cache_digest
+
+    def texture_colour(self, texture_path: str) -> tuple[float, float, float]:
+        """Get the average colour of a texture in the atlas."""
+        return self._texture_colours.get(texture_path, DefaultTextureColour)
+
     def get_texture_path(self, namespace: Optional[str], relative_path: str) -> str:
         """Get the absolute path of the image from the relative components.
         Useful for getting the id of textures for hard coded textures not connected to a resource pack.
@@ -242,6 +387,16 @@ class OpenGLResourcePackHandle(QObject):
             )
         return rp
 
+    def save_cache(self) -> None:
+        """Save the block models resolved by the current resource pack to the cache directory."""
+        rp = self._resource_pack
+        if rp is not None:
+            try:
+                rp.save_block_model_cache()
+            except Exception:
+                # The cache is an optimisation. Failing to write it must not break anything.
+                log.exception("Could not save the block model cache.")
+
     def _reload(self) -> None:
         def func(promise_data: Promise.Data) -> None:
             with self._lock, DisplayException(
@@ -261,7 +416,8 @@ class OpenGLResourcePackHandle(QObject):
                 rp = OpenGLResourcePack(resource_pack, translator)
                 promise = rp.initialise()
                 # TODO: support canceling
-                promise.call_chained(promise_data)
+                promise.call_chained(promise_data, 0.0, 0.9)
+                rp.warm_up().call_chained(promise_data, 0.9, 1.0)
                 # for progress in rp.initialise():
                 #     if promise_data.is_cancel_requested or _tokens.get(level) is not token:
                 #         # Abort if a new generation has been started
@@ -269,6 +425,7 @@ class OpenGLResourcePackHandle(QObject):
                 #
                 #     promise_data.progress_change.emit(0.5 + progress * 0.5)
 
+                self.save_cache()
                 self._resource_pack = rp
                 self.changed.emit()
                 log.debug(f"Loaded OpenGL resource pack for level {level}")
@@ -291,3 +448,11 @@ def get_gl_resource_pack_container(level: Level) -> OpenGLResourcePackHandle:
         if level not in _level_data:
             _level_data[level] = invoke(lambda: OpenGLResourcePackHandle(level))
         return _level_data[level]
+
+
+def save_block_model_caches() -> None:
+    """Save the block model cache of every loaded level."""
+    with _lock:
+        containers = list(_level_data.values())
+    for container in containers:
+        container.save_cache()
@@ -0,0 +1,230 @@
+#include <chrono>
+#include <cstdint>
+#include <functional>
+#include <future>
+#include <memory>
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+#include "_resource_pack_base.hpp"
+
+namespace Amulet {
+
+void serialise_block_mesh(BinaryWriter& writer, const BlockMesh& mesh)
+{
+    writer.writeNumeric<std::uint8_t>(1);
+    writer.writeNumeric<std::uint8_t>(static_cast<std::uint8_t>(mesh.transparency));
+    writer.writeNumeric<std::uint64_t>(mesh.textures.size());
+    for (const auto& texture : mesh.textures) {
+        writer.writeSizeAndBytes(texture);
+    }
+    for (const auto& part : mesh.parts) {
+        if (!part) {
+            writer.writeNumeric<std::uint8_t>(0);
+            continue;
+        }
+        writer.writeNumeric<std::uint8_t>(1);
+        writer.writeNumeric<std::uint64_t>(part->verts.size());
+        for (const auto& vert : part->verts) {
+            writer.writeNumeric<float>(vert.coord.x);
+            writer.writeNumeric<float>(vert.coord.y);
+            writer.writeNumeric<float>(vert.coord.z);
+            writer.writeNumeric<float>(vert.texture_coord.x);
+            writer.writeNumeric<float>(vert.texture_coord.y);
+            writer.writeNumeric<float>(vert.tint.x);
+            writer.writeNumeric<float>(vert.tint.y);
+            writer.writeNumeric<float>(vert.tint.z);
+        }
+        writer.writeNumeric<std::uint64_t>(part->triangles.size());
+        for (const auto& triangle : part->triangles) {
+            writer.writeNumeric<std::uint64_t>(triangle.vert_index_a);
+            writer.writeNumeric<std::uint64_t>(triangle.vert_index_b);
+            writer.writeNumeric<std::uint64_t>(triangle.vert_index_c);
+            writer.writeNumeric<std::uint64_t>(triangle.texture_index);
+        }
+    }
+}
+
+BlockMesh deserialise_block_mesh(BinaryReader& reader)
+{
+    auto version_number = reader.readNumeric<std::uint8_t>();
+    switch (version_number) {
+    case 1: {
+        auto transparency = static_cast<BlockMeshTransparency>(reader.readNumeric<std::uint8_t>());
+        std::vector<std::string> textures;
+        auto texture_count = reader.readNumeric<std::uint64_t>();
+        textures.reserve(texture_count);
+        for (std::uint64_t i = 0; i < texture_count; i++) {
+            textures.push_back(reader.readSizeAndBytes());
+        }
+        std::array<std::optional<BlockMeshPart>, 7> parts;
+        for (auto& part : parts) {
+            if (!reader.readNumeric<std::uint8_t>()) {
+                continue;
+            }
+            auto& part_ = part.emplace();
+            auto vert_count = reader.readNumeric<std::uint64_t>();
+            part_.verts.reserve(vert_count);
+            for (std::uint64_t i = 0; i < vert_count; i++) {
+                float x = reader.readNumeric<float>();
+                float y = reader.readNumeric<float>();
+                float z = reader.readNumeric<float>();
+                float u = reader.readNumeric<float>();
+                float v = reader.readNumeric<float>();
+                float r = reader.readNumeric<float>();
+                float g = reader.readNumeric<float>();
+                float b = reader.readNumeric<float>();
+                part_.verts.emplace_back(FloatVec3(x, y, z), FloatVec2(u, v), FloatVec3(r, g, b));
+            }
+            auto triangle_count = reader.readNumeric<std::uint64_t>();
+            part_.triangles.reserve(triangle_count);
+            for (std::uint64_t i = 0; i < triangle_count; i++) {
+                std::uint64_t a = reader.readNumeric<std::uint64_t>();
+                std::uint64_t b = reader.readNumeric<std::uint64_t>();
+                std::uint64_t c = reader.readNumeric<std::uint64_t>();
+                std::uint64_t texture_index = reader.readNumeric<std::uint64_t>();
+                if (vert_count <= a || vert_count <= b || vert_count <= c || texture_count <= texture_index) {
+                    throw std::out_of_range("Serialised triangle index is out of range.");
+                }
+                part_.triangles.emplace_back(a, b, c, texture_index);
+            }
+        }
+        return BlockMesh(transparency, textures, parts);
+    }
+    default:
+        throw std::invalid_argument("Unsupported BlockMesh version " + std::to_string(version_number));
+    }
+}
+
+AbstractOpenGLResourcePack::BlockModelShard& AbstractOpenGLResourcePack::_get_block_model_shard(const BlockStack& block_stack)
+{
+    size_t hash = 0;
+    for (const auto& block : block_stack.get_blocks()) {
+        hash = hash * 31 + std::hash<std::string> {}(block->get_base_name());
+    }
+    return _block_model_shards[hash % _block_model_shards.size()];
+}
+
+const BlockMesh& AbstractOpenGLResourcePack::get_block_model(const BlockStack& block_stack)
+{
+    auto& shard = _get_block_model_shard(block_stack);
+    std::shared_future<BlockMesh> future;
+
+    {
+        std::shared_lock<std::shared_mutex> shared_lock(shard.mutex);
+        const auto& it = shard.block_models.find(block_stack);
+        if (it != shard.block_models.end()) {
+            future = it->second;
+        }
+    }
+    if (future.valid()) {
+        // The shared state is owned by the map so the reference outlives this future.
+        // This only blocks if another thread is still resolving this block model.
+        return future.get();
+    }
+
+    std::promise<BlockMesh> promise;
+    {
+        std::unique_lock<std::shared_mutex> unique_lock(shard.mutex);
+        auto [it, inserted] = shard.block_models.try_emplace(block_stack);
+        if (inserted) {
+            it->second = promise.get_future().share();
+        }
+        future = it->second;
+        if (!inserted) {
+            // Another thread started resolving it since the first lookup.
+            unique_lock.unlock();
+            return future.get();
+        }
+    }
+
+    // Resolve the block model without holding the shard lock.
+    // _get_block_model may need to acquire the GIL.
+    try {
+        promise.set_value(_get_block_model(block_stack));
+    } catch (...) {
+        promise.set_exception(std::current_exception());
+        // Remove the failed entry so that the next lookup tries again.
+        std::unique_lock<std::shared_mutex> unique_lock(shard.mutex);
+        shard.block_models.erase(block_stack);
+        throw;
+    }
+    return future.get();
+}
+
+size_t AbstractOpenGLResourcePack::block_model_count()
+{
+    size_t count = 0;
+    for (auto& shard : _block_model_shards) {
+        std::shared_lock<std::shared_mutex> shared_lock(shard.mutex);
+        for (const auto& [block_stack, future] : shard.block_models) {
+            count += future.wait_for(std::chrono::seconds(0)) == std::future_status::ready;
+        }
+    }
+    return count;
+}
+
+std::string AbstractOpenGLResourcePack::serialise_block_models()
+{
+    // Only serialise the block models that have been resolved successfully.
+    std::vector<std::pair<const BlockStack*, const BlockMesh*>> block_models;
+    std::vector<std::shared_lock<std::shared_mutex>> locks;
+    for (auto& shard : _block_model_shards) {
+        locks.emplace_back(shard.mutex);
+        for (const auto& [block_stack, future] : shard.block_models) {
+            if (future.wait_for(std::chrono::seconds(0)) != std::future_status::ready) {
+                continue;
+            }
+            try {
+                block_models.emplace_back(&block_stack, &future.get());
+            } catch (...) {
+                // The block model failed to resolve and is about to be removed.
+            }
+        }
+    }
+
+    BinaryWriter writer;
+    writer.writeNumeric<std::uint8_t>(1);
+    writer.writeNumeric<std::uint64_t>(block_models.size());
+    for (const auto& [block_stack, block_mesh] : block_models) {
+        block_stack->serialise(writer);
+        serialise_block_mesh(writer, *block_mesh);
+    }
+    return writer.getBuffer();
+}
+
+size_t AbstractOpenGLResourcePack::deserialise_block_models(const std::string& data)
+{
+    size_t position = 0;
+    BinaryReader reader(data, position);
+    auto version_number = reader.readNumeric<std::uint8_t>();
+    switch (version_number) {
+    case 1: {
+        // Decode everything before inserting so that a corrupt file does not leave partial data.
+        std::vector<std::pair<std::shared_ptr<BlockStack>, BlockMesh>> block_models;
+        auto count = reader.readNumeric<std::uint64_t>();
+        for (std::uint64_t i = 0; i < count; i++) {
+            auto block_stack = BlockStack::deserialise(reader);
+            block_models.emplace_back(block_stack, deserialise_block_mesh(reader));
+        }
+        size_t added = 0;
+        for (auto& [block_stack, block_mesh] : block_models) {
+            auto& shard = _get_block_model_shard(*block_stack);
+            std::unique_lock<std::shared_mutex> unique_lock(shard.mutex);
+            auto [it, inserted] = shard.block_models.try_emplace(*block_stack);
+            if (inserted) {
+                std::promise<BlockMesh> promise;
+                promise.set_value(std::move(block_mesh));
+                it->second = promise.get_future().share();
+                added++;
+            }
+        }
+        return added;
+    }
+    default:
+        throw std::invalid_argument("Unsupported block model cache version " + std::to_string(version_number));
+    }
+}
+
+} // namespace Amulet
@@ -1,4 +1,6 @@
 #pragma once
+#include <array>
+#include <future>
 #include <map>
 #include <mutex>
 #include <shared_mutex>
@@ -7,18 +9,32 @@
 #include <unordered_map>
 
 #include <amulet/block.hpp>
+#include <amulet/io/binary_reader.hpp>
+#include <amulet/io/binary_writer.hpp>
 #include <amulet/mesh/block/block_mesh.hpp>
 
 namespace Amulet {
 
+void serialise_block_mesh(BinaryWriter& writer, const BlockMesh& mesh);
+BlockMesh deserialise_block_mesh(BinaryReader& reader);
+
 class AbstractOpenGLResourcePack {
 private:
-    std::shared_mutex _mutex;
+    // A subset of the block models guarded by its own lock.
+    // Lookups of block stacks in different shards never contend.
+    struct BlockModelShard {
+        std::shared_mutex mutex;
+        // Resolved and in-flight block models.
+        // An in-flight future only blocks threads that need that block model.
+        std::map<Amulet::BlockStack, std::shared_future<Amulet::BlockMesh>> block_models;
+    };
+    std::array<BlockModelShard, 16> _block_model_shards;
+
+    BlockModelShard& _get_block_model_shard(const Amulet::BlockStack& block_stack);
 
 public:
     std::tuple<float, float, float, float> _default_texture_bounds;
     std::unordered_map<std::string, std::tuple<float, float, float, float>> _texture_bounds;
-    std::map<Amulet::BlockStack, const Amulet::BlockMesh> _block_models;
 
     AbstractOpenGLResourcePack() { }
 
@@ -34,22 +50,22 @@ public:
 
     virtual const Amulet::BlockMesh _get_block_model(const Amulet::BlockStack& block_stack) = 0;
 
-    const Amulet::BlockMesh& get_block_model(const Amulet::BlockStack& block_stack)
-    {
-        std::shared_lock<std::shared_mutex> shared_lock(_mutex);
-        const auto& it = _block_models.find(block_stack);
-        if (it != _block_models.end()) {
-            return it->second;
-        }
-        shared_lock.unlock();
+    // Get the block model for the block stack. This is thread safe.
+    // If the block model has not been resolved it is resolved by calling _get_block_model without holding any lock.
+    // Other threads requesting the same block stack wait for the result.
+    // The returned reference is valid for the lifetime of this object.
+    const Amulet::BlockMesh& get_block_model(const Amulet::BlockStack& block_stack);
 
-        std::unique_lock<std::shared_mutex> unique_lock(_mutex);
-        const auto& it2 = _block_models.find(block_stack);
-        if (it2 != _block_models.end()) {
-            return it2->second;
-        }
-        return _block_models.emplace(block_stack, _get_block_model(block_stack)).first->second;
-    }
+    // The number of block models that have been resolved or loaded.
+    size_t block_model_count();
+
+    // Serialise all resolved block models and the block stacks they were resolved from.
+    std::string serialise_block_models();
+
+    // Load block models previously created by serialise_block_models.
+    // Block stacks that have already been resolved are not overwritten.
+    // Returns the number of block models that were added.
+    size_t deserialise_block_models(const std::string& data);
 };
 
 } // namespace Amulet
@@ -28,7 +28,33 @@ void init_resource_pack_base(py::module m_parent)
         .def("_get_block_model", &Amulet::AbstractOpenGLResourcePack::_get_block_model,
             py::doc("abstractmethod to load the BlockMesh. Must be implemented by the subclass."))
         .def("get_block_model", &Amulet::AbstractOpenGLResourcePack::get_block_model,
+            // The GIL must be released while waiting for another thread that may need it to resolve the block model.
+            py::call_guard<py::gil_scoped_release>(),
             py::doc(
                 "Get the BlockMesh for the given BlockStack.\n"
-                "The Block will be translated to the version format using the previously specified translator."));
+                "The Block will be translated to the version format using the previously specified translator."))
+        .def("block_model_count", &Amulet::AbstractOpenGLResourcePack::block_model_count,
+            py::doc("The number of block models that have been resolved or loaded."))
+        .def(
+            "serialise_block_models",
+            [](Amulet::AbstractOpenGLResourcePack& self) {
+                std::string data;
+                {
+                    py::gil_scoped_release gil;
+                    data = self.serialise_block_models();
+                }
+                return py::bytes(data);
+            },
+            py::doc("Serialise all resolved block models to bytes so that they can be cached between sessions."))
+        .def(
+            "deserialise_block_models",
+            [](Amulet::AbstractOpenGLResourcePack& self, const std::string& data) {
+                py::gil_scoped_release gil;
+                return self.deserialise_block_models(data);
+            },
+            py::arg("data"),
+            py::doc(
+                "Load block models serialised by serialise_block_models.\n"
+                "Block models that have already been resolved are not replaced.\n"
+                "Returns the number of block models that were added."));
 }
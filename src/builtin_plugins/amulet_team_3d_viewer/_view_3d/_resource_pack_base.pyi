@@ -16,6 +16,18 @@ class AbstractOpenGLResourcePack:
         abstractmethod to load the BlockMesh. Must be implemented by the subclass.
         """
 
+    def block_model_count(self) -> int:
+        """
+        The number of block models that have been resolved or loaded.
+        """
+
+    def deserialise_block_models(self, data: bytes) -> int:
+        """
+        Load block models serialised by serialise_block_models.
+        Block models that have already been resolved are not replaced.
+        Returns the number of block models that were added.
+        """
+
     def get_block_model(
         self, arg0: amulet.block.BlockStack
     ) -> amulet.mesh.block.BlockMesh:
@@ -24,6 +36,11 @@ class AbstractOpenGLResourcePack:
         The Block will be translated to the version format using the previously specified translator.
         """
 
+    def serialise_block_models(self) -> bytes:
+        """
+        Serialise all resolved block models to bytes so that they can be cached between sessions.
+        """
+
     def texture_bounds(self, arg0: str) -> tuple[float, float, float, float]:
         """
         Get the bounding box of a given texture path.
@@ -0,0 +1,522 @@
+from __future__ import annotations
+
+import heapq
+from math import floor, inf
+from typing import NamedTuple
+
+import numpy
+import numpy.typing
+
+from shiboken6 import VoidPtr
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtGui import QMatrix4x4, QOpenGLContext, QOffscreenSurface, QVector3D
+from PySide6.QtOpenGL import (
+    QOpenGLShaderProgram,
+    QOpenGLShader,
+    QOpenGLVertexArrayObject,
+    QOpenGLBuffer,
+    QOpenGLTexture,
+)
+
+from OpenGL.GL import GL_LINES as _GL_LINES, GL_TRUE as _GL_TRUE
+from OpenGL.constant import IntConstant
+
+from amulet.selection import SelectionBox
+
+from amulet_team_selection import (
+    SelectionDiff,
+    get_selection,
+    get_selection_version,
+    selection_diff,
+)
+
+from ._level_geometry import (
+    FloatSize,
+    GL_FLOAT,
+    GL_FALSE,
+    GL_TRIANGLES,
+    GL_CULL_FACE,
+    GL_BACK,
+    GL_BLEND,
+    GL_SRC_ALPHA,
+    GL_ONE_MINUS_SRC_ALPHA,
+    dynamic_cast,
+)
+from ._box_index import BoxIndex
+
+GL_LINES = dynamic_cast(_GL_LINES, IntConstant)
+GL_TRUE = dynamic_cast(_GL_TRUE, IntConstant)
+
+# The number of texels in each row of the box texture. Each box uses two texels.
+BoxTextureWidth = 1024
+BoxesPerRow = BoxTextureWidth // 2
+# The distance the box geometry is moved out from the selected blocks so that it does not overlap them.
+BoxOutset = 0.005
+SelectionFaceColour = (1.0, 1.0, 1.0, 0.2)
+SelectionEdgeColour = (1.0, 1.0, 1.0, 1.0)
+# The box texture stores positions relative to an origin near the camera because float32 loses precision far from zero.
+# The origin is a multiple of this so that it only changes when the camera moves far.
+OriginStep = 1024
+# The origin moves when the camera is further than this from it on any axis.
+OriginRecentreDistance = 4096
+
+
+def create_box_mesh() -> tuple[numpy.typing.NDArray[numpy.float32], int, int]:
+    """
+    Create the unit cube drawn for every box.
+
+    :return: The vertex positions followed by the number of face vertices and edge vertices.
+        The face triangles are first and wound anticlockwise when viewed from outside. The edge lines follow them.
+    """
+    faces = []
+    for axis in range(3):
+        u = (axis + 1) % 3
+        v = (axis + 2) % 3
+        for side in (0, 1):
+            corners = []
+            for i, j in ((0, 0), (1, 0), (1, 1), (0, 1)):
+                corner = [0.0, 0.0, 0.0]
+                corner[axis] = side
+                corner[u] = i
+                corner[v] = j
+                corners.append(corner)
+            if not side:
+                # The face points down the axis so reverse the winding.
+                corners.reverse()
+            faces.extend(corners[index] for index in (0, 1, 2, 0, 2, 3))
+    edges = []
+    for axis in range(3):
+        u = (axis + 1) % 3
+        v = (axis + 2) % 3
+        for i in (0, 1):
+            for j in (0, 1):
+                for side in (0, 1):
+                    corner = [0.0, 0.0, 0.0]
+                    corner[axis] = side
+                    corner[u] = i
+                    corner[v] = j
+                    edges.append(corner)
+    return numpy.array(faces + edges, dtype=numpy.float32), len(faces), len(edges)
+
+
+SelectionVertexShaderSource = f"""#version 150
+            // The corner of the unit cube.
+            in vec3 position;
+
+            // The transform of the box origin to clip space.
+            uniform mat4 transformation_matrix;
+            // Two texels for each box relative to the box origin.
+            // (min_x, min_y, min_z, used), (max_x, max_y, max_z, unused)
+            uniform sampler2D boxes;
+
+            const int box_texture_width = {BoxTextureWidth};
+            const float outset = {BoxOutset};
+
+            void main() {{
+                int texel = gl_InstanceID * 2;
+                ivec2 min_texel = ivec2(texel % box_texture_width, texel / box_texture_width);
+                vec4 box_min = texelFetch(boxes, min_texel, 0);
+                vec4 box_max = texelFetch(boxes, min_texel + ivec2(1, 0), 0);
+                if (box_min.w == 0.0) {{
+                    // The slot is not used. Move the vertex outside the clip volume.
+                    gl_Position = vec4(2.0, 2.0, 2.0, 1.0);
+                    return;
+                }}
+                vec3 world = mix(box_min.xyz - outset, box_max.xyz + outset, position);
+                gl_Position = transformation_matrix * vec4(world, 1.0);
+            }}"""
+
+SelectionFragmentShaderSource = """#version 150
+            out vec4 outColor;
+
+            uniform vec4 colour;
+
+            void main(){
+                outColor = colour;
+            }"""
+
+
+class SelectionHit(NamedTuple):
+    """The selection box hit by a ray."""
+
+    box: SelectionBox
+    # The distance along the ray to the hit in multiples of the direction vector.
+    distance: float
+
+
+class SelectionGLData:
+    """All data owned by one view that only exists after OpenGL initialisation."""
+
+    context: QOpenGLContext
+    program: QOpenGLShaderProgram
+    matrix_location: int
+    colour_location: int
+    vao: QOpenGLVertexArrayObject
+    vbo: QOpenGLBuffer
+    face_vertex_count: int
+    edge_vertex_count: int
+    # The position of each box. Created when there is a box to draw.
+    texture: QOpenGLTexture | None
+    # The number of rows in the texture.
+    texture_rows: int
+
+    def __init__(
+        self,
+        context: QOpenGLContext,
+        program: QOpenGLShaderProgram,
+        matrix_location: int,
+        colour_location: int,
+        vao: QOpenGLVertexArrayObject,
+        vbo: QOpenGLBuffer,
+        face_vertex_count: int,
+        edge_vertex_count: int,
+    ):
+        self.context = context
+        self.program = program
+        self.matrix_location = matrix_location
+        self.colour_location = colour_location
+        self.vao = vao
+        self.vbo = vbo
+        self.face_vertex_count = face_vertex_count
+        self.edge_vertex_count = edge_vertex_count
+        self.texture = None
+        self.texture_rows = 0
+
+
+class SelectionGeometry(QObject):
+    """
+    Draws the selection boxes.
+
+    Every box is an instance of one cube mesh positioned by two texels of a float texture.
+    Each box keeps its slot while it is selected.
+    The selection diffs are applied to the slots so a change only costs as much as the number of boxes changed.
+    Point and ray queries use a bounding volume hierarchy built when first needed after the selection changes.
+    This must exist on the main thread.
+    """
+
+    _gl_data: SelectionGLData | None
+
+    # The selection has changed and needs repainting.
+    geometry_changed = Signal()
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._gl_data = None
+        # The slot of each selected box.
+        self._slots: dict[SelectionBox, int] = {}
+        # The box in each slot. None if the slot is free.
+        self._slot_boxes: list[SelectionBox | None] = []
+        # A heap of the free slots so the lowest is used first and the drawn instance range stays small.
+        self._free_slots: list[int] = []
+        # One more than the highest used slot.
+        self._instance_count = 0
+        # The block the box texture positions are relative to.
+        self._origin = (0, 0, 0)
+        # Two texels for each slot relative to the origin. The slot count is always a multiple of BoxesPerRow.
+        self._instances = numpy.zeros((0, 8), dtype=numpy.float32)
+        # The texture rows that have changed since they were uploaded.
+        self._dirty_rows: set[int] = set()
+        # The index of the selected boxes and the slot of each box in it.
+        # None if it needs building.
+        self._index: tuple[BoxIndex, list[int]] | None = None
+        # Used to destroy the OpenGL data.
+        self._surface = QOffscreenSurface()
+        self._surface.create()
+        # The selection version the slots match.
+        self._version = get_selection_version()
+        self._apply_changes(tuple(dict.fromkeys(get_selection())), ())
+        selection_diff.connect(self._on_selection_diff)
+
+    def _on_selection_diff(self, diff: SelectionDiff) -> None:
+        if diff.version == self._version + 1:
+            self._apply_changes(diff.added, diff.removed)
+        else:
+            # A change was missed. Compare with the whole selection.
+            boxes = dict.fromkeys(get_selection())
+            self._apply_changes(
+                tuple(box for box in boxes if box not in self._slots),
+                tuple(box for box in self._slots if box not in boxes),
+            )
+        self._version = diff.version
+
+    def _apply_changes(
+        self, added: tuple[SelectionBox, ...], removed: tuple[SelectionBox, ...]
+    ) -> None:
+        """Update the slots of the boxes that changed."""
+        if not removed and not added:
+            return
+        for box in removed:
+            slot = self._slots.pop(box, None)
+            if slot is None:
+                continue
+            self._slot_boxes[slot] = None
+            heapq.heappush(self._free_slots, slot)
+            self._instances[slot] = 0
+            self._dirty_rows.add(slot // BoxesPerRow)
+        for box in added:
+            if box in self._slots:
+                continue
+            if not self._free_slots:
+                self._grow()
+            slot = heapq.heappop(self._free_slots)
+            self._slots[box] = slot
+            self._slot_boxes[slot] = box
+            self._set_instance(slot, box)
+            self._instance_count = max(self._instance_count, slot + 1)
+        while (
+            self._instance_count and self._slot_boxes[self._instance_count - 1] is None
+        ):
+            self._instance_count -= 1
+        self._index = None
+        self.geometry_changed.emit()
+
+    def _set_instance(self, slot: int, box: SelectionBox) -> None:
+        """Write the position of a box relative to the origin into its slot."""
+        ox, oy, oz = self._origin
+        self._instances[slot] = (
+            box.min_x - ox,
+            box.min_y - oy,
+            box.min_z - oz,
+            1.0,
+            box.max_x - ox,
+            box.max_y - oy,
+            box.max_z - oz,
+            0.0,
+        )
+        self._dirty_rows.add(slot // BoxesPerRow)
+
+    def _update_origin(self, x: float, y: float, z: float) -> None:
+        """Move the origin near the camera if the camera has moved far from it."""
+        ox, oy, oz = self._origin
+        if max(abs(x - ox), abs(y - oy), abs(z - oz)) <= OriginRecentreDistance:
+            return
+        self._origin = (
+            floor(x / OriginStep) * OriginStep,
+            floor(y / OriginStep) * OriginStep,
+            floor(z / OriginStep) * OriginStep,
+        )
+        for box, slot in self._slots.items():
+            self._set_instance(slot, box)
+
+    def _grow(self) -> None:
+        """Double the number of slots."""
+        old_count = len(self._instances)
+        new_count = max(BoxesPerRow, old_count * 2)
+        instances = numpy.zeros((new_count, 8), dtype=numpy.float32)
+        instances[:old_count] = self._instances
+        self._instances = instances
+        self._slot_boxes.extend([None] * (new_count - old_count))
+        # The new slots are all higher than the existing ones so the heap order is kept.
+        self._free_slots.extend(range(old_count, new_count))
+
+    def _get_index(self) -> tuple[BoxIndex, list[int]]:
+        if self._index is None:
+            # The index is built from the exact coordinates rather than the texture positions.
+            slots = list(self._slots.values())
+            boxes = [
+                (box.min_x, box.min_y, box.min_z, box.max_x, box.max_y, box.max_z)
+                for box in self._slots
+            ]
+            self._index = (BoxIndex(boxes), slots)
+        return self._index
+
+    def get_boxes_containing(self, x: float, y: float, z: float) -> list[SelectionBox]:
+        """Get the selection boxes containing a point. Points on the surface of a box are contained by it."""
+        index, slots = self._get_index()
+        boxes = []
+        for box_index in index.get_boxes_containing(x, y, z):
+            box = self._slot_boxes[slots[box_index]]
+            if box is not None:
+                boxes.append(box)
+        return boxes
+
+    def raycast(
+        self,
+        origin: tuple[float, float, float],
+        direction: tuple[float, float, float],
+        max_distance: float = inf,
+    ) -> SelectionHit | None:
+        """
+        Find the nearest selection box hit by a ray.
+
+        :param origin: The start of the ray.
+        :param direction: The direction of the ray. The distance is in multiples of this vector.
+        :param max_distance: The maximum distance along the ray to search.
+        :return: The hit or None if no box was hit.
+        """
+        index, slots = self._get_index()
+        hit = index.raycast(origin, direction, max_distance)
+        if hit is None:
+            return None
+        box = self._slot_boxes[slots[hit.box_index]]
+        if box is None:
+            return None
+        return SelectionHit(box, hit.distance)
+
+    def init_gl(self) -> None:
+        """
+        Initialise the OpenGL data.
+        This must be called by the main thread with the view's context active.
+        """
+        if self._gl_data is not None:
+            raise RuntimeError("gl_data is not None.")
+        program = QOpenGLShaderProgram()
+        program.addShaderFromSourceCode(
+            QOpenGLShader.ShaderTypeBit.Vertex, SelectionVertexShaderSource
+        )
+        program.addShaderFromSourceCode(
+            QOpenGLShader.ShaderTypeBit.Fragment, SelectionFragmentShaderSource
+        )
+        program.bindAttributeLocation("position", 0)
+        program.link()
+        program.bind()
+        matrix_location = program.uniformLocation("transformation_matrix")
+        colour_location = program.uniformLocation("colour")
+        program.setUniformValue1i(program.uniformLocation("boxes"), 0)
+        program.release()
+
+        f = QOpenGLContext.currentContext().functions()
+        mesh, face_vertex_count, edge_vertex_count = create_box_mesh()
+
+        vao = QOpenGLVertexArrayObject()
+        vao.create()
+        vao.bind()
+
+        vbo = QOpenGLBuffer()
+        vbo.create()
+        vbo.bind()
+        vbo.allocate(mesh, mesh.nbytes)
+
+        # position
+        f.glEnableVertexAttribArray(0)
+        f.glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 3 * FloatSize, VoidPtr(0))
+
+        vao.release()
+        vbo.release()
+
+        self._gl_data = SelectionGLData(
+            QOpenGLContext.currentContext(),
+            program,
+            matrix_location,
+            colour_location,
+            vao,
+            vbo,
+            face_vertex_count,
+            edge_vertex_count,
+        )
+        # Everything must be uploaded to the new texture.
+        self._dirty_rows.update(range(len(self._instances) // BoxesPerRow))
+
+    def destroy_gl(self) -> None:
+        """
+        Destroy the OpenGL data.
+        This must be called by the main thread.
+        """
+        gl_data = self._gl_data
+        if gl_data is None:
+            raise RuntimeError("gl_data is None.")
+        if gl_data.context.makeCurrent(self._surface):
+            if gl_data.texture is not None:
+                gl_data.texture.destroy()
+            gl_data.vao.destroy()
+            gl_data.vbo.destroy()
+            gl_data.context.doneCurrent()
+        self._gl_data = None
+
+    def _update_texture(self, gl_data: SelectionGLData) -> QOpenGLTexture | None:
+        """
+        Upload the changed rows of the box texture.
+        The texture is recreated if it is too small.
+        This must be called by the main thread with the context active.
+        """
+        rows = len(self._instances) // BoxesPerRow
+        if not rows:
+            return None
+        texels = self._instances.reshape(rows, BoxTextureWidth, 4)
+        if gl_data.texture is None or gl_data.texture_rows < rows:
+            if gl_data.texture is not None:
+                gl_data.texture.destroy()
+            texture = QOpenGLTexture(QOpenGLTexture.Target.Target2D)
+            texture.setSize(BoxTextureWidth, rows)
+            texture.setFormat(QOpenGLTexture.TextureFormat.RGBA32F)
+            texture.setMinificationFilter(QOpenGLTexture.Filter.Nearest)
+            texture.setMagnificationFilter(QOpenGLTexture.Filter.Nearest)
+            texture.allocateStorage(
+                QOpenGLTexture.PixelFormat.RGBA, QOpenGLTexture.PixelType.Float32
+            )
+            texture.setData(
+                QOpenGLTexture.PixelFormat.RGBA,
+                QOpenGLTexture.PixelType.Float32,
+                texels,
+            )
+            gl_data.texture = texture
+            gl_data.texture_rows = rows
+        elif self._dirty_rows:
+            # Upload the range of rows containing all changes.
+            first_row = min(self._dirty_rows)
+            last_row = max(self._dirty_rows) + 1
+            gl_data.texture.setData(
+                0,
+                first_row,
+                0,
+                BoxTextureWidth,
+                last_row - first_row,
+                1,
+                QOpenGLTexture.PixelFormat.RGBA,
+                QOpenGLTexture.PixelType.Float32,
+                numpy.ascontiguousarray(texels[first_row:last_row]),
+            )
+        self._dirty_rows.clear()
+        return gl_data.texture
+
+    def paint_gl(self, projection_matrix: QMatrix4x4, view_matrix: QMatrix4x4) -> None:
+        """
+        Draw the selection.
+        This must be called by the main thread with the context active.
+
+        :param projection_matrix: The camera internal projection matrix.
+        :param view_matrix: The camera external matrix.
+        """
+        gl_data = self._gl_data
+        if gl_data is None:
+            return
+        camera = view_matrix.inverted()[0].map(QVector3D(0, 0, 0))
+        self._update_origin(camera.x(), camera.y(), camera.z())
+        texture = self._update_texture(gl_data)
+        instance_count = self._instance_count
+        if texture is None or not instance_count:
+            return
+
+        f = QOpenGLContext.currentContext().functions()
+        ef = QOpenGLContext.currentContext().extraFunctions()
+        f.glEnable(GL_CULL_FACE)
+        f.glCullFace(GL_BACK)
+        f.glEnable(GL_BLEND)
+        f.glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+        program = gl_data.program
+        program.bind()
+        # Like the chunk model transforms this moves the geometry from the origin to its location.
+        model_matrix = QMatrix4x4()
+        model_matrix.translate(*self._origin)
+        program.setUniformValue(
+            gl_data.matrix_location, projection_matrix * view_matrix * model_matrix
+        )
+        texture.bind(0)
+        gl_data.vao.bind()
+        # The translucent faces must not hide the blocks or edges behind them.
+        f.glDepthMask(GL_FALSE)
+        f.glUniform4f(gl_data.colour_location, *SelectionFaceColour)
+        ef.glDrawArraysInstanced(
+            GL_TRIANGLES, 0, gl_data.face_vertex_count, instance_count
+        )
+        f.glDepthMask(GL_TRUE)
+        f.glUniform4f(gl_data.colour_location, *SelectionEdgeColour)
+        ef.glDrawArraysInstanced(
+            GL_LINES,
+            gl_data.face_vertex_count,
+            gl_data.edge_vertex_count,
+            instance_count,
+        )
+        gl_data.vao.release()
+        program.release()
@@ -3,15 +3,39 @@ from PySide6.QtCore import QObject, Signal
 
 class RenderSettings(QObject):
     render_distance_changed = Signal()
+    frame_rate_changed = Signal()
+    # The settings changing what is meshed have changed.
+    render_mode_changed = Signal()
 
     def __init__(self) -> None:
         super().__init__()
         self._chunk_load_distance = 5
         self._chunk_unload_distance = 100
+        self._max_fps = 60
+        self._idle_fps = 10
+        self._adaptive_quality = False
+        self._target_fps = 30
+        self._min_chunk_load_distance = 2
+        # The load distance chosen by the adaptive quality controller.
+        self._adaptive_load_distance = self._chunk_load_distance
+        self._retained_geometry_budget = 256 * 1024 * 1024
+        self._mesh_cache_budget = 128 * 1024 * 1024
+        self._surface_depth: int | None = None
+        self._horizon_distance = 64
 
     @property
     def chunk_load_distance(self) -> int:
-        """The radius around the camera within which should be loaded."""
+        """
+        The radius around the camera within which should be loaded.
+        If adaptive quality is enabled this is the distance chosen by the controller.
+        """
+        if self._adaptive_quality:
+            return self._adaptive_load_distance
+        return self._chunk_load_distance
+
+    @property
+    def max_chunk_load_distance(self) -> int:
+        """The load distance set by the user. Adaptive quality never exceeds this."""
         return self._chunk_load_distance
 
     @property
@@ -23,7 +47,114 @@ class RenderSettings(QObject):
         unload_distance = max(load_distance + 2, unload_distance)
         self._chunk_load_distance = load_distance
         self._chunk_unload_distance = unload_distance
+        self._adaptive_load_distance = min(self._adaptive_load_distance, load_distance)
         self.render_distance_changed.emit()
 
+    @property
+    def max_fps(self) -> int:
+        """The maximum number of frames per second. Zero is unlimited."""
+        return self._max_fps
+
+    @property
+    def idle_fps(self) -> int:
+        """The maximum number of frames per second when there is no user input. Zero is unlimited."""
+        return self._idle_fps
+
+    def set_frame_rate(self, max_fps: int, idle_fps: int) -> None:
+        max_fps = max(0, max_fps)
+        idle_fps = max(0, idle_fps)
+        if max_fps:
+            idle_fps = min(idle_fps, max_fps) if idle_fps else max_fps
+        self._max_fps = max_fps
+        self._idle_fps = idle_fps
+        self.frame_rate_changed.emit()
+
+    @property
+    def adaptive_quality(self) -> bool:
+        """Is the load distance adjusted to hold the target frame rate."""
+        return self._adaptive_quality
+
+    @property
+    def target_fps(self) -> int:
+        """The frame rate adaptive quality tries to hold."""
+        return self._target_fps
+
+    @property
+    def min_chunk_load_distance(self) -> int:
+        """The smallest load distance adaptive quality may choose."""
+        return self._min_chunk_load_distance
+
+    def set_adaptive_quality(
+        self, enabled: bool, target_fps: int = 30, min_load_distance: int = 2
+    ) -> None:
+        self._adaptive_quality = enabled
+        self._target_fps = max(1, target_fps)
+        self._min_chunk_load_distance = max(1, min_load_distance)
+        self._adaptive_load_distance = self._chunk_load_distance
+        self.render_distance_changed.emit()
+
+    def set_adaptive_load_distance(self, load_distance: int) -> None:
+        """
+        Set the load distance chosen by the adaptive quality controller.
+        The value is clamped to the range allowed by the settings.
+        """
+        load_distance = max(
+            min(self._min_chunk_load_distance, self._chunk_load_distance),
+            min(load_distance, self._chunk_load_distance),
+        )
+        if load_distance != self._adaptive_load_distance:
+            self._adaptive_load_distance = load_distance
+            if self._adaptive_quality:
+                self.render_distance_changed.emit()
+
+    @property
+    def retained_geometry_budget(self) -> int:
+        """The number of bytes of geometry to keep for dimensions that are not being viewed."""
+        return self._retained_geometry_budget
+
+    def set_retained_geometry_budget(self, budget: int) -> None:
+        self._retained_geometry_budget = max(0, budget)
+
+    @property
+    def mesh_cache_budget(self) -> int:
+        """
+        The number of bytes of compressed chunk meshes to keep in memory.
+        Unloaded chunks in the cache are uploaded again without meshing. Zero disables the cache.
+        """
+        return self._mesh_cache_budget
+
+    def set_mesh_cache_budget(self, budget: int) -> None:
+        self._mesh_cache_budget = max(0, budget)
+
+    @property
+    def surface_depth(self) -> int | None:
+        """
+        The number of blocks below the surface to draw or None to draw all blocks.
+        The surface of a column is the highest full opaque block in it or a neighbouring column.
+        This reduces the geometry so that larger render distances can be used.
+        """
+        return self._surface_depth
+
+    def set_surface_depth(self, depth: int | None) -> None:
+        if depth is not None:
+            depth = max(0, depth)
+        if depth != self._surface_depth:
+            self._surface_depth = depth
+            self.render_mode_changed.emit()
+
+    @property
+    def horizon_distance(self) -> int:
+        """
+        The radius in chunks around the camera within which distant terrain is drawn as a low resolution heightfield.
+        This is only drawn outside the chunk load distance. Zero disables it.
+        """
+        return self._horizon_distance
+
+    def set_horizon_distance(self, distance: int) -> None:
+        distance = max(0, distance)
+        if distance != self._horizon_distance:
+            self._horizon_distance = distance
+            self.render_distance_changed.emit()
+
 
 render_settings = RenderSettings()
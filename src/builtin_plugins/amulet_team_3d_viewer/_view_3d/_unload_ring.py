@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from amulet.data_types import DimensionId
+    from ._chunk_changes import ChunkKey
+
+
+def get_unload_ring(
+    dimension: DimensionId,
+    old_cx: int,
+    old_cz: int,
+    cx: int,
+    cz: int,
+    distance: int,
+) -> Iterator[ChunkKey]:
+    """
+    Get the chunks that were within the unload distance of the old position but are not within it of the new position.
+
+    :param dimension: The dimension the chunks are in.
+    :param old_cx: The previous chunk x coordinate of the camera.
+    :param old_cz: The previous chunk z coordinate of the camera.
+    :param cx: The new chunk x coordinate of the camera.
+    :param cz: The new chunk z coordinate of the camera.
+    :param distance: The unload distance. Chunks this distance or further away are unloaded.
+    """
+    radius = distance - 1
+    for x in range(old_cx - radius, old_cx + radius + 1):
+        if radius < abs(x - cx):
+            z_ranges = (range(old_cz - radius, old_cz + radius + 1),)
+        else:
+            z_ranges = (
+                range(old_cz - radius, min(old_cz + radius, cz - radius - 1) + 1),
+                range(max(old_cz - radius, cz + radius + 1), old_cz + radius + 1),
+            )
+        for z_range in z_ranges:
+            for z in z_range:
+                yield dimension, x, z
+
+
+def get_unload_ring_size(
+    old_cx: int, old_cz: int, cx: int, cz: int, distance: int
+) -> int:
+    """Get the number of chunks :func:`get_unload_ring` yields."""
+    width = 2 * distance - 1
+    overlap_x = max(0, width - abs(cx - old_cx))
+    overlap_z = max(0, width - abs(cz - old_cz))
+    return width * width - overlap_x * overlap_z
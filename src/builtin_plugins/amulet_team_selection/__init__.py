@@ -1 +1,13 @@
-from ._api import get_selection, set_selection, selection_changed
+from ._api import (
+    get_selection,
+    set_selection,
+    selection_changed,
+    SelectionDiff,
+    selection_diff,
+    get_selection_version,
+    update_selection,
+    move_boxes,
+    get_merged_selection,
+)
+from ._merged_selection import MergedSelection
+from ._operations import remap_blocks, fill, replace
@@ -1,17 +1,119 @@
-from amulet.selection import SelectionGroup
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from amulet.data_types import BlockCoordinates
+from amulet.selection import SelectionBox, SelectionGroup
 from amulet_editor.models.generic._singleton_signal import SingletonSignal
 
+from ._merged_selection import MergedSelection
+
+
+class SelectionDiff(NamedTuple):
+    """The boxes added to and removed from the selection by one change."""
+
+    # The selection version after the change.
+    # This increases by one for each change so a listener can tell if it missed one.
+    version: int
+    added: tuple[SelectionBox, ...]
+    removed: tuple[SelectionBox, ...]
+
 
 _selection: SelectionGroup = SelectionGroup()
+# The boxes in the selection. Each box is only stored once.
+_boxes: dict[SelectionBox, None] = {}
+_version = 0
+_merged_selection: MergedSelection | None = None
 
 _selection_changed_obj, selection_changed = SingletonSignal(SelectionGroup)
+# Emitted before selection_changed with the boxes that changed.
+_selection_diff_obj, selection_diff = SingletonSignal(SelectionDiff)
 
 
 def get_selection() -> SelectionGroup:
     return _selection
 
 
-def set_selection(selection: SelectionGroup) -> None:
-    global _selection
+def get_selection_version() -> int:
+    """Get the number of times the selection has changed."""
+    return _version
+
+
+def get_merged_selection() -> MergedSelection:
+    """
+    Get the volume of the selection as a canonical set of disjoint boxes.
+    This is built when first requested after each change.
+    """
+    global _merged_selection
+    if _merged_selection is None:
+        _merged_selection = MergedSelection(_boxes)
+    return _merged_selection
+
+
+def _apply(
+    selection: SelectionGroup,
+    added: tuple[SelectionBox, ...],
+    removed: tuple[SelectionBox, ...],
+) -> None:
+    global _selection, _version, _merged_selection
     _selection = selection
+    if not added and not removed:
+        # The boxes have not changed but the group may have been reordered.
+        selection_changed.emit(selection)
+        return
+    for box in removed:
+        del _boxes[box]
+    for box in added:
+        _boxes[box] = None
+    _version += 1
+    _merged_selection = None
+    selection_diff.emit(SelectionDiff(_version, added, removed))
     selection_changed.emit(selection)
+
+
+def set_selection(selection: SelectionGroup) -> None:
+    boxes = dict.fromkeys(selection)
+    added = tuple(box for box in boxes if box not in _boxes)
+    removed = tuple(box for box in _boxes if box not in boxes)
+    _apply(selection, added, removed)
+
+
+def update_selection(
+    add: Iterable[SelectionBox] = (), remove: Iterable[SelectionBox] = ()
+) -> None:
+    """
+    Add and remove boxes from the selection.
+    Boxes already in the selection are not added again and boxes not in the selection are ignored when removing.
+    Listeners of selection_diff only receive the boxes that changed.
+
+    :param add: The boxes to add.
+    :param remove: The boxes to remove. These are removed before adding.
+    """
+    removed = tuple(box for box in dict.fromkeys(remove) if box in _boxes)
+    removed_set = set(removed)
+    added = tuple(
+        box for box in dict.fromkeys(add) if box not in _boxes or box in removed_set
+    )
+    # A box removed and added again is unchanged.
+    unchanged = removed_set.intersection(added)
+    removed = tuple(box for box in removed if box not in unchanged)
+    added = tuple(box for box in added if box not in unchanged)
+    if not added and not removed:
+        return
+    boxes = dict(_boxes)
+    for box in removed:
+        del boxes[box]
+    boxes.update(dict.fromkeys(added))
+    _apply(SelectionGroup(boxes), added, removed)
+
+
+def move_boxes(boxes: Iterable[SelectionBox], offset: BlockCoordinates) -> None:
+    """
+    Move some of the selected boxes.
+
+    :param boxes: The boxes to move. Boxes not in the selection are ignored.
+    :param offset: The distance to move them.
+    """
+    moving = [box for box in dict.fromkeys(boxes) if box in _boxes]
+    update_selection(
+        add=[box.create_moved_box(offset) for box in moving], remove=moving
+    )
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections.abc import Callable, Iterable, Sequence
+from typing import Any
+
+from amulet.selection import SelectionBox, SelectionGroup
+
+# A list of disjoint, sorted (min, max) intervals.
+Intervals = tuple[tuple[int, int], ...]
+# The cross-section of a slab. Sorted, disjoint (min, max, cross-section) slabs.
+Slabs = tuple[tuple[int, int, Any], ...]
+
+
+def _merge_intervals(intervals: Iterable[tuple[int, int]]) -> Intervals:
+    """Merge overlapping and touching intervals. Empty intervals are dropped."""
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if merged[-1][1] < end:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return tuple(merged)
+
+
+def _sweep(
+    items: Sequence[tuple[int, int, Any]],
+    cross_section: Callable[[list[Any]], Any],
+) -> Slabs:
+    """
+    Split an axis into slabs where the same items overlap.
+    Neighbouring slabs with the same cross-section are joined so the result is canonical.
+
+    :param items: (min, max, value) for each item.
+    :param cross_section: Get the cross-section of a slab from the values of the items overlapping it.
+        Slabs with an empty cross-section are dropped.
+    :return: The non-empty slabs in ascending order.
+    """
+    coordinates = sorted({item[0] for item in items} | {item[1] for item in items})
+    starts: dict[int, list[int]] = {}
+    ends: dict[int, list[int]] = {}
+    for index, (start, end, _) in enumerate(items):
+        if start < end:
+            starts.setdefault(start, []).append(index)
+            ends.setdefault(end, []).append(index)
+    active: set[int] = set()
+    slabs: list[tuple[int, int, Any]] = []
+    for start, end in zip(coordinates, coordinates[1:]):
+        active.difference_update(ends.get(start, ()))
+        active.update(starts.get(start, ()))
+        if not active:
+            continue
+        section = cross_section([items[index][2] for index in sorted(active)])
+        if not section:
+            continue
+        if slabs and slabs[-1][1] == start and slabs[-1][2] == section:
+            slabs[-1] = (slabs[-1][0], end, section)
+        else:
+            slabs.append((start, end, section))
+    return tuple(slabs)
+
+
+def _yz_section(rectangles: list[tuple[int, int, int, int]]) -> Slabs:
+    """Get the y slabs and the z intervals in each of them from (min_y, max_y, min_z, max_z) rectangles."""
+    return _sweep(
+        [(min_y, max_y, (min_z, max_z)) for min_y, max_y, min_z, max_z in rectangles],
+        _merge_intervals,
+    )
+
+
+class MergedSelection:
+    """
+    The volume covered by some selection boxes as a canonical set of disjoint boxes.
+
+    The volume is split into x slabs, each x slab into y slabs and each y slab into z intervals.
+    Neighbouring slabs with the same contents are joined so any boxes covering the same blocks give an equal result.
+    Finding if a block is contained is a binary search on each axis.
+    This is immutable.
+    """
+
+    def __init__(self, boxes: Iterable[SelectionBox] = ()) -> None:
+        self._slabs: Slabs = _sweep(
+            [
+                (box.min_x, box.max_x, (box.min_y, box.max_y, box.min_z, box.max_z))
+                for box in boxes
+            ],
+            _yz_section,
+        )
+        # The start of each slab on each axis for binary searching.
+        self._x_starts = [min_x for min_x, _, _ in self._slabs]
+        self._y_starts = [
+            [min_y for min_y, _, _ in y_slabs] for _, _, y_slabs in self._slabs
+        ]
+        self._z_starts = [
+            [[min_z for min_z, _ in intervals] for _, _, intervals in y_slabs]
+            for _, _, y_slabs in self._slabs
+        ]
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, MergedSelection):
+            return NotImplemented
+        return self._slabs == other._slabs
+
+    def __hash__(self) -> int:
+        return hash(self._slabs)
+
+    def __bool__(self) -> bool:
+        return bool(self._slabs)
+
+    def __repr__(self) -> str:
+        return f"MergedSelection({list(self.boxes)!r})"
+
+    @property
+    def boxes(self) -> tuple[SelectionBox, ...]:
+        """The disjoint boxes covering the volume in x, y, z order."""
+        return tuple(
+            SelectionBox((min_x, min_y, min_z), (max_x, max_y, max_z))
+            for min_x, max_x, y_slabs in self._slabs
+            for min_y, max_y, intervals in y_slabs
+            for min_z, max_z in intervals
+        )
+
+    def selection_group(self) -> SelectionGroup:
+        """Get the disjoint boxes as a selection group."""
+        return SelectionGroup(self.boxes)
+
+    @property
+    def volume(self) -> int:
+        """The number of blocks in the volume."""
+        return sum(
+            (max_x - min_x) * (max_y - min_y) * (max_z - min_z)
+            for min_x, max_x, y_slabs in self._slabs
+            for min_y, max_y, intervals in y_slabs
+            for min_z, max_z in intervals
+        )
+
+    def contains_block(self, x: int, y: int, z: int) -> bool:
+        """Is the block in the volume. This takes O(log n) time."""
+        x_index = bisect_right(self._x_starts, x) - 1
+        if x_index < 0:
+            return False
+        _, max_x, y_slabs = self._slabs[x_index]
+        if max_x <= x:
+            return False
+        y_index = bisect_right(self._y_starts[x_index], y) - 1
+        if y_index < 0:
+            return False
+        _, max_y, intervals = y_slabs[y_index]
+        if max_y <= y:
+            return False
+        z_index = bisect_right(self._z_starts[x_index][y_index], z) - 1
+        return 0 <= z_index and z < intervals[z_index][1]
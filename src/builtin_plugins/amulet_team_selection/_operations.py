@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import os
+from collections.abc import Callable, Iterable, Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+
+import numpy
+import numpy.typing
+
+from amulet.block import BlockStack
+from amulet.chunk_components import BlockComponent, SectionArrayMap
+from amulet.data_types import DimensionId
+from amulet.errors import ChunkLoadError
+from amulet.level.abc import Dimension, Level
+from amulet.palette import BlockPalette
+from amulet.selection import SelectionBox, SelectionGroup
+
+from amulet_editor.models.generic._promise import Promise
+
+from ._api import get_selection
+from ._merged_selection import MergedSelection
+
+# The number of blocks along the x and z axes of a chunk.
+ChunkWidth = 16
+# The number of chunks queued on each worker thread.
+# This bounds memory use and how long a cancel takes to be noticed.
+ChunksPerWorker = 4
+
+# Map each index of a palette to a new index. None if no block in the palette changes.
+# This may add blocks to the palette.
+GetLookup = Callable[[BlockPalette], numpy.typing.NDArray[numpy.uint32] | None]
+
+
+def _get_chunk_boxes(
+    boxes: Iterable[SelectionBox],
+) -> dict[tuple[int, int], list[SelectionBox]]:
+    """Group the boxes by the chunks they intersect. The boxes must be disjoint."""
+    chunk_boxes: dict[tuple[int, int], list[SelectionBox]] = {}
+    for box in boxes:
+        for cx in range(box.min_x // ChunkWidth, (box.max_x - 1) // ChunkWidth + 1):
+            for cz in range(box.min_z // ChunkWidth, (box.max_z - 1) // ChunkWidth + 1):
+                chunk_boxes.setdefault((cx, cz), []).append(box)
+    return chunk_boxes
+
+
+def _should_populate(
+    default: int | numpy.ndarray,
+    lookup: numpy.typing.NDArray[numpy.uint32],
+) -> bool:
+    """
+    Do missing sections need creating to apply the lookup.
+    Missing sections are filled with the default block.
+    They only need creating if the default block changes.
+    """
+    return not isinstance(default, int) or bool(lookup[default] != default)
+
+
+def _get_section(
+    sections: SectionArrayMap, cy: int, populate: bool
+) -> numpy.typing.NDArray[numpy.uint32] | None:
+    """
+    Get a section array to edit.
+
+    :param sections: The sections of the chunk.
+    :param cy: The section coordinate.
+    :param populate: Create the section if it does not exist.
+    :return: The section array. None if the section does not exist and was not created.
+    """
+    if cy not in sections:
+        if not populate:
+            return None
+        sections.populate(cy)
+    return sections[cy]
+
+
+def _get_replace_lookup(
+    palette: BlockPalette, replacements: Mapping[BlockStack, BlockStack]
+) -> numpy.typing.NDArray[numpy.uint32] | None:
+    """
+    Get the lookup table replacing the blocks in a palette.
+    The replacements are not chained. If A is replaced with B and B with C, A becomes B.
+
+    :return: The lookup table. None if no block in the palette is replaced.
+    """
+    # Find the matches before adding the replacement blocks to the palette.
+    matches = [
+        (index, replacements[block])
+        for index, block in enumerate(palette)
+        if block in replacements
+    ]
+    if not matches:
+        return None
+    new_indexes = [
+        (index, palette.block_stack_to_index(replacement))
+        for index, replacement in matches
+    ]
+    lookup = numpy.arange(len(palette), dtype=numpy.uint32)
+    for index, new_index in new_indexes:
+        lookup[index] = new_index
+    return lookup
+
+
+class _ChunkUnchanged(Exception):
+    """Raised inside ChunkHandle.edit to leave the chunk without setting it."""
+
+
+def _edit_chunk(
+    dimension: Dimension,
+    cx: int,
+    cz: int,
+    boxes: list[SelectionBox],
+    get_lookup: GetLookup,
+) -> bool:
+    """
+    Remap the blocks of one chunk inside the boxes.
+    Chunks that do not exist are not created.
+
+    :return: True if the chunk was changed.
+    """
+    chunk_handle = dimension.get_chunk_handle(cx, cz)
+    try:
+        # The edit context sets the chunk when it exits without an exception.
+        # Unchanged chunks raise _ChunkUnchanged so that they are not set.
+        with chunk_handle.edit(components=[BlockComponent.ComponentID]) as chunk:
+            if not isinstance(chunk, BlockComponent):
+                raise _ChunkUnchanged
+            block_component = chunk.block
+            lookup = get_lookup(block_component.palette)
+            if lookup is None:
+                raise _ChunkUnchanged
+            sections = block_component.sections
+            size_x, size_y, size_z = sections.array_shape
+            populate = _should_populate(sections.default_array, lookup)
+            changed = False
+            for box in boxes:
+                x_slice = slice(
+                    max(box.min_x - cx * size_x, 0),
+                    min(box.max_x - cx * size_x, size_x),
+                )
+                z_slice = slice(
+                    max(box.min_z - cz * size_z, 0),
+                    min(box.max_z - cz * size_z, size_z),
+                )
+                for cy in range(box.min_y // size_y, (box.max_y - 1) // size_y + 1):
+                    # The section array is a view of the chunk data so this edits it in place.
+                    array = _get_section(sections, cy, populate)
+                    if array is None:
+                        continue
+                    y_slice = slice(
+                        max(box.min_y - cy * size_y, 0),
+                        min(box.max_y - cy * size_y, size_y),
+                    )
+                    region = array[x_slice, y_slice, z_slice]
+                    remapped = lookup[region]
+                    if numpy.array_equal(remapped, region):
+                        continue
+                    array[x_slice, y_slice, z_slice] = remapped
+                    changed = True
+            if not changed:
+                raise _ChunkUnchanged
+    except (ChunkLoadError, _ChunkUnchanged):
+        return False
+    return True
+
+
+def remap_blocks(
+    level: Level,
+    dimension_id: DimensionId,
+    get_lookup: GetLookup,
+    selection: SelectionGroup | MergedSelection | None = None,
+) -> Promise[int]:
+    """
+    Remap the blocks in a selection using a lookup table for each chunk palette.
+
+    The lookup table is created once for each chunk.
+    Each section is then remapped with one array operation rather than one call per block.
+    The chunks are edited in parallel on worker threads.
+    Chunks that do not exist are not created.
+    If the operation is canceled the chunks already edited stay edited.
+
+    :param level: The level to edit.
+    :param dimension_id: The dimension to edit.
+    :param get_lookup: Get the new index of each block in a chunk palette. This is called from worker threads.
+    :param selection: The region to edit. Defaults to the current selection.
+    :return: A promise returning the number of chunks changed.
+    """
+
+    # The selection module state is only accessed from the main thread so read it before starting the worker.
+    # The selection group is immutable so it is merged on the worker thread.
+    source = get_selection() if selection is None else selection
+
+    def func(promise_data: Promise.Data) -> int:
+        merged_selection = (
+            source if isinstance(source, MergedSelection) else MergedSelection(source)
+        )
+        chunk_boxes = _get_chunk_boxes(merged_selection.boxes)
+        if not chunk_boxes:
+            return 0
+        worker_count = os.cpu_count() or 1
+        changed_count = 0
+        finished_count = 0
+        with level.edit_parallel():
+            dimension = level.get_dimension(dimension_id)
+            chunks = iter(chunk_boxes.items())
+            with ThreadPoolExecutor(worker_count) as executor:
+                pending: set[Future[bool]] = set()
+                while True:
+                    # Keep a bounded number of chunks queued so cancelling does not wait for every chunk.
+                    while len(pending) < worker_count * ChunksPerWorker:
+                        item = next(chunks, None)
+                        if item is None:
+                            break
+                        (cx, cz), boxes = item
+                        pending.add(
+                            executor.submit(
+                                _edit_chunk, dimension, cx, cz, boxes, get_lookup
+                            )
+                        )
+                    if not pending:
+                        break
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        changed_count += future.result()
+                    finished_count += len(finished)
+                    promise_data.progress_change.emit(finished_count / len(chunk_boxes))
+                    if promise_data.is_cancel_requested():
+                        for future in pending:
+                            future.cancel()
+                        wait(pending)
+                        raise Promise.OperationCanceled()
+        return changed_count
+
+    return Promise(func)
+
+
+def fill(
+    level: Level,
+    dimension_id: DimensionId,
+    block: BlockStack,
+    selection: SelectionGroup | MergedSelection | None = None,
+) -> Promise[int]:
+    """
+    Set every block in a selection to one block.
+
+    :param level: The level to edit.
+    :param dimension_id: The dimension to edit.
+    :param block: The block to fill with.
+    :param selection: The region to fill. Defaults to the current selection.
+    :return: A promise returning the number of chunks changed.
+    """
+
+    def get_lookup(palette: BlockPalette) -> numpy.typing.NDArray[numpy.uint32]:
+        index = palette.block_stack_to_index(block)
+        return numpy.full(len(palette), index, dtype=numpy.uint32)
+
+    return remap_blocks(level, dimension_id, get_lookup, selection)
+
+
+def replace(
+    level: Level,
+    dimension_id: DimensionId,
+    replacements: Mapping[BlockStack, BlockStack],
+    selection: SelectionGroup | MergedSelection | None = None,
+) -> Promise[int]:
+    """
+    Replace blocks in a selection.
+
+    :param level: The level to edit.
+    :param dimension_id: The dimension to edit.
+    :param replacements: The block to replace each block with. Blocks not in this are not changed.
+    :param selection: The region to edit. Defaults to the current selection.
+    :return: A promise returning the number of chunks changed.
+    """
+    return remap_blocks(
+        level,
+        dimension_id,
+        partial(_get_replace_lookup, replacements=dict(replacements)),
+        selection,
+    )
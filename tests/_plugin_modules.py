@@ -0,0 +1,29 @@
+import os
+import sys
+from importlib import import_module
+from types import ModuleType
+
+PluginsPath = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "src",
+    "builtin_plugins",
+)
+
+
+def import_plugin_module(name: str) -> ModuleType:
+    """
+    Import a module from a builtin plugin by its full name. Eg. "amulet_team_selection._merged_selection"
+    The plugin manager imports plugins by their package name so this does the same.
+    The packages containing the module are registered without running their __init__
+    so that the module can be tested without starting the application.
+    """
+    parts = name.split(".")
+    path = PluginsPath
+    for i in range(len(parts) - 1):
+        package_name = ".".join(parts[: i + 1])
+        path = os.path.join(path, parts[i])
+        if package_name not in sys.modules:
+            package = ModuleType(package_name)
+            package.__path__ = [path]
+            sys.modules[package_name] = package
+    return import_module(name)
@@ -0,0 +1,145 @@
+import random
+import unittest
+from math import inf
+
+from tests._plugin_modules import import_plugin_module
+
+BoxIndex = import_plugin_module("amulet_team_3d_viewer._view_3d._box_index").BoxIndex
+
+Box = tuple[float, float, float, float, float, float]
+Vector = tuple[float, float, float]
+
+
+def random_boxes(rand: random.Random, count: int) -> list[Box]:
+    boxes = []
+    for _ in range(count):
+        low = [rand.randint(-50, 50) for _ in range(3)]
+        size = [rand.randint(0, 10) for _ in range(3)]
+        boxes.append((*low, *(a + b for a, b in zip(low, size))))
+    return boxes
+
+
+def random_direction(rand: random.Random) -> Vector:
+    direction = [rand.uniform(-1, 1) for _ in range(3)]
+    # Make some rays parallel to an axis or a plane.
+    for axis in range(3):
+        if rand.random() < 0.3:
+            direction[axis] = 0.0
+    if not any(direction):
+        direction[rand.randrange(3)] = rand.choice((-1.0, 1.0))
+    return direction[0], direction[1], direction[2]
+
+
+def contains(box: Box, point: Vector) -> bool:
+    return all(box[axis] <= point[axis] <= box[axis + 3] for axis in range(3))
+
+
+def hit_distance(
+    box: Box, origin: Vector, direction: Vector, max_distance: float
+) -> float | None:
+    """Get the distance to a box by clipping the ray to each axis in turn."""
+    start = 0.0
+    end = max_distance
+    for axis in range(3):
+        low = box[axis]
+        high = box[axis + 3]
+        if direction[axis] == 0:
+            if not low <= origin[axis] <= high:
+                return None
+            continue
+        enter = (low - origin[axis]) / direction[axis]
+        leave = (high - origin[axis]) / direction[axis]
+        start = max(start, min(enter, leave))
+        end = min(end, max(enter, leave))
+    if end < start:
+        return None
+    return start
+
+
+class BoxIndexTestCase(unittest.TestCase):
+    def test_empty(self) -> None:
+        index = BoxIndex([])
+        self.assertEqual(0, len(index))
+        self.assertEqual([], index.get_boxes_containing(0, 0, 0))
+        self.assertIsNone(index.raycast((0, 0, 0), (1, 0, 0)))
+
+    def test_get_boxes_containing(self) -> None:
+        rand = random.Random(0)
+        for count in (1, 5, 50, 500):
+            boxes = random_boxes(rand, count)
+            index = BoxIndex(boxes)
+            self.assertEqual(count, len(index))
+            for _ in range(200):
+                point = (
+                    rand.randint(-55, 65),
+                    rand.randint(-55, 65),
+                    rand.randint(-55, 65),
+                )
+                expected = [i for i, box in enumerate(boxes) if contains(box, point)]
+                self.assertEqual(expected, sorted(index.get_boxes_containing(*point)))
+
+    def test_surface_is_contained(self) -> None:
+        index = BoxIndex([(0, 0, 0, 2, 2, 2)])
+        self.assertEqual([0], index.get_boxes_containing(2, 1, 0))
+        self.assertEqual([], index.get_boxes_containing(2.5, 1, 0))
+
+    def test_raycast(self) -> None:
+        rand = random.Random(1)
+        for count in (1, 5, 50, 500):
+            boxes = random_boxes(rand, count)
+            index = BoxIndex(boxes)
+            for _ in range(200):
+                origin = (
+                    rand.uniform(-60, 70),
+                    rand.uniform(-60, 70),
+                    rand.uniform(-60, 70),
+                )
+                direction = random_direction(rand)
+                max_distance = rand.choice((inf, rand.uniform(0, 100)))
+                distances = [
+                    distance
+                    for box in boxes
+                    if (distance := hit_distance(box, origin, direction, max_distance))
+                    is not None
+                ]
+                hit = index.raycast(origin, direction, max_distance)
+                if not distances:
+                    self.assertIsNone(hit)
+                    continue
+                self.assertIsNotNone(hit)
+                self.assertAlmostEqual(min(distances), hit.distance)
+                # The reported box is hit at the reported distance.
+                distance = hit_distance(
+                    boxes[hit.box_index], origin, direction, max_distance
+                )
+                self.assertIsNotNone(distance)
+                self.assertAlmostEqual(distance, hit.distance)
+
+    def test_raycast_axis_parallel(self) -> None:
+        index = BoxIndex([(0, 0, 0, 1, 1, 1), (5, 0, 0, 6, 1, 1), (10, 5, 0, 11, 6, 1)])
+        hit = index.raycast((-2, 0.5, 0.5), (1, 0, 0))
+        self.assertEqual((0, 2.0), (hit.box_index, hit.distance))
+        hit = index.raycast((3, 0.5, 0.5), (1, 0, 0))
+        self.assertEqual((1, 2.0), (hit.box_index, hit.distance))
+        hit = index.raycast((3, 0.5, 0.5), (-2, 0, 0))
+        self.assertEqual((0, 1.0), (hit.box_index, hit.distance))
+        # The ray passes beside the boxes.
+        self.assertIsNone(index.raycast((-2, 2, 0.5), (1, 0, 0)))
+        # A ray along the surface of a box hits it.
+        hit = index.raycast((-2, 1, 0.5), (1, 0, 0))
+        self.assertEqual((0, 2.0), (hit.box_index, hit.distance))
+        hit = index.raycast((10.5, -3, 0.5), (0, 1, 0))
+        self.assertEqual((2, 8.0), (hit.box_index, hit.distance))
+        # The box is beyond the maximum distance.
+        self.assertIsNone(index.raycast((-2, 0.5, 0.5), (1, 0, 0), 1.5))
+
+    def test_raycast_inside(self) -> None:
+        index = BoxIndex([(0, 0, 0, 10, 10, 10), (2, 2, 2, 3, 3, 3)])
+        hit = index.raycast((5, 5, 5), (1, 1, 1))
+        self.assertEqual((0, 0.0), (hit.box_index, hit.distance))
+        hit = index.raycast((5, 5, 5), (0, 0, -1), 0.0)
+        self.assertEqual((0, 0.0), (hit.box_index, hit.distance))
+
+
+if __name__ == "__main__":
+    unittest.main()
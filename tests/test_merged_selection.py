@@ -0,0 +1,160 @@
+import itertools
+import random
+import unittest
+
+from amulet.selection import SelectionBox
+
+from tests._plugin_modules import import_plugin_module
+
+MergedSelection = import_plugin_module(
+    "amulet_team_selection._merged_selection"
+).MergedSelection
+
+
+def get_blocks(boxes: list[SelectionBox]) -> set[tuple[int, int, int]]:
+    """Get every block in some boxes the slow way."""
+    return {
+        block
+        for box in boxes
+        for block in itertools.product(
+            range(box.min_x, box.max_x),
+            range(box.min_y, box.max_y),
+            range(box.min_z, box.max_z),
+        )
+    }
+
+
+def random_boxes(rand: random.Random, count: int, size: int) -> list[SelectionBox]:
+    boxes = []
+    for _ in range(count):
+        point_1 = tuple(rand.randint(-size, size) for _ in range(3))
+        point_2 = tuple(rand.randint(-size, size) for _ in range(3))
+        boxes.append(SelectionBox(point_1, point_2))
+    return boxes
+
+
+class MergedSelectionTestCase(unittest.TestCase):
+    def test_empty(self) -> None:
+        merged = MergedSelection()
+        self.assertFalse(merged)
+        self.assertEqual((), merged.boxes)
+        self.assertEqual(0, merged.volume)
+        self.assertFalse(merged.contains_block(0, 0, 0))
+
+    def test_empty_boxes(self) -> None:
+        # Boxes with no volume are dropped.
+        merged = MergedSelection(
+            [
+                SelectionBox((0, 0, 0), (0, 5, 5)),
+                SelectionBox((0, 0, 0), (5, 0, 5)),
+                SelectionBox((0, 0, 0), (5, 5, 0)),
+            ]
+        )
+        self.assertFalse(merged)
+        self.assertEqual(MergedSelection(), merged)
+        self.assertEqual(
+            MergedSelection([SelectionBox((0, 0, 0), (1, 1, 1))]),
+            MergedSelection(
+                [
+                    SelectionBox((0, 0, 0), (1, 1, 1)),
+                    SelectionBox((3, 3, 3), (3, 4, 4)),
+                ]
+            ),
+        )
+
+    def test_split_boxes(self) -> None:
+        # The same volume split in different ways is equal.
+        whole = MergedSelection([SelectionBox((0, 0, 0), (4, 4, 4))])
+        split_x = MergedSelection(
+            [
+                SelectionBox((0, 0, 0), (1, 4, 4)),
+                SelectionBox((1, 0, 0), (4, 4, 4)),
+            ]
+        )
+        split_z = MergedSelection(
+            [
+                SelectionBox((0, 0, 0), (4, 4, 2)),
+                SelectionBox((0, 0, 2), (4, 4, 4)),
+            ]
+        )
+        split_all = MergedSelection(
+            [
+                SelectionBox((x, y, z), (x + 2, y + 2, z + 2))
+                for x in (0, 2)
+                for y in (0, 2)
+                for z in (0, 2)
+            ]
+        )
+        for merged in (split_x, split_z, split_all):
+            self.assertEqual(whole, merged)
+            self.assertEqual(hash(whole), hash(merged))
+            self.assertEqual(whole.boxes, merged.boxes)
+        self.assertEqual((SelectionBox((0, 0, 0), (4, 4, 4)),), whole.boxes)
+
+    def test_touching_boxes(self) -> None:
+        merged = MergedSelection(
+            [
+                SelectionBox((0, 0, 0), (2, 1, 1)),
+                SelectionBox((2, 0, 0), (5, 1, 1)),
+            ]
+        )
+        self.assertEqual((SelectionBox((0, 0, 0), (5, 1, 1)),), merged.boxes)
+        self.assertEqual(5, merged.volume)
+
+    def test_overlapping_boxes(self) -> None:
+        merged = MergedSelection(
+            [
+                SelectionBox((0, 0, 0), (3, 3, 3)),
+                SelectionBox((1, 1, 1), (4, 4, 4)),
+            ]
+        )
+        self.assertEqual(27 + 27 - 8, merged.volume)
+        self.assertTrue(merged.contains_block(0, 0, 0))
+        self.assertTrue(merged.contains_block(3, 3, 3))
+        self.assertFalse(merged.contains_block(3, 0, 0))
+        self.assertFalse(merged.contains_block(0, 3, 3))
+        # Duplicate boxes do not change the volume.
+        self.assertEqual(
+            merged,
+            MergedSelection(
+                [
+                    SelectionBox((0, 0, 0), (3, 3, 3)),
+                    SelectionBox((0, 0, 0), (3, 3, 3)),
+                    SelectionBox((1, 1, 1), (4, 4, 4)),
+                ]
+            ),
+        )
+
+    def test_not_equal(self) -> None:
+        self.assertNotEqual(
+            MergedSelection([SelectionBox((0, 0, 0), (2, 2, 2))]),
+            MergedSelection([SelectionBox((0, 0, 0), (2, 2, 3))]),
+        )
+
+    def test_random(self) -> None:
+        rand = random.Random(0)
+        for _ in range(50):
+            boxes = random_boxes(rand, rand.randint(1, 6), 6)
+            blocks = get_blocks(boxes)
+            merged = MergedSelection(boxes)
+            # The merged boxes are disjoint and cover the same blocks.
+            self.assertEqual(len(blocks), merged.volume)
+            self.assertEqual(blocks, get_blocks(list(merged.boxes)))
+            for block in itertools.product(range(-7, 8), repeat=3):
+                self.assertEqual(block in blocks, merged.contains_block(*block))
+            # The result does not depend on the order or split of the boxes.
+            shuffled = list(boxes)
+            rand.shuffle(shuffled)
+            self.assertEqual(merged, MergedSelection(shuffled))
+            self.assertEqual(merged, MergedSelection(merged.boxes))
+            self.assertEqual(
+                merged,
+                MergedSelection(
+                    SelectionBox(block, (block[0] + 1, block[1] + 1, block[2] + 1))
+                    for block in blocks
+                ),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+
+import numpy
+import numpy.typing
+
+from amulet.selection import SelectionBox
+
+from tests._plugin_modules import import_plugin_module
+
+_operations = import_plugin_module("amulet_team_selection._operations")
+
+
+class StubPalette(list[str]):
+    """A block palette using strings as blocks."""
+
+    def block_stack_to_index(self, block: str) -> int:
+        if block not in self:
+            self.append(block)
+        return self.index(block)
+
+
+class StubSectionMap(dict[int, numpy.typing.NDArray[numpy.uint32]]):
+    """A section array map with a shape of 2x2x2."""
+
+    def __init__(self, default_array: int | numpy.ndarray) -> None:
+        super().__init__()
+        self.default_array = default_array
+
+    def populate(self, cy: int) -> None:
+        self[cy] = numpy.full((2, 2, 2), self.default_array, dtype=numpy.uint32)
+
+
+class GetChunkBoxesTestCase(unittest.TestCase):
+    def test_single_chunk(self) -> None:
+        box = SelectionBox((1, 0, 2), (16, 300, 16))
+        self.assertEqual({(0, 0): [box]}, _operations._get_chunk_boxes([box]))
+
+    def test_negative(self) -> None:
+        box = SelectionBox((-16, -64, -32), (-15, 0, -16))
+        self.assertEqual({(-1, -2): [box]}, _operations._get_chunk_boxes([box]))
+
+    def test_cross_border(self) -> None:
+        box = SelectionBox((-1, 0, 15), (17, 1, 16))
+        self.assertEqual(
+            {(-1, 0): [box], (0, 0): [box], (1, 0): [box]},
+            _operations._get_chunk_boxes([box]),
+        )
+
+    def test_multiple(self) -> None:
+        box_1 = SelectionBox((-17, 0, -1), (-15, 1, 1))
+        box_2 = SelectionBox((0, 0, 0), (1, 1, 1))
+        self.assertEqual(
+            {
+                (-2, -1): [box_1],
+                (-2, 0): [box_1],
+                (-1, -1): [box_1],
+                (-1, 0): [box_1],
+                (0, 0): [box_2],
+            },
+            _operations._get_chunk_boxes([box_1, box_2]),
+        )
+
+    def test_empty(self) -> None:
+        self.assertEqual({}, _operations._get_chunk_boxes([]))
+
+
+class ReplaceLookupTestCase(unittest.TestCase):
+    def test_replace(self) -> None:
+        palette = StubPalette(["air", "stone", "dirt"])
+        lookup = _operations._get_replace_lookup(palette, {"stone": "dirt"})
+        assert lookup is not None
+        self.assertEqual([0, 2, 2], lookup.tolist())
+        self.assertEqual(["air", "stone", "dirt"], palette)
+
+    def test_new_block(self) -> None:
+        palette = StubPalette(["air", "stone"])
+        lookup = _operations._get_replace_lookup(palette, {"stone": "glass"})
+        assert lookup is not None
+        self.assertEqual(["air", "stone", "glass"], palette)
+        self.assertEqual([0, 2, 2], lookup.tolist())
+
+    def test_not_chained(self) -> None:
+        palette = StubPalette(["a", "b", "c"])
+        lookup = _operations._get_replace_lookup(palette, {"a": "b", "b": "c"})
+        assert lookup is not None
+        self.assertEqual([1, 2, 2], lookup.tolist())
+
+    def test_swap(self) -> None:
+        palette = StubPalette(["a", "b"])
+        lookup = _operations._get_replace_lookup(palette, {"a": "b", "b": "a"})
+        assert lookup is not None
+        self.assertEqual([1, 0], lookup.tolist())
+
+    def test_no_match(self) -> None:
+        palette = StubPalette(["air", "stone"])
+        self.assertIsNone(_operations._get_replace_lookup(palette, {"dirt": "glass"}))
+        # The replacement blocks are not added when nothing matches.
+        self.assertEqual(["air", "stone"], palette)
+
+
+class PopulateTestCase(unittest.TestCase):
+    def test_default_unchanged(self) -> None:
+        lookup = numpy.array([0, 2, 2], dtype=numpy.uint32)
+        self.assertFalse(_operations._should_populate(0, lookup))
+        self.assertFalse(_operations._should_populate(2, lookup))
+
+    def test_default_changed(self) -> None:
+        lookup = numpy.array([1, 1], dtype=numpy.uint32)
+        self.assertTrue(_operations._should_populate(0, lookup))
+
+    def test_default_array(self) -> None:
+        lookup = numpy.array([0, 1], dtype=numpy.uint32)
+        default = numpy.zeros((2, 2, 2), dtype=numpy.uint32)
+        self.assertTrue(_operations._should_populate(default, lookup))
+
+    def test_missing_section_skipped(self) -> None:
+        sections = StubSectionMap(0)
+        self.assertIsNone(_operations._get_section(sections, 1, False))
+        self.assertNotIn(1, sections)
+
+    def test_missing_section_populated(self) -> None:
+        sections = StubSectionMap(3)
+        array = _operations._get_section(sections, -1, True)
+        assert array is not None
+        self.assertIs(sections[-1], array)
+        self.assertTrue(numpy.all(array == 3))
+
+    def test_existing_section(self) -> None:
+        sections = StubSectionMap(0)
+        sections[0] = numpy.ones((2, 2, 2), dtype=numpy.uint32)
+        self.assertIs(sections[0], _operations._get_section(sections, 0, False))
+        self.assertIs(sections[0], _operations._get_section(sections, 0, True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,363 @@
+import random
+import unittest
+from math import inf, sqrt
+
+from tests._plugin_modules import import_plugin_module
+
+raycast_module = import_plugin_module("amulet_team_3d_viewer._view_3d._raycast")
+ChunkOccupancy = raycast_module.ChunkOccupancy
+raycast = raycast_module.raycast
+
+SectionShape = (16, 16, 16)
+Vector = tuple[float, float, float]
+Box = tuple[float, float, float, float, float, float]
+
+
+class World:
+    """The blocks with geometry and the occupancy of each loaded chunk."""
+
+    def __init__(self) -> None:
+        self.blocks: set[tuple[int, int, int]] = set()
+        # The full sections. (min_x, min_y, min_z, max_x, max_y, max_z)
+        self.full_sections: list[tuple[int, int, int, int, int, int]] = []
+        self.chunks: dict[tuple[int, int], ChunkOccupancy] = {}
+
+    def add_chunk(
+        self,
+        cx: int,
+        cz: int,
+        sections: dict[int, set[tuple[int, int, int]] | bool],
+    ) -> None:
+        """
+        Add a loaded chunk.
+
+        :param sections: The blocks in each section relative to the section or True if the section is full.
+        """
+        occupancy: dict[int, tuple[int, ...] | bool] = {}
+        x_shape, y_shape, z_shape = SectionShape
+        for cy, blocks in sections.items():
+            if blocks is True:
+                occupancy[cy] = True
+                self.full_sections.append(
+                    (
+                        cx * x_shape,
+                        cy * y_shape,
+                        cz * z_shape,
+                        (cx + 1) * x_shape,
+                        (cy + 1) * y_shape,
+                        (cz + 1) * z_shape,
+                    )
+                )
+                continue
+            elif not blocks:
+                continue
+            else:
+                rows = [0] * (x_shape * y_shape)
+                for x, y, z in blocks:
+                    rows[x * y_shape + y] |= 1 << z
+                occupancy[cy] = tuple(rows)
+            for x, y, z in blocks:
+                self.blocks.add((cx * x_shape + x, cy * y_shape + y, cz * z_shape + z))
+        self.chunks[(cx, cz)] = ChunkOccupancy(SectionShape, occupancy)
+
+    def has_geometry(self, block: tuple[int, int, int]) -> bool:
+        return block in self.blocks or any(
+            all(box[axis] <= block[axis] < box[axis + 3] for axis in range(3))
+            for box in self.full_sections
+        )
+
+    def raycast(
+        self,
+        origin: Vector,
+        direction: Vector,
+        max_distance: float,
+        bounds: Box | None = None,
+    ):
+        return raycast(
+            lambda cx, cz: self.chunks.get((cx, cz)),
+            origin,
+            direction,
+            max_distance,
+            bounds,
+        )
+
+    def brute_force(
+        self,
+        origin: Vector,
+        direction: Vector,
+        max_distance: float,
+        bounds: Box | None = None,
+    ) -> float | None:
+        """
+        Get the distance to the nearest block by testing the ray against every block.
+        If bounds is defined only the part of each block inside it is tested.
+        """
+        length = sqrt(sum(d * d for d in direction))
+        direction = tuple(d / length for d in direction)
+        best = None
+        # Entering a full section is the same as entering the first block in it.
+        for box in (
+            *((*block, *(c + 1 for c in block)) for block in self.blocks),
+            *self.full_sections,
+        ):
+            if bounds is not None:
+                box = (
+                    *(max(box[axis], bounds[axis]) for axis in range(3)),
+                    *(min(box[axis + 3], bounds[axis + 3]) for axis in range(3)),
+                )
+                if any(box[axis + 3] <= box[axis] for axis in range(3)):
+                    continue
+            distance = box_distance(box, origin, direction)
+            if (
+                distance is not None
+                and distance <= max_distance
+                and (best is None or distance < best)
+            ):
+                best = distance
+        return best
+
+
+def box_distance(box: Box, origin: Vector, direction: Vector) -> float | None:
+    """Get the distance along a ray at which it enters a box."""
+    start = 0.0
+    end = inf
+    for axis in range(3):
+        low = box[axis]
+        high = box[axis + 3]
+        if direction[axis] == 0:
+            if not low <= origin[axis] < high:
+                return None
+            continue
+        enter = (low - origin[axis]) / direction[axis]
+        leave = (high - origin[axis]) / direction[axis]
+        start = max(start, min(enter, leave))
+        end = min(end, max(enter, leave))
+    if end <= start:
+        return None
+    return start
+
+
+def random_direction(rand: random.Random) -> Vector:
+    direction = [rand.uniform(-1, 1) for _ in range(3)]
+    for axis in range(3):
+        if rand.random() < 0.2:
+            direction[axis] = 0.0
+    if not any(direction):
+        direction[rand.randrange(3)] = rand.choice((-1.0, 1.0))
+    return direction[0], direction[1], direction[2]
+
+
+class RaycastTestCase(unittest.TestCase):
+    def assert_hit(self, world: World, hit, origin: Vector, direction: Vector) -> None:
+        """The hit block has geometry and the ray enters it through the hit face at the hit distance."""
+        self.assertTrue(world.has_geometry(hit.block))
+        length = sqrt(sum(d * d for d in direction))
+        point = [o + d / length * hit.distance for o, d in zip(origin, direction)]
+        for axis in range(3):
+            self.assertLessEqual(hit.block[axis] - 1e-6, point[axis])
+            self.assertLessEqual(point[axis], hit.block[axis] + 1 + 1e-6)
+            if hit.face[axis] == -1:
+                self.assertAlmostEqual(hit.block[axis], point[axis])
+            elif hit.face[axis] == 1:
+                self.assertAlmostEqual(hit.block[axis] + 1, point[axis])
+        if hit.face == (0, 0, 0):
+            self.assertEqual(0.0, hit.distance)
+
+    def test_random(self) -> None:
+        rand = random.Random(0)
+        for _ in range(10):
+            world = World()
+            for cx in range(-2, 2):
+                for cz in range(-2, 2):
+                    if rand.random() < 0.25:
+                        # The chunk is not loaded.
+                        continue
+                    sections: dict[int, set[tuple[int, int, int]] | bool] = {}
+                    for cy in range(-2, 2):
+                        kind = rand.random()
+                        if kind < 0.4:
+                            # The section is missing.
+                            continue
+                        elif kind < 0.45:
+                            sections[cy] = True
+                        else:
+                            sections[cy] = {
+                                (
+                                    rand.randrange(16),
+                                    rand.randrange(16),
+                                    rand.randrange(16),
+                                )
+                                for _ in range(rand.randint(0, 20))
+                            }
+                    world.add_chunk(cx, cz, sections)
+            for _ in range(300):
+                origin = (
+                    rand.uniform(-40, 40),
+                    rand.uniform(-40, 40),
+                    rand.uniform(-40, 40),
+                )
+                direction = random_direction(rand)
+                max_distance = rand.choice((100.0, rand.uniform(0, 40)))
+                expected = world.brute_force(origin, direction, max_distance)
+                hit = world.raycast(origin, direction, max_distance)
+                if expected is None:
+                    self.assertIsNone(hit)
+                else:
+                    self.assertIsNotNone(hit)
+                    self.assertAlmostEqual(expected, hit.distance)
+                    self.assert_hit(world, hit, origin, direction)
+
+    def test_random_bounds(self) -> None:
+        rand = random.Random(1)
+        for _ in range(5):
+            # A small dense world so that most rays hit something.
+            world = World()
+            for cx in range(-1, 1):
+                for cz in range(-1, 1):
+                    world.add_chunk(
+                        cx,
+                        cz,
+                        {
+                            cy: (
+                                rand.random() < 0.1
+                                or {
+                                    (
+                                        rand.randrange(16),
+                                        rand.randrange(16),
+                                        rand.randrange(16),
+                                    )
+                                    for _ in range(rand.randint(0, 300))
+                                }
+                            )
+                            for cy in range(-1, 1)
+                        },
+                    )
+            for _ in range(200):
+                # Some bounds are on block boundaries and some cut through blocks.
+                low = [
+                    rand.choice((rand.randint(-20, 10), rand.uniform(-20, 10)))
+                    for _ in range(3)
+                ]
+                high = [
+                    rand.choice((l + rand.randint(1, 25), l + rand.uniform(0.1, 25)))
+                    for l in low
+                ]
+                bounds = (low[0], low[1], low[2], high[0], high[1], high[2])
+                origin = (
+                    rand.uniform(-25, 25),
+                    rand.uniform(-25, 25),
+                    rand.uniform(-25, 25),
+                )
+                if rand.random() < 0.5:
+                    direction = random_direction(rand)
+                else:
+                    # Aim at the bounds.
+                    direction = (
+                        rand.uniform(low[0], high[0]) - origin[0],
+                        rand.uniform(low[1], high[1]) - origin[1],
+                        rand.uniform(low[2], high[2]) - origin[2],
+                    )
+                max_distance = rand.choice((200.0, rand.uniform(0, 40)))
+                expected = world.brute_force(origin, direction, max_distance, bounds)
+                hit = world.raycast(origin, direction, max_distance, bounds)
+                if expected is None:
+                    self.assertIsNone(hit)
+                    continue
+                self.assertIsNotNone(hit)
+                self.assertAlmostEqual(expected, hit.distance)
+                self.assertTrue(world.has_geometry(hit.block))
+                length = sqrt(sum(d * d for d in direction))
+                point = [
+                    o + d / length * hit.distance for o, d in zip(origin, direction)
+                ]
+                for axis in range(3):
+                    self.assertLessEqual(bounds[axis] - 1e-6, point[axis])
+                    self.assertLessEqual(point[axis], bounds[axis + 3] + 1e-6)
+                    self.assertLessEqual(hit.block[axis] - 1e-6, point[axis])
+                    self.assertLessEqual(point[axis], hit.block[axis] + 1 + 1e-6)
+
+    def test_bounds(self) -> None:
+        world = World()
+        world.add_chunk(0, 0, {0: True})
+        # A slice at y=10 hides the blocks above it.
+        slice_bounds = (-inf, -inf, -inf, inf, 10, inf)
+        hit = world.raycast((8.5, 40.5, 8.5), (0, -1, 0), 100, slice_bounds)
+        self.assertEqual(((8, 9, 8), (0, 1, 0)), (hit.block, hit.face))
+        self.assertAlmostEqual(30.5, hit.distance)
+        # A slice through a block hits the visible part of the block.
+        hit = world.raycast(
+            (8.5, 40.5, 8.5), (0, -1, 0), 100, (-inf, -inf, -inf, inf, 9.5, inf)
+        )
+        self.assertEqual(((8, 9, 8), (0, 1, 0)), (hit.block, hit.face))
+        self.assertAlmostEqual(31.0, hit.distance)
+        # A horizontal ray above the slice hits nothing.
+        self.assertIsNone(
+            world.raycast((-5.5, 12.5, 8.5), (1, 0, 0), 100, slice_bounds)
+        )
+        # The ray enters the clip box from the side inside the section.
+        clip_box = (4, 0, 4, 12, 16, 12)
+        hit = world.raycast((-5.5, 2.5, 8.5), (1, 0, 0), 100, clip_box)
+        self.assertEqual(((4, 2, 8), (-1, 0, 0)), (hit.block, hit.face))
+        self.assertAlmostEqual(9.5, hit.distance)
+        hit = world.raycast((20.5, 2.5, 8.5), (-1, 0, 0), 100, clip_box)
+        self.assertEqual(((11, 2, 8), (1, 0, 0)), (hit.block, hit.face))
+        self.assertAlmostEqual(8.5, hit.distance)
+        # The ray misses the clip box.
+        self.assertIsNone(world.raycast((-5.5, 2.5, 0.5), (1, 0, 0), 100, clip_box))
+        # The clip box is beyond the maximum distance.
+        self.assertIsNone(world.raycast((-5.5, 2.5, 8.5), (1, 0, 0), 9, clip_box))
+        # Starting inside the clip box behaves like no clip box.
+        hit = world.raycast((8.5, 2.5, 8.5), (1, 0, 0), 100, clip_box)
+        self.assertEqual(((8, 2, 8), (0, 0, 0), 0.0), tuple(hit))
+
+    def test_negative_coordinates(self) -> None:
+        world = World()
+        # The block at (-1, -1, -1)
+        world.add_chunk(-1, -1, {-1: {(15, 15, 15)}})
+        hit = world.raycast((5.5, -0.5, -0.5), (-1, 0, 0), 100)
+        self.assertEqual(((-1, -1, -1), (1, 0, 0)), (hit.block, hit.face))
+        self.assertAlmostEqual(5.5, hit.distance)
+        hit = world.raycast((-0.5, -0.5, -20.5), (0, 0, 1), 100)
+        self.assertEqual(((-1, -1, -1), (0, 0, -1)), (hit.block, hit.face))
+        self.assertAlmostEqual(19.5, hit.distance)
+
+    def test_skip_unloaded_and_empty(self) -> None:
+        world = World()
+        # An empty loaded chunk followed by unloaded chunks and then a chunk with one block.
+        world.add_chunk(0, 0, {})
+        world.add_chunk(5, 0, {0: {(3, 4, 5)}})
+        hit = world.raycast((0.5, 4.5, 5.5), (1, 0, 0), 1000)
+        self.assertEqual(((83, 4, 5), (-1, 0, 0)), (hit.block, hit.face))
+        self.assertAlmostEqual(82.5, hit.distance)
+        # Missing sections above and below are skipped.
+        hit = world.raycast((83.5, 500.5, 5.5), (0, -1, 0), 1000)
+        self.assertEqual(((83, 4, 5), (0, 1, 0)), (hit.block, hit.face))
+        self.assertAlmostEqual(495.5, hit.distance)
+        hit = world.raycast((83.5, -500.5, 5.5), (0, 1, 0), 1000)
+        self.assertEqual(((83, 4, 5), (0, -1, 0)), (hit.block, hit.face))
+        # The block is beyond the maximum distance.
+        self.assertIsNone(world.raycast((0.5, 4.5, 5.5), (1, 0, 0), 80))
+        # The ray never leaves the unloaded column.
+        self.assertIsNone(world.raycast((40.5, 0.5, 0.5), (0, 1, 0), 1000))
+
+    def test_full_section(self) -> None:
+        world = World()
+        world.add_chunk(0, 0, {1: True})
+        hit = world.raycast((8.5, 40.5, 8.5), (0, -1, 0), 100)
+        self.assertEqual(((8, 31, 8), (0, 1, 0)), (hit.block, hit.face))
+        self.assertAlmostEqual(8.5, hit.distance)
+
+    def test_start_inside(self) -> None:
+        world = World()
+        world.add_chunk(0, 0, {0: {(1, 2, 3)}})
+        hit = world.raycast((1.5, 2.5, 3.5), (1, 1, 1), 100)
+        self.assertEqual(((1, 2, 3), (0, 0, 0), 0.0), tuple(hit))
+
+    def test_zero_direction(self) -> None:
+        world = World()
+        world.add_chunk(0, 0, {0: {(1, 2, 3)}})
+        self.assertIsNone(world.raycast((1.5, 2.5, 3.5), (0, 0, 0), 100))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+
+from amulet.selection import SelectionBox, SelectionGroup
+
+from tests._plugin_modules import import_plugin_module
+
+api = import_plugin_module("amulet_team_selection._api")
+
+Box1 = SelectionBox((0, 0, 0), (1, 1, 1))
+Box2 = SelectionBox((5, 0, 0), (7, 2, 2))
+Box3 = SelectionBox((-4, -4, -4), (-2, -2, -2))
+
+
+class SelectionAPITestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        api.set_selection(SelectionGroup())
+        self.diffs: list = []
+        self.selections: list = []
+        api.selection_diff.connect(self.diffs.append)
+        api.selection_changed.connect(self.selections.append)
+
+    def tearDown(self) -> None:
+        api.selection_diff.disconnect(self.diffs.append)
+        api.selection_changed.disconnect(self.selections.append)
+        api.set_selection(SelectionGroup())
+
+    def assert_versions(self, start: int) -> None:
+        """Each diff increases the version by one and the last is the current version."""
+        self.assertEqual(
+            list(range(start + 1, start + 1 + len(self.diffs))),
+            [diff.version for diff in self.diffs],
+        )
+        self.assertEqual(start + len(self.diffs), api.get_selection_version())
+
+    def test_set_selection(self) -> None:
+        start = api.get_selection_version()
+        api.set_selection(SelectionGroup([Box1, Box2]))
+        api.set_selection(SelectionGroup([Box2, Box3]))
+        self.assert_versions(start)
+        self.assertEqual((Box1, Box2), self.diffs[0].added)
+        self.assertEqual((), self.diffs[0].removed)
+        self.assertEqual((Box3,), self.diffs[1].added)
+        self.assertEqual((Box1,), self.diffs[1].removed)
+        self.assertEqual(2, len(self.selections))
+        self.assertEqual(SelectionGroup([Box2, Box3]), api.get_selection())
+
+    def test_set_same_selection(self) -> None:
+        api.set_selection(SelectionGroup([Box1, Box2]))
+        start = api.get_selection_version()
+        self.diffs.clear()
+        api.set_selection(SelectionGroup([Box2, Box1]))
+        # The boxes did not change so there is no diff or new version.
+        self.assertEqual([], self.diffs)
+        self.assertEqual(start, api.get_selection_version())
+        self.assertEqual(2, len(self.selections))
+
+    def test_update_selection(self) -> None:
+        start = api.get_selection_version()
+        api.update_selection(add=[Box1, Box2])
+        # Adding a box already in the selection does nothing.
+        api.update_selection(add=[Box1])
+        # Removing a box not in the selection does nothing.
+        api.update_selection(remove=[Box3])
+        api.update_selection(add=[Box3], remove=[Box1])
+        self.assert_versions(start)
+        self.assertEqual(2, len(self.diffs))
+        self.assertEqual((Box3,), self.diffs[1].added)
+        self.assertEqual((Box1,), self.diffs[1].removed)
+        self.assertEqual({Box2, Box3}, set(api.get_selection()))
+
+    def test_remove_and_add_cancel(self) -> None:
+        api.update_selection(add=[Box1, Box2])
+        start = api.get_selection_version()
+        self.diffs.clear()
+        # A box removed and added again is unchanged.
+        api.update_selection(add=[Box1], remove=[Box1])
+        self.assertEqual([], self.diffs)
+        self.assertEqual(start, api.get_selection_version())
+        api.update_selection(add=[Box1, Box3], remove=[Box1, Box2])
+        self.assert_versions(start)
+        self.assertEqual((Box3,), self.diffs[0].added)
+        self.assertEqual((Box2,), self.diffs[0].removed)
+
+    def test_move_boxes(self) -> None:
+        api.set_selection(SelectionGroup([Box1, Box2]))
+        start = api.get_selection_version()
+        self.diffs.clear()
+        api.move_boxes([Box1, Box3], (0, 10, 0))
+        moved = SelectionBox((0, 10, 0), (1, 11, 1))
+        self.assert_versions(start)
+        # Box3 is not selected so it is not moved.
+        self.assertEqual((moved,), self.diffs[0].added)
+        self.assertEqual((Box1,), self.diffs[0].removed)
+        self.assertEqual({moved, Box2}, set(api.get_selection()))
+        # Moving by nothing is not a change.
+        api.move_boxes([moved], (0, 0, 0))
+        self.assertEqual(1, len(self.diffs))
+
+    def test_merged_selection(self) -> None:
+        api.set_selection(SelectionGroup([Box1]))
+        merged = api.get_merged_selection()
+        self.assertIs(merged, api.get_merged_selection())
+        self.assertEqual(1, merged.volume)
+        api.update_selection(add=[SelectionBox((1, 0, 0), (2, 1, 1))])
+        merged = api.get_merged_selection()
+        self.assertEqual((SelectionBox((0, 0, 0), (2, 1, 1)),), merged.boxes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import itertools
+import unittest
+
+from tests._plugin_modules import import_plugin_module
+
+unload_ring = import_plugin_module("amulet_team_3d_viewer._view_3d._unload_ring")
+
+
+def get_square(cx: int, cz: int, distance: int) -> set[tuple[int, int]]:
+    """Get the chunks closer than distance to a chunk by Chebyshev distance."""
+    return {
+        (x, z)
+        for x in range(cx - distance, cx + distance + 1)
+        for z in range(cz - distance, cz + distance + 1)
+        if max(abs(x - cx), abs(z - cz)) < distance
+    }
+
+
+class UnloadRingTestCase(unittest.TestCase):
+    def test_unload_ring(self) -> None:
+        for distance in (1, 2, 3, 5):
+            old_square = get_square(0, 0, distance)
+            for cx, cz in itertools.product(
+                range(-2 * distance - 1, 2 * distance + 2), repeat=2
+            ):
+                with self.subTest(distance=distance, cx=cx, cz=cz):
+                    ring = list(
+                        unload_ring.get_unload_ring(
+                            "minecraft:overworld", 0, 0, cx, cz, distance
+                        )
+                    )
+                    self.assertTrue(
+                        all(
+                            dimension == "minecraft:overworld"
+                            for dimension, _, _ in ring
+                        )
+                    )
+                    chunks = [(x, z) for _, x, z in ring]
+                    # Each chunk is yielded once.
+                    self.assertEqual(len(chunks), len(set(chunks)))
+                    self.assertEqual(
+                        old_square - get_square(cx, cz, distance), set(chunks)
+                    )
+                    self.assertEqual(
+                        len(chunks),
+                        unload_ring.get_unload_ring_size(0, 0, cx, cz, distance),
+                    )
+
+    def test_not_moved(self) -> None:
+        self.assertEqual(
+            [],
+            list(unload_ring.get_unload_ring("minecraft:overworld", 3, -4, 3, -4, 4)),
+        )
+        self.assertEqual(0, unload_ring.get_unload_ring_size(3, -4, 3, -4, 4))
+
+    def test_offset(self) -> None:
+        # The result only depends on the relative position.
+        ring = {
+            (x, z)
+            for _, x, z in unload_ring.get_unload_ring(
+                "minecraft:overworld", -100, 37, -98, 36, 4
+            )
+        }
+        self.assertEqual(get_square(-100, 37, 4) - get_square(-98, 36, 4), ring)
+        self.assertEqual(
+            len(ring), unload_ring.get_unload_ring_size(-100, 37, -98, 36, 4)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()